@@ -29,10 +29,10 @@ setup(
     license='MIT License',
     install_requires=[
         'docopt>=0.5',
-        'packbits',
         'attrs>=19.2.0',
         'Pillow>=6.2.0',
         'enum34;python_version<"3.4"',
+        'futures;python_version<"3.2"',
         'aggdraw',
     ],
     keywords="photoshop psd pil pillow",
@@ -3,14 +3,17 @@ Layer module.
 """
 from __future__ import absolute_import, unicode_literals
 import logging
+import math
 
 from psd_tools.api import deprecated
 from psd_tools.constants import (BlendMode, SectionDivider, Clipping, Tag)
 from psd_tools.api.effects import Effects
 from psd_tools.api.mask import Mask
+from psd_tools.api import numpy_io
 from psd_tools.api.pil_io import convert_layer_to_pil
 from psd_tools.api.shape import VectorMask, Stroke, Origination
 from psd_tools.api.smart_object import SmartObject
+from psd_tools.utils import new_stamp
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +25,7 @@ class Layer(object):
         self._channels = channels
         self._parent = parent
         self._clip_layers = []
+        self._stamp = new_stamp()
 
     @property
     def name(self):
@@ -77,6 +81,7 @@ class Layer(object):
     @visible.setter
     def visible(self, value):
         self._record.flags.visible = bool(value)
+        self._invalidate()
 
     def is_visible(self):
         """
@@ -99,6 +104,7 @@ class Layer(object):
     def opacity(self, value):
         assert 0 <= value and value <= 255
         self._record.opacity = int(value)
+        self._invalidate()
 
     @property
     def parent(self):
@@ -131,6 +137,7 @@ class Layer(object):
     @blend_mode.setter
     def blend_mode(self, value):
         self._record.blend_mode = BlendMode(value)
+        self._invalidate()
 
     @property
     def left(self):
@@ -144,8 +151,10 @@ class Layer(object):
     @left.setter
     def left(self, value):
         w = self.width
+        self._invalidate()
         self._record.left = int(value)
         self._record.right = int(value) + w
+        self._invalidate()
 
     @property
     def top(self):
@@ -159,8 +168,10 @@ class Layer(object):
     @top.setter
     def top(self, value):
         h = self.height
+        self._invalidate()
         self._record.top = int(value)
         self._record.bottom = int(value) + h
+        self._invalidate()
 
     @property
     def right(self):
@@ -225,6 +236,15 @@ class Layer(object):
         """(left, top, right, bottom) tuple."""
         return self.left, self.top, self.right, self.bottom
 
+    def _invalidate(self):
+        """Mark the area that this layer renders to as dirty."""
+        self._stamp = new_stamp()
+        parent = self.parent
+        while isinstance(parent, Group):
+            parent.__dict__.pop('_bbox', None)  # Cached union of children.
+            parent = parent.parent
+        self._psd._invalidate(_get_extent(self))
+
     def has_pixels(self):
         """
         Returns True if the layer has associated pixels. When this is True,
@@ -233,7 +253,7 @@ class Layer(object):
         :return: `bool`
         """
         return any(
-            ci.id >= 0 and cd.data and len(cd.data) > 0
+            ci.id >= 0 and cd._length > 2
             for ci, cd in zip(self._record.channel_info, self._channels)
         )
 
@@ -341,6 +361,15 @@ class Layer(object):
         :param channel: Which channel to return; e.g., 0 for 'R' channel in RGB
             image. See :py:class:`~psd_tools.constants.ChannelID`. When `None`,
             the method returns all the channels supported by PIL modes.
+        :param bbox: viewport (left, top, right, bottom) wrt the psd viewport.
+            When given, only the rows of the channels inside the viewport are
+            decoded, and the image covers the intersection of the viewport
+            and the layer at `info['offset']`.
+        :param scale: downsampling ratio `1 / n` for an integer `n`. The
+            channels are decoded in bands, each reduced by `n` with a box
+            filter, and the offset in the reduced coordinates is kept in
+            `info['offset']`. Color images are aligned to the grid of `n`
+            pixels of the document with transparent pixels.
         :return: :py:class:`PIL.Image`, or `None` if the layer has no pixels.
 
         Example::
@@ -357,6 +386,36 @@ class Layer(object):
         """
         return convert_layer_to_pil(self, channel, **kwargs)
 
+    def numpy(self, channel=None, dtype=None, bbox=None):
+        """
+        Get NumPy array of the layer.
+
+        Channels are decoded into a single array without going through
+        :py:class:`PIL.Image`, and samples keep the bit depth of the document
+        unless `dtype` is given. ICC profile is not applied.
+
+        :param channel: Which channel to return, see :py:meth:`topil`. When
+            `None`, the method returns color channels followed by the alpha
+            channel if the layer has one.
+        :param dtype: output dtype. Integer types get the full range of the
+            type, and floating point types get values in [0, 1]. When `None`,
+            the dtype is `bool`, `uint8`, `uint16` or `float32` for 1, 8, 16
+            or 32-bit documents.
+        :param bbox: viewport (left, top, right, bottom) wrt the psd viewport.
+            When given, only the rows of the channels inside the viewport are
+            decoded, and the array covers the intersection of the viewport
+            and the layer.
+        :return: :py:class:`numpy.ndarray` of shape `(height, width,
+            channels)`, `(height, width)` if `channel` is given, or `None` if
+            the layer has no pixels.
+
+        Example::
+
+            array = layer.numpy()
+            features = layer.numpy(dtype='float32')
+        """
+        return numpy_io.convert_layer_to_array(self, channel, dtype, bbox)
+
     def compose(self, bbox=None, **kwargs):
         """
         Compose layer and masks (mask, vector mask, and clipping layers).
@@ -366,12 +425,14 @@ class Layer(object):
         composed image is stored at `.info['offset']` attribute of `PIL.Image`.
 
         :param bbox: Viewport bounding box specified by (x1, y1, x2, y2) tuple.
+        :param scale: downsampling ratio `1 / n` for previews, see
+            :py:func:`~psd_tools.compose`.
         :return: :py:class:`PIL.Image`, or `None` if the layer has no pixel.
         """
         from psd_tools.composer import compose, compose_layer
         if self.bbox == (0, 0, 0, 0):
             return None
-        if bbox is None:
+        if bbox is None and kwargs.get('scale') is None:
             return compose_layer(self, **kwargs)
         return compose(self, bbox=bbox, **kwargs)
 
@@ -612,6 +673,7 @@ class Group(GroupMixin, Layer):
         setting = self._setting
         if setting:
             setting.blend_mode = _value
+        self._invalidate()
 
 
 class Artboard(Group):
@@ -964,3 +1026,44 @@ class FillLayer(Layer):
     @property
     def bottom(self):
         return self._record.bottom or self._psd.height
+
+
+def _get_extent(layer):
+    """
+    Get the bounding box that the layer can change in the composed image,
+    regardless of the visibility. Strokes, shadows, and glows of layer
+    effects extend the layer bbox.
+    """
+    if layer.is_group():
+        bboxes = [_get_extent(child) for child in layer]
+        bboxes = [bbox for bbox in bboxes if bbox != (0, 0, 0, 0)]
+        if len(bboxes) == 0:
+            return (0, 0, 0, 0)
+        lefts, tops, rights, bottoms = zip(*bboxes)
+        bbox = min(lefts), min(tops), max(rights), max(bottoms)
+    else:
+        bbox = layer.bbox
+        if bbox == (0, 0, 0, 0):
+            return bbox
+
+    margin = _get_effect_margin(layer)
+    return (
+        bbox[0] - margin, bbox[1] - margin, bbox[2] + margin, bbox[3] + margin
+    )
+
+
+def _get_effect_margin(layer):
+    """Get the distance in pixels that effects paint outside the layer."""
+    if not layer.effects.enabled:
+        return 0
+    margin = 0
+    for effect in layer.effects:
+        kind = effect.__class__.__name__
+        if kind in ('Stroke', 'OuterGlow'):
+            size = effect.size
+        elif kind == 'DropShadow':
+            size = effect.distance + effect.size
+        else:
+            continue
+        margin = max(margin, int(math.ceil(size)))
+    return margin
@@ -0,0 +1,232 @@
+"""
+NumPy IO module.
+"""
+from __future__ import absolute_import, unicode_literals
+import logging
+
+from psd_tools.api.pil_io import (
+    _check_channels, _get_alpha_use, _get_channel_box, _get_region
+)
+from psd_tools.compression import decompress
+from psd_tools.constants import ChannelID, ColorMode
+
+logger = logging.getLogger(__name__)
+
+# Big-endian dtype of the stored samples for each bit depth.
+_STORED_DTYPES = {8: 'u1', 16: '>u2', 32: '>f4'}
+
+# Native dtype of the returned samples for each bit depth.
+_NATIVE_DTYPES = {1: 'bool', 8: 'uint8', 16: 'uint16', 32: 'float32'}
+
+
+def get_dtype(depth):
+    """Get numpy dtype for the bit depth."""
+    import numpy as np
+    if depth not in _NATIVE_DTYPES:
+        raise ValueError('Unsupported depth: %g' % depth)
+    return np.dtype(_NATIVE_DTYPES[depth])
+
+
+def convert_image_data_to_array(psd, channel=None, dtype=None):
+    """Convert ImageData to numpy array.
+
+    :param psd: :py:class:`~psd_tools.api.psd_image.PSDImage`.
+    :param channel: channel index, or `None` for color and alpha channels.
+    :param dtype: output dtype, see :py:func:`convert_dtype`.
+    :return: `(height, width, channels)` array, or `(height, width)` array
+        when `channel` is given.
+    """
+    import numpy as np
+
+    assert channel is None or channel < psd.channels, (
+        'Invalid channel specified: %s' % channel
+    )
+
+    num_colors = ColorMode.channels(psd.color_mode)
+    if channel == ChannelID.TRANSPARENCY_MASK:
+        channel = num_colors
+        if channel >= psd.channels:
+            return None
+
+    image_data = psd._record.image_data
+    if channel is not None:
+        data = image_data.get_data(psd._record.header, channel)
+        plane = _decode(data, psd.width, psd.height, psd.depth)
+        return convert_dtype(plane, psd.depth, dtype)
+
+    data = decompress(
+        image_data.data, image_data.compression, psd.width,
+        psd.height * psd.channels, psd.depth, psd.version
+    )
+    planes = _decode(data, psd.width, psd.height * psd.channels, psd.depth)
+    planes = planes.reshape((psd.channels, psd.height, psd.width))
+
+    alpha = _get_alpha_use(psd) and psd.channels > num_colors
+    indices = list(range(min(num_colors, psd.channels)))
+    if alpha:
+        indices.append(psd.channels - 1)
+
+    array = np.empty(
+        (psd.height, psd.width, len(indices)), dtype=get_dtype(psd.depth)
+    )
+    for i, index in enumerate(indices):
+        array[:, :, i] = planes[index]
+
+    array = _post_process(array, psd.color_mode, psd.depth)
+    if alpha and psd.color_mode == ColorMode.RGB:
+        array = _remove_white_background(array, psd.depth)
+    return convert_dtype(array, psd.depth, dtype)
+
+
+def convert_layer_to_array(layer, channel=None, dtype=None, bbox=None):
+    """Convert Layer to numpy array.
+
+    :param layer: :py:class:`~psd_tools.api.layers.Layer`.
+    :param channel: channel id, or `None` for color and alpha channels. See
+        :py:class:`~psd_tools.constants.ChannelID`.
+    :param dtype: output dtype, see :py:func:`convert_dtype`.
+    :param bbox: viewport (left, top, right, bottom) wrt the psd viewport.
+        When given, only the rows of the color and alpha channels inside the
+        viewport are decoded, and the array covers the intersection of the
+        viewport and the layer.
+    :return: `(height, width, channels)` array, or `(height, width)` array
+        when `channel` is given.
+    """
+    import numpy as np
+
+    region = None
+    if bbox is not None:
+        region = _get_region(layer, bbox, channel)
+        if region is None:
+            return None
+
+    depth = layer._psd.depth
+    if channel is not None:
+        array = _get_channel(layer, channel, region)
+        if array is None:
+            return None
+        return convert_dtype(array, depth, dtype)
+
+    width, height = layer.width, layer.height
+    if region is not None:
+        width, height = region[2] - region[0], region[3] - region[1]
+    lengths = {
+        info.id: data._length
+        for info, data in zip(layer._record.channel_info, layer._channels)
+    }
+    channel_ids = [i for i in sorted(lengths) if i >= 0]
+    if width == 0 or height == 0 or not channel_ids or any(
+        lengths[i] <= 2 for i in channel_ids
+    ):
+        return None
+    channel_ids = _check_channels(channel_ids, layer._psd.color_mode)
+
+    alpha = lengths.get(ChannelID.TRANSPARENCY_MASK, 0) > 2
+    if alpha:
+        channel_ids.append(ChannelID.TRANSPARENCY_MASK)
+
+    array = np.empty(
+        (height, width, len(channel_ids)), dtype=get_dtype(depth)
+    )
+    for i, channel_id in enumerate(channel_ids):
+        array[:, :, i] = _get_channel(layer, channel_id, region)
+
+    array = _post_process(array, layer._psd.color_mode, depth)
+    return convert_dtype(array, depth, dtype)
+
+
+def convert_dtype(array, depth, dtype=None):
+    """Convert the native array of the given bit depth to `dtype`.
+
+    Integer samples are scaled to the full range of the integer `dtype`, and
+    floating point `dtype` gets samples in [0, 1], where 32-bit samples are
+    kept as they are.
+
+    :param array: array of :py:func:`get_dtype` type.
+    :param depth: bit depth of the array.
+    :param dtype: output dtype, or `None` to keep the native one.
+    :return: converted array.
+    """
+    import numpy as np
+    if dtype is None:
+        return array
+    dtype = np.dtype(dtype)
+    if dtype == array.dtype:
+        return array
+
+    if dtype.kind == 'f':
+        values = array.astype(dtype)
+    else:
+        values = array.astype(np.float64)
+    if depth in (8, 16):
+        values /= float((1 << depth) - 1)
+
+    if dtype.kind in ('u', 'i'):
+        values = np.clip(values, 0., 1.) * np.iinfo(dtype).max
+        return np.round(values).astype(dtype)
+    return values.astype(dtype, copy=False)
+
+
+def _get_channel(layer, channel, region=None):
+    left, top, right, bottom = _get_channel_box(layer, channel)
+    width, height = right - left, bottom - top
+
+    index = {info.id: i for i, info in enumerate(layer._record.channel_info)}
+    if channel not in index:
+        return None
+    depth = layer._psd.depth
+    channel_data = layer._channels[index[channel]]
+    if width == 0 or height == 0 or channel_data._length <= 2:
+        return None
+    if region is None:
+        data = channel_data.get_data(width, height, depth, layer._psd.version)
+        return _decode(data, width, height, depth)
+
+    left, top, right, bottom = region
+    data = channel_data.get_data(
+        width, height, depth, layer._psd.version, (top, bottom)
+    )
+    return _decode(data, width, bottom - top, depth)[:, left:right]
+
+
+def _decode(data, width, height, depth):
+    """Decode raw bytes to `(height, width)` array, without copy if possible.
+    """
+    import numpy as np
+    if depth == 1:
+        row_size = (width + 7) // 8
+        bits = np.frombuffer(data, dtype=np.uint8, count=row_size * height)
+        bits = np.unpackbits(bits.reshape((height, row_size)), axis=1)
+        return bits[:, :width] == 0  # 1 is black in bitmap mode.
+    if depth not in _STORED_DTYPES:
+        raise ValueError('Unsupported depth: %g' % depth)
+    array = np.frombuffer(
+        data, dtype=_STORED_DTYPES[depth], count=width * height
+    )
+    return array.reshape((height, width))
+
+
+def _post_process(array, color_mode, depth):
+    # Fix inverted CMYK.
+    if color_mode == ColorMode.CMYK:
+        colors = array[:, :, :4]
+        if depth == 32:
+            colors[:] = 1. - colors
+        else:
+            colors[:] = (1 << depth) - 1 - colors
+    return array
+
+
+def _remove_white_background(array, depth):
+    """Remove white background in the preview image."""
+    import numpy as np
+    values = convert_dtype(array, depth, np.float32)
+    color, alpha = values[:, :, :-1], values[:, :, -1:]
+    mask = alpha > 0
+    color[:] = np.where(
+        mask, (color + alpha - 1.) / np.where(mask, alpha, 1.), color
+    )
+    if depth == 32:
+        return values
+    values = np.clip(values, 0., 1.) * float((1 << depth) - 1)
+    return np.round(values).astype(array.dtype)
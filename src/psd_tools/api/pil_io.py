@@ -6,10 +6,25 @@ import logging
 import io
 
 from psd_tools.psd.image_data import ImageData
-from psd_tools.constants import ColorMode, ChannelID, Resource
+from psd_tools.constants import ColorMode, ChannelID, Compression, Resource
 
 logger = logging.getLogger(__name__)
 
+# Height of the bands decoded at once for reduced images.
+_BAND_SIZE = 256
+
+# Modes with alpha to extend images with transparent pixels.
+_ALPHA_MODES = {
+    '1': 'LA', 'L': 'LA', 'LA': 'LA', 'P': 'RGBA', 'RGB': 'RGBA',
+    'RGBA': 'RGBA'
+}
+
+# Premultiplied modes to average pixels with alpha.
+_PREMULTIPLIED_MODES = {'RGBA': 'RGBa', 'LA': 'La'}
+
+# Compression types that can be decoded from an arbitrary row.
+_SEEKABLE = (Compression.RAW, Compression.PACK_BITS)
+
 
 def get_color_mode(mode):
     """Convert PIL mode to ColorMode."""
@@ -49,11 +64,18 @@ def get_pil_channels(pil_mode):
     }.get(pil_mode, 3)
 
 
-def convert_image_data_to_pil(psd, channel=None, apply_icc=True, **kwargs):
+def convert_image_data_to_pil(
+    psd, channel=None, apply_icc=True, bbox=None, scale=None, **kwargs
+):
     """Convert ImageData to PIL Image.
 
     .. note:: Image resources contain extra alpha channels in these keys:
         `ALPHA_NAMES_UNICODE`, `ALPHA_NAMES_PASCAL`, `ALPHA_IDENTIFIERS`.
+
+    :param bbox: viewport (left, top, right, bottom) wrt the psd viewport.
+        When given, only the rows inside the viewport are decoded, and the
+        offset of the resulting image is set to `info['offset']`.
+    :param scale: downsampling ratio, see :py:func:`convert_reduced`.
     """
     from PIL import Image
 
@@ -61,17 +83,35 @@ def convert_image_data_to_pil(psd, channel=None, apply_icc=True, **kwargs):
         'Invalid channel specified: %s' % channel
     )
 
+    factor = get_reduction_factor(scale)
+    if factor > 1:
+        box = psd.viewbox if bbox is None else _intersect(psd.viewbox, bbox)
+        seekable = psd._record.image_data.compression in _SEEKABLE
+        return convert_reduced(
+            lambda band: convert_image_data_to_pil(
+                psd, channel, apply_icc, band, **kwargs
+            ), box, factor, seekable
+        )
+
     # Support alpha channel via ChannelID enum.
     if channel == ChannelID.TRANSPARENCY_MASK:
         channel = get_pil_channels(get_pil_mode(psd.color_mode))
         if channel >= psd.channels:
             return None
 
+    region, rows = None, None
+    if bbox is not None:
+        region = _get_region(psd, bbox)
+        if region is None:
+            return None
+        rows = (region[1], region[3])
+
     alpha = None
     icc = None
-    channel_data = psd._record.image_data.get_data(psd._record.header)
-    size = (psd.width, psd.height)
+    image_data = psd._record.image_data
+    size = (psd.width, psd.height if rows is None else rows[1] - rows[0])
     if channel is None:
+        channel_data = image_data.get_data(psd._record.header, rows=rows)
         channels = [_create_image(size, c, psd.depth) for c in channel_data]
 
         if _get_alpha_use(psd):
@@ -89,32 +129,225 @@ def convert_image_data_to_pil(psd, channel=None, apply_icc=True, **kwargs):
         if apply_icc and (Resource.ICC_PROFILE in psd.image_resources):
             icc = psd.image_resources.get_data(Resource.ICC_PROFILE)
     else:
-        image = _create_image(size, channel_data[channel], psd.depth)
+        channel_data = image_data.get_data(psd._record.header, channel, rows)
+        image = _create_image(size, channel_data, psd.depth)
 
     if not image:
         return None
 
+    if region is not None and (region[0], region[2]) != (0, psd.width):
+        box = (region[0], 0, region[2], image.height)
+        image = image.crop(box)
+        alpha = alpha.crop(box) if alpha else None
+
     image = _post_process(image, alpha, icc)
-    return _remove_white_background(image)
+    image = _remove_white_background(image)
+    if region is not None:
+        image.info['offset'] = region[:2]
+    return image
 
 
-def convert_layer_to_pil(layer, channel=None, apply_icc=True, **kwargs):
-    """Convert Layer to PIL Image."""
-    from PIL import Image
+def convert_layer_to_pil(
+    layer, channel=None, apply_icc=True, bbox=None, scale=None, **kwargs
+):
+    """Convert Layer to PIL Image.
+
+    :param bbox: viewport (left, top, right, bottom) wrt the psd viewport.
+        When given, only the rows of the channels inside the viewport are
+        decoded, and the offset of the resulting image is set to
+        `info['offset']`. Masks are cropped to the viewport in the same way.
+    :param scale: downsampling ratio, see :py:func:`convert_reduced`.
+    """
+    factor = get_reduction_factor(scale)
+    if factor > 1:
+        box = _get_channel_box(layer, channel)
+        if bbox is not None:
+            box = _intersect(box, bbox)
+        seekable = all(
+            channel_data.compression in _SEEKABLE
+            for channel_data in layer._channels
+        )
+        limit = None
+        if channel is None:
+            limit = (
+                max(box[2], layer._psd.width), max(box[3], layer._psd.height)
+            )
+        return convert_reduced(
+            lambda band: convert_layer_to_pil(
+                layer, channel, apply_icc, band, **kwargs
+            ), box, factor, seekable, limit
+        )
+
+    region = None
+    if bbox is not None:
+        region = _get_region(layer, bbox, channel)
+        if region is None:
+            return None
+
     alpha = None
     icc = None
     if channel is None:
-        image = _merge_channels(layer)
-        alpha = _get_channel(layer, ChannelID.TRANSPARENCY_MASK)
+        image = _merge_channels(layer, region)
+        alpha = _get_channel(layer, ChannelID.TRANSPARENCY_MASK, region)
         if apply_icc and (Resource.ICC_PROFILE in layer._psd.image_resources):
             icc = layer._psd.image_resources.get_data(Resource.ICC_PROFILE)
     else:
-        image = _get_channel(layer, channel)
+        image = _get_channel(layer, channel, region)
+
+    if image and not (channel is not None and channel < 0):
+        image = _post_process(image, alpha, icc)
+    if image and region is not None:
+        left, top = _get_channel_box(layer, channel)[:2]
+        image.info['offset'] = (left + region[0], top + region[1])
+    return image  # None, alpha or mask are returned as they are.
+
+
+def get_reduction_factor(scale):
+    """
+    Get the integer downsampling factor of the scale.
+
+    :param scale: ratio `1 / n` for a positive integer `n`, or `None`.
+    :return: `int`
+    :raise ValueError: if the scale is not the reciprocal of an integer.
+    """
+    if scale is None:
+        return 1
+    if not 0 < scale <= 1:
+        raise ValueError('Invalid scale: %r' % (scale, ))
+    factor = int(round(1. / scale))
+    if abs(factor * scale - 1.) > 1e-6:
+        raise ValueError(
+            'Scale must be 1 / n for an integer n, given %r' % (scale, )
+        )
+    return factor
+
+
+def convert_reduced(convert, box, factor, seekable=True, limit=None):
+    """
+    Convert a region band by band, and downsample each band by `factor` with
+    a box filter, so that the full resolution image is never materialized.
+
+    The resulting size is the region size divided by `factor` and rounded
+    up, and its offset is set to `info['offset']` in the reduced coordinates.
+
+    :param convert: callable that takes a (left, top, right, bottom) tuple
+        and returns the `PIL.Image` of the rows, or `None`.
+    :param box: region (left, top, right, bottom) wrt the psd viewport.
+    :param factor: integer downsampling factor.
+    :param seekable: whether rows can be decoded from any position. When
+        `False`, the region is converted at once to avoid decompressing
+        zlib streams repeatedly.
+    :param limit: (right, bottom) tuple. When given, the region is extended
+        with transparent pixels to the grid of `factor` pixels of the psd
+        viewport, but not beyond `limit`, so that reduced layers line up
+        with each other. See :py:func:`align_image`.
+    :return: `PIL.Image` or `None`.
+    """
+    from PIL import Image
+
+    left, top, right, bottom = box
+    if right <= left or bottom <= top:
+        return None
+    aligned = box if limit is None else _align_box(box, factor, limit)
+    step = factor * max(1, _BAND_SIZE // factor) if seekable else bottom - top
+    size = (
+        -(-(aligned[2] - aligned[0]) // factor),
+        -(-(aligned[3] - aligned[1]) // factor),
+    )
+    image = None
+    for y in range(aligned[1], bottom, step):
+        offset = (left, max(y, top))
+        band = convert(offset + (right, min(y + step, bottom)))
+        if band is None:
+            return None
+        if limit is not None:
+            band_box = (aligned[0], y, aligned[2], min(y + step, aligned[3]))
+            band = _pad_image(band, offset, band_box)
+        band = reduce_image(band, factor)
+        if image is None:
+            image = Image.new(band.mode, size)
+        image.paste(band, (0, (y - aligned[1]) // factor))
+    image.info['offset'] = (aligned[0] // factor, aligned[1] // factor)
+    return image
+
+
+def align_image(image, offset, factor, limit=None):
+    """
+    Extend the image with transparent pixels to the grid of `factor` pixels
+    of the psd viewport, so that reduced images line up with each other.
+
+    Images in modes without an alpha variant are returned as they are.
+
+    :param image: `PIL.Image`.
+    :param offset: offset of the image wrt the psd viewport.
+    :param factor: integer downsampling factor.
+    :param limit: optional (right, bottom) tuple not to extend beyond.
+    :return: (`PIL.Image`, offset) tuple.
+    """
+    box = tuple(offset) + (
+        offset[0] + image.width, offset[1] + image.height
+    )
+    aligned = _align_box(box, factor, limit)
+    return _pad_image(image, offset, aligned), aligned[:2]
+
 
-    if not image or (channel is not None and channel < 0):
-        return image  # Return None, alpha or mask.
+def _align_box(box, factor, limit=None):
+    left = box[0] - box[0] % factor
+    top = box[1] - box[1] % factor
+    right = -(-box[2] // factor) * factor
+    bottom = -(-box[3] // factor) * factor
+    if limit is not None:
+        right = max(box[2], min(right, limit[0]))
+        bottom = max(box[3], min(bottom, limit[1]))
+    return left, top, right, bottom
 
-    return _post_process(image, alpha, icc)
+
+def _pad_image(image, offset, box):
+    """Paste the image at the offset into a transparent image of the box."""
+    from PIL import Image
+    size = (box[2] - box[0], box[3] - box[1])
+    mode = _ALPHA_MODES.get(image.mode)
+    if tuple(offset) == tuple(box[:2]) and image.size == size or not mode:
+        return image
+    padded = Image.new(mode, size)
+    padded.paste(
+        image.convert(mode), (offset[0] - box[0], offset[1] - box[1])
+    )
+    return padded
+
+
+def reduce_image(image, factor):
+    """
+    Downsample the image by the integer factor with a box filter.
+
+    Each output pixel averages the `factor` x `factor` block of the input,
+    or the part of the block inside the image at the right and bottom
+    edges, so that bands reduced separately match the whole image reduced
+    at once. Pixels are averaged with premultiplied alpha. Bitmap and
+    indexed images are converted to grayscale and RGB(A) images.
+    """
+    from PIL import Image
+    if image.mode == '1':
+        image = image.convert('L')
+    elif image.mode == 'P':
+        image = image.convert(
+            'RGBA' if 'transparency' in image.info else 'RGB'
+        )
+    if not hasattr(image, 'reduce'):
+        # Pillow < 7.0 approximates the edge blocks.
+        size = (-(-image.width // factor), -(-image.height // factor))
+        return image.resize(size, Image.BOX)
+    premultiplied = _PREMULTIPLIED_MODES.get(image.mode)
+    if premultiplied is None:
+        return image.reduce(factor)
+    return image.convert(premultiplied).reduce(factor).convert(image.mode)
+
+
+def _intersect(box, bbox):
+    return (
+        max(box[0], bbox[0]), max(box[1], bbox[1]), min(box[2], bbox[2]),
+        min(box[3], bbox[3])
+    )
 
 
 def _post_process(image, alpha, icc_profile):
@@ -185,12 +418,38 @@ def _get_alpha_use(psd):
     return False
 
 
-def _merge_channels(layer):
+def _get_region(layer, bbox, channel=None):
+    """Get the box of the viewport in the layer or mask coordinates."""
+    box = _get_channel_box(layer, channel)
+    left = max(bbox[0] - box[0], 0)
+    top = max(bbox[1] - box[1], 0)
+    right = min(bbox[2], box[2]) - box[0]
+    bottom = min(bbox[3], box[3]) - box[1]
+    if right <= left or bottom <= top:
+        return None
+    return (left, top, right, bottom)
+
+
+def _get_channel_box(layer, channel):
+    """Get the box of the channel wrt the psd viewport."""
+    if channel == ChannelID.USER_LAYER_MASK:
+        data = layer.mask._data
+        return data.left, data.top, data.right, data.bottom
+    elif channel == ChannelID.REAL_USER_LAYER_MASK:
+        data = layer.mask._data
+        return data.real_left, data.real_top, data.real_right, data.real_bottom
+    return (
+        layer.left, layer.top, layer.left + layer.width,
+        layer.top + layer.height
+    )
+
+
+def _merge_channels(layer, region=None):
     from PIL import Image
     mode = get_pil_mode(layer._psd.color_mode)
     channels = [
-        _get_channel(layer, info.id) for info in layer._record.channel_info
-        if info.id >= 0
+        _get_channel(layer, info.id, region)
+        for info in layer._record.channel_info if info.id >= 0
     ]
     if any(image is None for image in channels):
         return None
@@ -198,25 +457,31 @@ def _merge_channels(layer):
     return Image.merge(mode, channels)
 
 
-def _get_channel(layer, channel):
-    if channel == ChannelID.USER_LAYER_MASK:
-        width = layer.mask._data.right - layer.mask._data.left
-        height = layer.mask._data.bottom - layer.mask._data.top
-    elif channel == ChannelID.REAL_USER_LAYER_MASK:
-        width = layer.mask._data.real_right - layer.mask._data.real_left
-        height = layer.mask._data.real_bottom - layer.mask._data.real_top
-    else:
-        width, height = layer.width, layer.height
+def _get_channel(layer, channel, region=None):
+    left, top, right, bottom = _get_channel_box(layer, channel)
+    width, height = right - left, bottom - top
 
     index = {info.id: i for i, info in enumerate(layer._record.channel_info)}
     if channel not in index:
         return None
     depth = layer._psd.depth
     channel_data = layer._channels[index[channel]]
-    if width == 0 or height == 0 or len(channel_data.data) == 0:
+    if width == 0 or height == 0 or channel_data._length <= 2:
         return None
-    channel = channel_data.get_data(width, height, depth, layer._psd.version)
-    return _create_image((width, height), channel, depth)
+    if region is None:
+        channel = channel_data.get_data(
+            width, height, depth, layer._psd.version
+        )
+        return _create_image((width, height), channel, depth)
+
+    left, top, right, bottom = region
+    channel = channel_data.get_data(
+        width, height, depth, layer._psd.version, (top, bottom)
+    )
+    image = _create_image((width, bottom - top), channel, depth)
+    if left > 0 or right < width:
+        image = image.crop((left, 0, right, bottom - top))
+    return image
 
 
 def _create_image(size, data, depth):
@@ -224,8 +489,8 @@ def _create_image(size, data, depth):
     if depth == 8:
         return Image.frombytes('L', size, data, 'raw')
     elif depth == 16:
-        image = Image.frombytes('I', size, data, 'raw', 'I;16B')
-        return image.point(lambda x: x * (1. / 256.)).convert('L')
+        # Decode the high bytes, which equals scaling by 1 / 256.
+        return Image.frombytes('L', size, data, 'raw', 'L;16B')
     elif depth == 32:
         image = Image.frombytes('F', size, data, 'raw', 'F;32BF')
         # TODO: Check grayscale range.
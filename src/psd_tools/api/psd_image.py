@@ -2,17 +2,23 @@
 PSD Image module.
 """
 from __future__ import absolute_import, unicode_literals
+import attr
 import logging
+import mmap as _mmap
+import os
 
 from psd_tools.constants import (
     Clipping, Compression, ColorMode, SectionDivider, Resource, Tag
 )
 from psd_tools.psd import PSD, FileHeader, ImageData, ImageResources
+from psd_tools.psd.layer_and_mask import ChannelData
+from psd_tools.utils import BufferReader
 from psd_tools.api.layers import (
     Artboard, Group, PixelLayer, ShapeLayer, SmartObjectLayer, TypeLayer,
     GroupMixin
 )
 from psd_tools.api import adjustments
+from psd_tools.api import numpy_io
 from psd_tools.api import pil_io
 from psd_tools.api import deprecated
 
@@ -42,6 +48,13 @@ class PSDImage(GroupMixin):
         self._record = data
         self._layers = []
         self._tagged_blocks = None
+        self._fp = None
+        self._mmap = None
+        self._source_stat = None
+        self._composed = None
+        self._dirty = []
+        self._patterns = None
+        self._pattern_panels = {}
         self._init()
 
     @classmethod
@@ -52,6 +65,8 @@ class PSDImage(GroupMixin):
         :param mode: The color mode to use for the new image.
         :param size: A tuple containing (width, height) in pixels.
         :param color: What color to use for the image. Default is black.
+        :param workers: parallel compression option, see
+            :py:func:`~psd_tools.compression.compress`.
         :return: A :py:class:`~psd_tools.api.psd_image.PSDImage` object.
         """
         header = cls._make_header(mode, size, depth)
@@ -66,13 +81,15 @@ class PSDImage(GroupMixin):
         )
 
     @classmethod
-    def frompil(cls, image, compression=Compression.PACK_BITS):
+    def frompil(cls, image, compression=Compression.PACK_BITS, workers=None):
         """
         Create a new PSD document from PIL Image.
 
         :param image: PIL Image object.
         :param compression: ImageData compression option. See
             :py:class:`~psd_tools.constants.Compression`.
+        :param workers: parallel compression option, see
+            :py:func:`~psd_tools.compression.compress`.
         :return: A :py:class:`~psd_tools.api.psd_image.PSDImage` object.
         """
         header = cls._make_header(image.mode, image.size)
@@ -80,7 +97,7 @@ class PSDImage(GroupMixin):
         # TODO: Perhaps make this smart object.
         image_data = ImageData(compression=compression)
         image_data.set_data([channel.tobytes() for channel in image.split()],
-                            header)
+                            header, workers)
         return cls(
             PSD(
                 header=header,
@@ -90,22 +107,103 @@ class PSDImage(GroupMixin):
         )
 
     @classmethod
-    def open(cls, fp, **kwargs):
+    def open(cls, fp, lazy=False, mmap=False, load_pixels=True, **kwargs):
         """
         Open a PSD document.
 
+        Example::
+
+            with PSDImage.open('example.psb', lazy=True) as psd:
+                image = psd[0].topil()
+
         :param fp: filename or file-like object.
         :param encoding: charset encoding of the pascal string within the file,
             default 'macroman'. Some psd files need explicit encoding option.
+        :param lazy: read layer channel data and decode tagged blocks on
+            first access instead of at open time. When `fp` is a filename,
+            the file stays open until :py:meth:`close` is called. When `fp`
+            is a file-like object, it must stay open while the document is in
+            use.
+        :param mmap: map the file into memory instead of reading it. Channel
+            data, image data, linked layer data and pattern data become
+            `memoryview` slices of the map, which is released by
+            :py:meth:`close` once no such slice remains. `fp` must be a
+            filename or a file object with a `fileno`, and the file must not
+            be modified while the document is in use.
+        :param load_pixels: when `False`, only parse the document structure
+            and skip over layer channel data and merged image data, for
+            example to index layer names and bounding boxes. Tagged blocks
+            are decoded on first access. When `fp` is a filename, the file is
+            closed on return and pixel data is unavailable; otherwise this is
+            the same as `lazy`.
         :return: A :py:class:`~psd_tools.api.psd_image.PSDImage` object.
         """
+        if mmap:
+            return cls._open_mmap(fp, lazy=lazy, **kwargs)
+        lazy = lazy or not load_pixels
         if hasattr(fp, 'read'):
-            self = cls(PSD.read(fp, **kwargs))
+            self = cls(PSD.read(fp, lazy=lazy, **kwargs))
+        elif lazy:
+            f = open(fp, 'rb')
+            try:
+                self = cls(PSD.read(f, lazy=lazy, **kwargs))
+            except Exception:
+                f.close()
+                raise
+            if load_pixels:
+                self._fp = f
+                self._source_stat = os.fstat(f.fileno())
+            else:
+                f.close()
         else:
             with open(fp, 'rb') as f:
                 self = cls(PSD.read(f, **kwargs))
         return self
 
+    @classmethod
+    def _open_mmap(cls, fp, **kwargs):
+        f = fp if hasattr(fp, 'read') else open(fp, 'rb')
+        try:
+            data = _mmap.mmap(f.fileno(), 0, access=_mmap.ACCESS_READ)
+            try:
+                self = cls(PSD.read(BufferReader(data), **kwargs))
+            except Exception:
+                try:
+                    data.close()
+                except BufferError:
+                    pass
+                raise
+        except Exception:
+            if f is not fp:
+                f.close()
+            raise
+        if f is not fp:
+            self._fp = f
+        self._mmap = data
+        self._source_stat = os.fstat(f.fileno())
+        return self
+
+    def close(self):
+        """
+        Close the file opened by :py:meth:`open` in lazy or mmap mode. Channel
+        data that has not been read becomes unavailable.
+        """
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass  # Unmapped when the remaining slices are released.
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
     def save(self, fp, mode='wb', **kwargs):
         """
         Save the PSD file.
@@ -118,6 +216,9 @@ class PSDImage(GroupMixin):
         if hasattr(fp, 'write'):
             self._record.write(fp, **kwargs)
         else:
+            if self._source_stat is not None and os.path.exists(fp) and \
+                    os.path.samestat(os.stat(fp), self._source_stat):
+                self._read_source()  # The file is truncated on open.
             with open(fp, mode) as f:
                 self._record.write(f, **kwargs)
 
@@ -128,6 +229,10 @@ class PSDImage(GroupMixin):
         :param channel: Which channel to return; e.g., 0 for 'R' channel in RGB
             image. See :py:class:`~psd_tools.constants.ChannelID`. When `None`,
             the method returns all the channels supported by PIL modes.
+        :param bbox: viewport (left, top, right, bottom) to crop. Only the
+            rows and the channels to return are decoded from the file.
+        :param scale: downsampling ratio `1 / n`, see
+            :py:meth:`~psd_tools.api.layers.Layer.topil`.
         :return: :py:class:`PIL.Image`, or `None` if the composed image is not
             available.
         """
@@ -135,31 +240,184 @@ class PSDImage(GroupMixin):
             return pil_io.convert_image_data_to_pil(self, channel, **kwargs)
         return None
 
-    def compose(self, force=False, bbox=None, layer_filter=None, **kwargs):
+    def numpy(self, channel=None, dtype=None):
+        """
+        Get NumPy array of the composed image stored in the file.
+
+        See :py:meth:`~psd_tools.api.layers.Layer.numpy` for the channels
+        and the dtype.
+
+        :param channel: Which channel to return, see :py:meth:`topil`.
+        :param dtype: output dtype.
+        :return: :py:class:`numpy.ndarray`, or `None` if the composed image is
+            not available.
+        """
+        if self.has_preview():
+            return numpy_io.convert_image_data_to_array(self, channel, dtype)
+        return None
+
+    def compose(
+        self,
+        force=False,
+        bbox=None,
+        layer_filter=None,
+        workers=None,
+        incremental=False,
+        **kwargs
+    ):
         """
         Compose the PSD image.
 
         See :py:func:`~psd_tools.compose` for available extra arguments.
 
         :param bbox: Viewport tuple (left, top, right, bottom).
+        :param workers: number of threads, or an executor, to compose the
+            image in parallel bands. See :py:func:`~psd_tools.compose`.
+        :param scale: downsampling ratio `1 / n` for previews, see
+            :py:func:`~psd_tools.compose`. The stored composite is decoded
+            band by band when it is available.
+        :param incremental: keep a copy of the composed image, so that the
+            next call with `incremental=True` and the same arguments
+            recomposes only the regions changed through the `visible`,
+            `opacity`, `blend_mode`, and `offset` setters of layers. Call
+            :py:meth:`invalidate` after modifying the document in other
+            ways, e.g., channel data. Otherwise, the kept image is released.
         :return: :py:class:`PIL.Image`, or `None` if there is no pixel.
         """
-        from psd_tools.composer import compose
+        from psd_tools.composer import compose, intersect
         image = None
-        if (not force or len(self) == 0) and not bbox and not layer_filter:
-            image = self.topil(**kwargs)
-        if image is None:
+        if (not force or len(self) == 0) and not layer_filter:
+            if not bbox:
+                image = self.topil(**kwargs)
+            elif intersect(bbox, self.viewbox) == tuple(bbox):
+                image = self.topil(bbox=bbox, **kwargs)
+        if image is None and kwargs.get('scale') is not None:
             image = compose(
                 self,
                 bbox=bbox or self.viewbox,
                 force=force,
                 layer_filter=layer_filter,
+                workers=workers,
                 **kwargs
             )
-        elif bbox is not None:
-            image = image.crop(bbox)
+        elif image is None:
+            key = (bbox or self.viewbox, force, layer_filter, kwargs)
+            if incremental:
+                image = self._recompose(key, workers)
+            if image is None:
+                image = compose(
+                    self,
+                    bbox=key[0],
+                    force=force,
+                    layer_filter=layer_filter,
+                    workers=workers,
+                    **kwargs
+                )
+            if incremental and image:
+                self._composed = (key, image.copy())
+            else:
+                self._composed = None
+            self._dirty = []
         return image
 
+    def invalidate(self, bbox=None):
+        """
+        Mark a region of the document as changed, so that the next
+        incremental :py:meth:`compose` call recomposes the region.
+
+        :param bbox: (left, top, right, bottom) tuple of the changed region.
+            When `None`, the whole document is recomposed, and the decoded
+            patterns are also discarded.
+        """
+        if bbox is None:
+            self._composed = None
+            self._dirty = []
+            self._patterns = None
+            self._pattern_panels = {}
+        else:
+            self._invalidate(bbox)
+
+    def _invalidate(self, bbox):
+        if self._composed is not None and bbox != (0, 0, 0, 0):
+            self._dirty.append(tuple(bbox))
+
+    def _recompose(self, key, workers=None):
+        """Recompose the dirty regions of the last composed image."""
+        from psd_tools.composer import compose, intersect
+        if self._composed is None or self._composed[0] != key:
+            return None
+        bbox, force, layer_filter, kwargs = key
+        image = self._composed[1].copy()
+        for dirty in self._dirty:
+            region = intersect(bbox, dirty)
+            if region == (0, 0, 0, 0):
+                continue
+            logger.debug('Recomposing %r' % (region, ))
+            part = compose(
+                self,
+                bbox=region,
+                force=force,
+                layer_filter=layer_filter,
+                workers=workers,
+                **kwargs
+            )
+            if part is None:
+                return None
+            image.paste(part, (region[0] - bbox[0], region[1] - bbox[1]))
+        return image
+
+    def compose_tiles(
+        self, tile_size=1024, bbox=None, layer_filter=None, **kwargs
+    ):
+        """
+        Compose the PSD image tile by tile with bounded memory.
+
+        See :py:func:`~psd_tools.composer.compose_tiles` for details.
+
+        Example::
+
+            psd = PSDImage.open('huge.psb', lazy=True)
+            for tile in psd.compose_tiles(tile_size=1024):
+                tile.save('tile_%d_%d.png' % tile.info['offset'])
+
+        :param tile_size: size of the tiles in `int` or (width, height) tuple.
+        :param bbox: Viewport tuple (left, top, right, bottom).
+        :return: iterator of :py:class:`PIL.Image` tiles.
+        """
+        from psd_tools.composer import compose_tiles
+        return compose_tiles(
+            self,
+            tile_size=tile_size,
+            bbox=bbox or self.viewbox,
+            layer_filter=layer_filter,
+            **kwargs
+        )
+
+    def compose_array(
+        self, bbox=None, layer_filter=None, dtype=None, **kwargs
+    ):
+        """
+        Compose the PSD image to an array at the precision of the document.
+
+        See :py:func:`~psd_tools.composer.compose_array` for details.
+
+        Example::
+
+            array = psd.compose_array(dtype='uint16')
+
+        :param bbox: Viewport tuple (left, top, right, bottom).
+        :param dtype: output dtype.
+        :return: :py:class:`numpy.ndarray`, or `None` if there is no layer.
+        """
+        from psd_tools.composer import compose_array
+        return compose_array(
+            self,
+            bbox=bbox or self.viewbox,
+            layer_filter=layer_filter,
+            dtype=dtype,
+            **kwargs
+        )
+
     def is_visible(self):
         """
         Returns visibility of the element.
@@ -466,13 +724,24 @@ class PSDImage(GroupMixin):
 
     def _get_pattern(self, pattern_id):
         """Get pattern item by id."""
-        for key in (Tag.PATTERNS1, Tag.PATTERNS2, Tag.PATTERNS3):
-            if key in self.tagged_blocks:
-                data = self.tagged_blocks.get_data(key)
-                for pattern in data:
-                    if pattern.pattern_id == pattern_id:
-                        return pattern
-        return None
+        if self._patterns is None:
+            self._patterns = {}
+            for key in (Tag.PATTERNS3, Tag.PATTERNS2, Tag.PATTERNS1):
+                if key in self.tagged_blocks:
+                    data = self.tagged_blocks.get_data(key)
+                    for pattern in reversed(data):
+                        self._patterns[pattern.pattern_id] = pattern
+        return self._patterns.get(pattern_id)
+
+    def _read_source(self):
+        """Read all the data that still refers to the source file."""
+        for element in self._record._find(lambda x: attr.has(x.__class__)):
+            if isinstance(element, (ChannelData, ImageData)):
+                element.data  # Load lazy pixel data.
+            for field in attr.fields(element.__class__):
+                value = getattr(element, field.name)
+                if isinstance(value, memoryview):
+                    setattr(element, field.name, value.tobytes())
 
     def _init(self):
         """Initialize layer structure."""
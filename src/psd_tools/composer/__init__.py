@@ -5,20 +5,33 @@ Composer takes responsibility of rendering layers as an image.
 """
 from __future__ import absolute_import, unicode_literals
 import logging
+import multiprocessing
 
-from psd_tools.constants import Tag, BlendMode
-from psd_tools.api.pil_io import get_pil_mode
-from psd_tools.api.layers import Group
+from psd_tools.constants import Tag, BlendMode, ColorMode
+from psd_tools.api.pil_io import (
+    align_image, get_pil_mode, get_reduction_factor, reduce_image
+)
+from psd_tools.api.layers import Group, _get_extent
+from psd_tools.api.numpy_io import convert_dtype, get_dtype
 from psd_tools.composer.blend import blend
+from psd_tools.composer.cache import (  # noqa: F401
+    SharedRenders, compose_cached, enable_cache, disable_cache, get_cache,
+    memoize_fingerprints
+)
+from psd_tools.composer.canvas import Canvas
 from psd_tools.composer.effects import create_stroke_effect
 from psd_tools.composer.vector import (
     draw_pattern_fill, draw_gradient_fill, draw_solid_color_fill,
     draw_vector_mask, draw_stroke
 )
 from psd_tools.terminology import Enum, Key
+from psd_tools.utils import map_workers
 
 logger = logging.getLogger(__name__)
 
+# Size of the tiles composed at once for reduced images.
+_TILE_SIZE = 1024
+
 
 def union(*bboxes):
     if len(bboxes) == 0:
@@ -44,12 +57,15 @@ def intersect(*bboxes):
     return result
 
 
+@memoize_fingerprints
 def compose(
     layers,
     bbox=None,
     context=None,
     layer_filter=None,
     color=None,
+    workers=None,
+    scale=None,
     **kwargs
 ):
     """
@@ -93,6 +109,20 @@ def compose(
         be used with the correct `bbox` size.
     :param layer_filter: a callable that takes a layer and returns `bool`.
     :param color: background color in `int` or `tuple`.
+    :param workers: number of threads, or an executor such as
+        :py:class:`concurrent.futures.ProcessPoolExecutor`, to compose
+        horizontal bands of `bbox` in parallel. The bands are stitched into
+        the same image as the single-threaded rendering. Process executors
+        require layers that can be pickled, i.e., a document that is not
+        opened with `lazy` or `mmap` option.
+    :param scale: downsampling ratio `1 / n` for previews, where `n` is an
+        integer. Layers are composed on a canvas of the reduced resolution
+        aligned to the grid of `n` pixels, and the offset in the reduced
+        coordinates is kept in `info['offset']`. Pixel layers and groups
+        without masks, effects, or clipping are decoded band by band and
+        reduced with a box filter before blending. Other layers are rendered
+        at full resolution, in tiles unless they have effects, and then
+        reduced. Cannot be used with `context`, and `workers` is ignored.
     :param kwargs: arguments passed to underling `topil()` call.
     :return: :py:class:`PIL.Image` or `None`.
     """
@@ -101,9 +131,6 @@ def compose(
     if not hasattr(layers, '__iter__'):
         layers = [layers]
 
-    def _default_filter(layer):
-        return layer.is_visible()
-
     layer_filter = layer_filter or _default_filter
     valid_layers = [x for x in layers if layer_filter(x)]
     if len(valid_layers) == 0:
@@ -114,6 +141,14 @@ def compose(
         if bbox == (0, 0, 0, 0):
             return context
 
+    factor = get_reduction_factor(scale)
+    if factor > 1:
+        if context is not None:
+            raise ValueError('context cannot be used with scale')
+        return _compose_reduced(
+            layers, bbox, factor, layer_filter, color, **kwargs
+        )
+
     if context is None:
         mode = get_pil_mode(valid_layers[0]._psd.color_mode, True)
         context = Image.new(
@@ -124,8 +159,512 @@ def compose(
         context.putalpha(0)  # Alpha must be forced to correctly blend.
         context.info['offset'] = (bbox[0], bbox[1])
 
-    for layer in valid_layers:
-        if intersect(layer.bbox, bbox) == (0, 0, 0, 0):
+    if workers is not None and workers != 1:
+        context = _compose_bands(
+            valid_layers, bbox, context, layer_filter, workers, **kwargs
+        )
+    else:
+        context = _compose_context(
+            valid_layers, bbox, context, layer_filter, **kwargs
+        )
+
+    logger.debug('Composing: %s' % layers)
+    if isinstance(layers, Group):
+        context = _apply_layer_ops(layers, context, bbox=bbox)
+
+    return context
+
+
+def _default_filter(layer):
+    return layer.is_visible()
+
+
+def _compose_context(layers, bbox, context, layer_filter, **kwargs):
+    """Blend layers into the context."""
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        context = _compose_pil(layers, bbox, context, layer_filter, **kwargs)
+    else:
+        canvas = Canvas(context, offset=(bbox[0], bbox[1]))
+        _compose_canvas(canvas, layers, layer_filter, **kwargs)
+        context = canvas.topil()
+    return context
+
+
+def _compose_bands(layers, bbox, context, layer_filter, workers, **kwargs):
+    """Blend layers into horizontal bands of the context in parallel."""
+    if isinstance(workers, int):
+        count = workers
+    else:
+        count = multiprocessing.cpu_count()
+    height = bbox[3] - bbox[1]
+    step = max(1, -(-height // count))
+    bands = [(top, min(top + step, height)) for top in range(0, height, step)]
+    contexts = map_workers(
+        _compose_band,
+        [layers] * len(bands),
+        [bbox] * len(bands),
+        [context.crop((0, top, context.width, stop)) for top, stop in bands],
+        bands,
+        [layer_filter] * len(bands),
+        [kwargs] * len(bands),
+        [SharedRenders()] * len(bands),
+        workers=workers,
+    )
+    for (top, _), band in zip(bands, contexts):
+        context.paste(band, (0, top))
+    return context
+
+
+def _compose_band(layers, bbox, context, band, layer_filter, kwargs, shared):
+    """
+    Blend layers into a single band of the context. Layers rendered whole
+    are shared with the other bands in threads.
+    """
+    bbox = (bbox[0], bbox[1] + band[0], bbox[2], bbox[1] + band[1])
+    with shared:
+        return _compose_context(layers, bbox, context, layer_filter, **kwargs)
+
+
+def compose_tiles(
+    layers, tile_size=1024, bbox=None, layer_filter=None, **kwargs
+):
+    """
+    Compose layers tile by tile.
+
+    Tiles are rendered one at a time by :py:func:`compose`, and each layer
+    decodes only the rows that the tile intersects, so that peak memory is
+    proportional to the tile size rather than the canvas size. Layers with
+    effects are rendered in their entirety once, and kept only until the
+    tile rows they reach are done. For huge documents, open
+    the file with `lazy=True` to also keep channel data out of memory until
+    it is needed.
+
+    Example::
+
+        image = Image.new('RGBA', psd.size)
+        for tile in compose_tiles(psd, tile_size=512):
+            image.paste(tile, tile.info['offset'])
+
+    :param layers: a layer, or an iterable of layers.
+    :param tile_size: size of the tiles in `int` or (width, height) tuple.
+    :param bbox: (left, top, right, bottom) tuple that specifies a region to
+        compose. By default, all the visible area is composed.
+    :param layer_filter: a callable that takes a layer and returns `bool`.
+    :param kwargs: arguments passed to :py:func:`compose`.
+    :return: iterator of :py:class:`PIL.Image` tiles, in the row-major order.
+        The offset of each tile is kept in `info['offset']` field.
+    """
+    if not hasattr(layers, '__iter__'):
+        layers = [layers]
+
+    if isinstance(tile_size, int):
+        tile_size = (tile_size, tile_size)
+    assert tile_size[0] > 0 and tile_size[1] > 0, (
+        'Invalid tile size: %r' % (tile_size, )
+    )
+
+    if bbox is None:
+        layer_filter_ = layer_filter or (lambda x: x.is_visible())
+        bbox = Group.extract_bbox([x for x in layers if layer_filter_(x)])
+        if bbox == (0, 0, 0, 0):
+            return
+
+    shared = SharedRenders()
+    for top in range(bbox[1], bbox[3], tile_size[1]):
+        bottom = min(top + tile_size[1], bbox[3])
+        for left in range(bbox[0], bbox[2], tile_size[0]):
+            right = min(left + tile_size[0], bbox[2])
+            with shared:
+                image = compose(
+                    layers,
+                    bbox=(left, top, right, bottom),
+                    layer_filter=layer_filter,
+                    **kwargs
+                )
+            if image is None:
+                return
+            image.info['offset'] = (left, top)
+            yield image
+        shared.release(bottom)
+
+
+def _compose_reduced(layers, bbox, factor, layer_filter, color, **kwargs):
+    """
+    Compose layers into a canvas of the reduced resolution.
+
+    Pixel layers and groups without masks, effects, or clipping are decoded
+    band by band and reduced before blending. Other layers are rendered at
+    full resolution, in tiles if they can be cropped, and then reduced.
+    """
+    from PIL import Image
+
+    if isinstance(layers, Group):
+        valid_layers = [layers]
+    else:
+        valid_layers = [x for x in layers if layer_filter(x)]
+    box = _reduce_box(bbox, factor)
+    mode = get_pil_mode(valid_layers[0]._psd.color_mode, True)
+    context = Image.new(
+        mode,
+        (box[2] - box[0], box[3] - box[1]),
+        color=color if color is not None else 'white',
+    )
+    context.putalpha(0)
+    canvas = Canvas(context, offset=box[:2])
+    _compose_canvas_reduced(
+        canvas, valid_layers, layer_filter, factor, **kwargs
+    )
+    return canvas.topil()
+
+
+def _compose_canvas_reduced(canvas, layers, layer_filter, factor, **kwargs):
+    """Blend layers into the canvas of the reduced resolution in place."""
+    from PIL import Image
+
+    viewport = tuple(x * factor for x in canvas.bbox)
+    for layer in layers:
+        region = intersect(_get_extent(layer), viewport)
+        if region == (0, 0, 0, 0):
+            continue
+
+        if _is_reducible(layer):
+            if layer.is_group():
+                opacity = layer.tagged_blocks.get_data(
+                    Tag.BLEND_FILL_OPACITY, 255
+                ) * layer.opacity / 65025.
+                children = [x for x in layer if layer_filter(x)]
+                if layer.blend_mode == BlendMode.PASS_THROUGH:
+                    if opacity >= 1.:
+                        _compose_canvas_reduced(
+                            canvas, children, layer_filter, factor, **kwargs
+                        )
+                        continue
+                else:
+                    box = _reduce_box(region, factor)
+                    context = Image.new(
+                        'RGBA', (box[2] - box[0], box[3] - box[1])
+                    )
+                    group = Canvas(context, offset=box[:2])
+                    _compose_canvas_reduced(
+                        group, children, layer_filter, factor, **kwargs
+                    )
+                    logger.debug('Composing %s' % layer)
+                    canvas.blend_array(
+                        group.planes(), box[:2], layer.blend_mode, opacity
+                    )
+                    continue
+            else:
+                image = layer.topil(
+                    bbox=region, scale=1. / factor, **kwargs
+                )
+                if image is not None:
+                    logger.debug('Composing %s' % layer)
+                    canvas.blend(
+                        image, image.info['offset'], layer.blend_mode,
+                        _get_alpha_table(layer)
+                    )
+                continue
+
+        if _is_croppable(layer):
+            _blend_reduced_tiles(
+                canvas, layer, region, layer_filter, factor, **kwargs
+            )
+            continue
+
+        # Effects need the entire layer at full resolution.
+        if layer.is_group():
+            image = layer.compose(layer_filter=layer_filter, **kwargs)
+            alpha_table = None
+        else:
+            image = _render_layer(layer, None, None, **kwargs)
+            alpha_table = _get_alpha_table(layer)
+        if image is None:
+            continue
+        image, offset = align_image(
+            image, image.info.get('offset', layer.offset), factor
+        )
+        logger.debug('Composing %s' % layer)
+        canvas.blend(
+            reduce_image(image, factor),
+            (offset[0] // factor, offset[1] // factor), layer.blend_mode,
+            alpha_table
+        )
+
+
+def _reduce_box(bbox, factor):
+    """Get the box of the reduced pixels that cover the bbox."""
+    return (
+        bbox[0] // factor, bbox[1] // factor, -(-bbox[2] // factor),
+        -(-bbox[3] // factor)
+    )
+
+
+def _is_reducible(layer):
+    """Check if the layer can be composed at the reduced resolution."""
+    if not layer.is_group() and (
+        layer.kind != 'pixel' or not layer.has_pixels()
+    ):
+        return False
+    return not _has_mask_ops(layer)
+
+
+def _blend_reduced_tiles(
+    canvas, layer, region, layer_filter, factor, **kwargs
+):
+    """Render the layer in tiles at full resolution and blend them reduced."""
+    from PIL import Image
+    region = tuple(x * factor for x in _reduce_box(region, factor))
+    tile_size = factor * max(1, _TILE_SIZE // factor)
+    for top in range(region[1], region[3], tile_size):
+        for left in range(region[0], region[2], tile_size):
+            size = (
+                min(tile_size, region[2] - left),
+                min(tile_size, region[3] - top),
+            )
+            tile = Canvas(Image.new('RGBA', size), offset=(left, top))
+            _compose_canvas(tile, [layer], layer_filter, **kwargs)
+            canvas.blend(
+                reduce_image(tile.topil(), factor),
+                (left // factor, top // factor), layer.blend_mode
+            )
+
+
+@memoize_fingerprints
+def compose_array(
+    layers, bbox=None, layer_filter=None, dtype=None, **kwargs
+):
+    """
+    Compose layers to a :py:class:`numpy.ndarray` at the precision of the
+    document.
+
+    In 16-bit and 32-bit documents, pixel layers and groups of them are
+    decoded and blended in float32, and the result is quantized only once to
+    `dtype`. Other layers, e.g., layers with masks or effects, are rendered
+    in 8 bits as in :py:func:`compose` and then blended at the same
+    precision. ICC profiles are not applied, so that all the layers stay in
+    the color space of the document; 32-bit documents are usually linear.
+
+    Example::
+
+        array = compose_array(psd, dtype='uint16')
+
+    :param layers: a layer, or an iterable of layers.
+    :param bbox: (left, top, right, bottom) tuple that specifies a region to
+        compose. By default, all the visible area is composed.
+    :param layer_filter: a callable that takes a layer and returns `bool`.
+    :param dtype: output dtype, see
+        :py:func:`~psd_tools.api.numpy_io.convert_dtype`. By default, the
+        native dtype of the document bit depth.
+    :param kwargs: arguments passed to underling `topil()` call.
+    :return: `(height, width, channels)` array of colors and alpha, where
+        channels are LA for grayscale documents and RGBA otherwise, or
+        `None` if there is no layer to compose.
+    """
+    from PIL import Image
+
+    if isinstance(layers, Group) or not hasattr(layers, '__iter__'):
+        layers = [layers]
+
+    layer_filter = layer_filter or _default_filter
+    valid_layers = [x for x in layers if layer_filter(x)]
+    if len(valid_layers) == 0:
+        return None
+
+    if bbox is None:
+        bbox = Group.extract_bbox(valid_layers)
+        if bbox == (0, 0, 0, 0):
+            return None
+
+    # 8-bit renders must stay in the color space of the float layers.
+    kwargs['apply_icc'] = False
+    psd = valid_layers[0]._psd
+    context = Image.new(
+        'RGBA', (bbox[2] - bbox[0], bbox[3] - bbox[1]), (255, 255, 255, 0)
+    )
+    canvas = Canvas(context, offset=(bbox[0], bbox[1]), depth=psd.depth)
+    _compose_canvas(canvas, valid_layers, layer_filter, **kwargs)
+
+    planes = canvas.planes()
+    if psd.color_mode == ColorMode.GRAYSCALE:
+        planes = planes[[0, 3]]
+    array = planes.transpose((1, 2, 0))
+    if dtype is None:
+        dtype = get_dtype(psd.depth) if psd.depth > 8 else 'uint8'
+    return convert_dtype(array, 32, dtype)
+
+
+def _compose_canvas(canvas, layers, layer_filter, **kwargs):
+    """Blend layers into the canvas in place."""
+    bbox = canvas.bbox
+    for layer in layers:
+        if intersect(_get_extent(layer), bbox) == (0, 0, 0, 0):
+            continue
+
+        if canvas.depth > 8 and _is_precise(layer):
+            _blend_precise(canvas, layer, layer_filter, **kwargs)
+            continue
+
+        if layer.is_group():
+            if layer.blend_mode == BlendMode.PASS_THROUGH:
+                if not _has_layer_ops(layer):
+                    _compose_canvas(
+                        canvas, [x for x in layer if layer_filter(x)],
+                        layer_filter, **kwargs
+                    )
+                    continue
+                _context = layer.compose(
+                    context=canvas.topil(),
+                    bbox=bbox,
+                    layer_filter=layer_filter,
+                    **kwargs
+                )
+                # TODO: group opacity is not properly considered here.
+                canvas.paste(_context, _context.info.get('offset', bbox[:2]))
+                continue
+            else:
+                image = compose_cached(
+                    _compose_group, layer, _get_render_bbox(layer, bbox),
+                    layer_filter, **kwargs
+                )
+                alpha_table = None
+        else:
+            image = compose_cached(
+                _render_layer, layer, _get_render_bbox(layer, bbox), None,
+                **kwargs
+            )
+            alpha_table = _get_alpha_table(layer)
+        if image is None:
+            continue
+
+        logger.debug('Composing %s' % layer)
+        offset = image.info.get('offset', layer.offset)
+        canvas.blend(image, offset, layer.blend_mode, alpha_table)
+
+
+def _is_precise(layer):
+    """Check if the layer can be blended without 8-bit rendering."""
+    if layer.is_group():
+        if layer.blend_mode == BlendMode.PASS_THROUGH:
+            return False
+    elif layer.kind != 'pixel' or not layer.has_pixels():
+        return False
+    if layer._psd.color_mode not in (ColorMode.RGB, ColorMode.GRAYSCALE):
+        return False
+    return not _has_mask_ops(layer)
+
+
+def _has_mask_ops(layer):
+    """Check if the layer has masks, effects, or clipping layers."""
+    return (
+        layer.has_vector_mask() or
+        (layer.has_mask() and not layer.mask.disabled) or
+        layer.effects.enabled or layer.has_clip_layers()
+    )
+
+
+def _blend_precise(canvas, layer, layer_filter, **kwargs):
+    """Blend the pixel layer or the group into the canvas in float32."""
+    import numpy as np
+    from PIL import Image
+
+    bbox = intersect(_get_extent(layer), canvas.bbox)
+    if layer.is_group():
+        context = Image.new('RGBA', (bbox[2] - bbox[0], bbox[3] - bbox[1]))
+        group = Canvas(context, offset=bbox[:2], depth=canvas.depth)
+        _compose_canvas(
+            group, [x for x in layer if layer_filter(x)], layer_filter,
+            **kwargs
+        )
+        planes = group.planes()
+    else:
+        array = layer.numpy(dtype=np.float32, bbox=bbox)
+        if array is None:
+            return
+        colors = ColorMode.channels(layer._psd.color_mode)
+        planes = np.ones((4, ) + array.shape[:2], dtype=np.float32)
+        planes[:3] = array[:, :, :colors].transpose((2, 0, 1))
+        if array.shape[2] > colors:
+            planes[3] = array[:, :, colors]
+        np.clip(planes, 0., 1., out=planes)
+
+    logger.debug('Composing %s' % layer)
+    fill_opacity = layer.tagged_blocks.get_data(Tag.BLEND_FILL_OPACITY, 255)
+    canvas.blend_array(
+        planes, bbox[:2], layer.blend_mode,
+        layer.opacity * fill_opacity / 65025.
+    )
+
+
+def _get_render_bbox(layer, bbox):
+    """
+    Get the viewport that the layer is rendered in for the composition
+    viewport `bbox`, or `None` if the entire layer is rendered.
+    """
+    if not _is_croppable(layer):
+        return None
+    return intersect(_get_extent(layer), bbox)
+
+
+def _compose_group(layer, bbox, layer_filter, **kwargs):
+    """Compose the group inside the render viewport."""
+    return layer.compose(bbox=bbox, layer_filter=layer_filter, **kwargs)
+
+
+def _compose_layer(layer, bbox, layer_filter, **kwargs):
+    """Compose a single layer, `layer_filter` is ignored."""
+    return compose_layer(layer, bbox=bbox, **kwargs)
+
+
+def _render_layer(layer, bbox, layer_filter, **kwargs):
+    """
+    Compose a single layer without the opacity that
+    :py:func:`_get_alpha_table` leaves to the blend step, `layer_filter` is
+    ignored.
+    """
+    return _compose_layer_image(
+        layer, bbox=bbox, blend_opacity=True, **kwargs
+    )
+
+
+def _get_alpha_table(layer):
+    """
+    Get the alpha lookup table of the layer opacity for the blend step.
+
+    Fill opacity is folded into the table unless layer effects or clipping
+    layers are rendered from the filled pixels.
+    """
+    fill_opacity = 255
+    if not _has_fill_dependents(layer):
+        fill_opacity = layer.tagged_blocks.get_data(
+            Tag.BLEND_FILL_OPACITY, 255
+        )
+    if layer.opacity >= 255 and fill_opacity >= 255:
+        return None
+    table = _get_opacity_table(layer.opacity)
+    return [table[x] for x in _get_opacity_table(fill_opacity)]
+
+
+def _has_fill_dependents(layer):
+    return layer.effects.enabled or layer.has_clip_layers()
+
+
+def _has_layer_ops(layer):
+    """Check if :py:func:`_apply_layer_ops` changes the group image."""
+    return (
+        layer.has_vector_mask() or
+        (layer.has_mask() and not layer.mask.disabled) or
+        layer.tagged_blocks.get_data(Tag.BLEND_FILL_OPACITY, 255) < 255 or
+        layer.effects.enabled or layer.has_clip_layers() or
+        layer.opacity < 255
+    )
+
+
+def _compose_pil(layers, bbox, context, layer_filter, **kwargs):
+    """Blend layers with PIL, used when numpy is not available."""
+    for layer in layers:
+        if intersect(_get_extent(layer), bbox) == (0, 0, 0, 0):
             continue
 
         if layer.is_group():
@@ -143,9 +682,15 @@ def compose(
                 )
                 continue
             else:
-                image = layer.compose(layer_filter=layer_filter, **kwargs)
+                image = compose_cached(
+                    _compose_group, layer, _get_render_bbox(layer, bbox),
+                    layer_filter, **kwargs
+                )
         else:
-            image = compose_layer(layer, **kwargs)
+            image = compose_cached(
+                _compose_layer, layer, _get_render_bbox(layer, bbox), None,
+                **kwargs
+            )
         if image is None:
             continue
 
@@ -155,30 +700,62 @@ def compose(
 
         context = blend(context, image, offset, layer.blend_mode)
 
-    logger.debug('Composing: %s' % layers)
-    if isinstance(layers, Group):
-        context = _apply_layer_ops(layers, context)
-
     return context
 
 
-def compose_layer(layer, force=False, **kwargs):
-    """Compose a single layer with pixels."""
+def compose_layer(layer, force=False, bbox=None, **kwargs):
+    """
+    Compose a single layer with pixels.
+
+    :param bbox: viewport (left, top, right, bottom) of the composition. When
+        given, only the part of the layer inside the viewport is rendered,
+        unless layer effects need the entire layer.
+    """
+    return _compose_layer_image(layer, force=force, bbox=bbox, **kwargs)
+
+
+def _compose_layer_image(
+    layer, force=False, bbox=None, blend_opacity=False, **kwargs
+):
     assert layer.bbox != (0, 0, 0, 0), 'Layer bbox is (0, 0, 0, 0)'
 
-    image = layer.topil(**kwargs)
+    if bbox is not None:
+        if not _is_croppable(layer):
+            bbox = None
+        else:
+            bbox = intersect(layer.bbox, bbox)
+            if bbox == (0, 0, 0, 0):
+                return None
+
+    image = layer.topil(bbox=bbox, **kwargs)
     if image is None or force:
-        texture = create_fill(layer)
+        texture = create_fill(layer, bbox)
         if texture is not None:
             image = texture
     if image is None:
         return image
 
-    return _apply_layer_ops(layer, image, force=force)
+    return _apply_layer_ops(
+        layer, image, force=force, bbox=bbox, blend_opacity=blend_opacity
+    )
+
+
+def _is_croppable(layer):
+    """Check if the layer renders the same when cropped to a viewport."""
+    return not (
+        layer.effects.enabled or (layer.has_stroke() and layer.stroke.enabled)
+    )
 
 
-def _apply_layer_ops(layer, image, force=False, bbox=None):
-    """Apply layer masks, effects, and clipping."""
+def _apply_layer_ops(
+    layer, image, force=False, bbox=None, blend_opacity=False
+):
+    """
+    Apply layer masks, effects, and clipping.
+
+    When `blend_opacity` is set, the opacity given by
+    :py:func:`_get_alpha_table` is left to the blend step.
+    """
     from PIL import Image, ImageChops
     # Apply vector mask.
     if layer.has_vector_mask() and (force or not layer.has_pixels()):
@@ -199,9 +776,10 @@ def _apply_layer_ops(layer, image, force=False, bbox=None):
     image = apply_mask(layer, image, bbox=bbox)
 
     # Apply layer fill effects.
-    apply_opacity(
-        image, layer.tagged_blocks.get_data(Tag.BLEND_FILL_OPACITY, 255)
-    )
+    if not blend_opacity or _has_fill_dependents(layer):
+        apply_opacity(
+            image, layer.tagged_blocks.get_data(Tag.BLEND_FILL_OPACITY, 255)
+        )
     if layer.effects.enabled:
         image = apply_effect(layer, image, image.copy())
 
@@ -221,42 +799,64 @@ def _apply_layer_ops(layer, image, force=False, bbox=None):
             if clip_image.mode.endswith('A'):
                 mask = ImageChops.darker(clip_image.getchannel('A'), mask)
             clip_image.putalpha(mask)
-            image = blend(image, clip_image, (0, 0))
+            if image.mode.endswith('A'):
+                # The clip image already contains the base image, and blending
+                # them again would double the semi-transparent alpha.
+                image = clip_image
+            else:
+                image = blend(image, clip_image, (0, 0))
 
     # Apply opacity.
-    apply_opacity(image, layer.opacity)
+    if not blend_opacity:
+        apply_opacity(image, layer.opacity)
 
     return image
 
 
-def create_fill(layer):
+def create_fill(layer, bbox=None):
+    """
+    Create a fill image of the layer.
+
+    :param bbox: viewport (left, top, right, bottom) inside the layer. Fills
+        are drawn only inside the viewport.
+    """
     from PIL import Image
     mode = get_pil_mode(layer._psd.color_mode, True)
     size = (layer.width, layer.height)
     fill_image = None
     stroke = layer.tagged_blocks.get_data(Tag.VECTOR_STROKE_DATA)
+    if bbox is not None and bbox != layer.bbox:
+        box = (
+            bbox[0] - layer.left, bbox[1] - layer.top, bbox[2] - layer.left,
+            bbox[3] - layer.top
+        )
+    else:
+        box = None
+    uniform_size = (box[2] - box[0], box[3] - box[1]) if box else size
 
     # Apply fill.
     if Tag.VECTOR_STROKE_CONTENT_DATA in layer.tagged_blocks:
         setting = layer.tagged_blocks.get_data(Tag.VECTOR_STROKE_CONTENT_DATA)
         if stroke and bool(stroke.get('fillEnabled', True)) is False:
-            fill_image = Image.new(mode, size)
+            fill_image = Image.new(mode, uniform_size)
         elif Enum.Pattern in setting:
-            fill_image = draw_pattern_fill(size, layer._psd, setting)
+            fill_image = draw_pattern_fill(size, layer._psd, setting, box)
         elif Key.Gradient in setting:
-            fill_image = draw_gradient_fill(size, setting)
+            fill_image = draw_gradient_fill(size, setting, box)
         else:
-            fill_image = draw_solid_color_fill(size, setting)
+            fill_image = draw_solid_color_fill(uniform_size, setting)
     elif Tag.SOLID_COLOR_SHEET_SETTING in layer.tagged_blocks:
         setting = layer.tagged_blocks.get_data(Tag.SOLID_COLOR_SHEET_SETTING)
-        fill_image = draw_solid_color_fill(size, setting)
+        fill_image = draw_solid_color_fill(uniform_size, setting)
     elif Tag.PATTERN_FILL_SETTING in layer.tagged_blocks:
         setting = layer.tagged_blocks.get_data(Tag.PATTERN_FILL_SETTING)
-        fill_image = draw_pattern_fill(size, layer._psd, setting)
+        fill_image = draw_pattern_fill(size, layer._psd, setting, box)
     elif Tag.GRADIENT_FILL_SETTING in layer.tagged_blocks:
         setting = layer.tagged_blocks.get_data(Tag.GRADIENT_FILL_SETTING)
-        fill_image = draw_gradient_fill(size, setting)
+        fill_image = draw_gradient_fill(size, setting, box)
 
+    if fill_image is not None and box is not None:
+        fill_image.info['offset'] = (bbox[0], bbox[1])
     return fill_image
 
 
@@ -280,20 +880,20 @@ def apply_mask(layer, image, bbox=None):
         if mask_bbox != (0, 0, 0, 0):
             color = layer.mask.background_color
             if bbox:
-                pass
-            elif color == 0:
-                bbox = mask_bbox
+                # Decode only the part of the mask inside the viewport.
+                mask_image = layer.mask.topil(bbox=bbox)
             else:
-                bbox = layer._psd.viewbox
+                mask_image = layer.mask.topil()
+                bbox = mask_bbox if color == 0 else layer._psd.viewbox
             size = (bbox[2] - bbox[0], bbox[3] - bbox[1])
             image_ = Image.new(image.mode, size)
             image_.paste(image, (offset[0] - bbox[0], offset[1] - bbox[1]))
             mask = Image.new('L', size, color=color)
-            mask_image = layer.mask.topil()
             if mask_image:
+                mask_offset = mask_image.info.get('offset', mask_bbox[:2])
                 mask.paste(
                     mask_image,
-                    (mask_bbox[0] - bbox[0], mask_bbox[1] - bbox[1])
+                    (mask_offset[0] - bbox[0], mask_offset[1] - bbox[1])
                 )
             if image_.mode.endswith('A'):
                 mask = ImageChops.darker(image_.getchannel('A'), mask)
@@ -393,9 +993,13 @@ def apply_effect(layer, backdrop, base_image):
 def apply_opacity(image, opacity):
     if opacity < 255:
         if image.mode.endswith('A'):
-            opacity /= 255.
             alpha = image.getchannel('A')
-            alpha = alpha.point(lambda x: int(round(x * opacity)))
-            image.putalpha(alpha)
+            image.putalpha(alpha.point(_get_opacity_table(opacity)))
         else:
             image.putalpha(int(opacity))
+
+
+def _get_opacity_table(opacity):
+    """Get the alpha lookup table of the opacity in [0, 255] range."""
+    opacity = min(opacity, 255) / 255.
+    return [int(round(x * opacity)) for x in range(256)]
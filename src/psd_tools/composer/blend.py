@@ -56,9 +56,9 @@ def blend(backdrop, image, offset, mode=None):
 def _blend_image(backdrop, source, blend_fn):
     from PIL import Image
     import numpy as np
-    Cb = np.asarray(backdrop.convert('RGB')).astype(np.float) / 255.
-    Cs = np.asarray(source.convert('RGB')).astype(np.float) / 255.
-    Ab = np.asarray(backdrop.getchannel('A')).astype(np.float) / 255.
+    Cb = np.asarray(backdrop.convert('RGB')).astype(np.float32) / 255.
+    Cs = np.asarray(source.convert('RGB')).astype(np.float32) / 255.
+    Ab = np.asarray(backdrop.getchannel('A')).astype(np.float32) / 255.
     Ab = np.expand_dims(Ab, axis=2)
     Cr = (1. - Ab) * Cs + Ab * blend_fn(Cs, Cb)
     result = Image.fromarray((Cr * 255).round().astype(np.uint8), mode='RGB')
@@ -238,37 +238,75 @@ def _divide(Cs, Cb):
 @register(BlendMode.HUE)
 @register(Enum.Hue)
 def _hue(Cs, Cb):
-    import numpy as np
-    hs, ls, ss = rgb_to_hls(Cs)
-    hb, lb, sb = rgb_to_hls(Cb)
-    return hls_to_rgb(hs, lb, sb)
+    return _set_lum(_set_sat(Cs, _sat(Cb)), _lum(Cb))
 
 
 @register(BlendMode.SATURATION)
 @register(Enum.Saturation)
 def _saturation(Cs, Cb):
-    import numpy as np
-    hs, ls, ss = rgb_to_hls(Cs)
-    hb, lb, sb = rgb_to_hls(Cb)
-    return hls_to_rgb(hb, lb, ss)
+    return _set_lum(_set_sat(Cb, _sat(Cs)), _lum(Cb))
 
 
 @register(BlendMode.COLOR)
 @register(Enum.Color)
 def _color(Cs, Cb):
-    import numpy as np
-    hs, ls, ss = rgb_to_hls(Cs)
-    hb, lb, sb = rgb_to_hls(Cb)
-    return hls_to_rgb(hs, lb, ss)
+    return _set_lum(Cs, _lum(Cb))
 
 
 @register(BlendMode.LUMINOSITY)
 @register(Enum.Luminosity)
-def _saturation(Cs, Cb):
+def _luminosity(Cs, Cb):
+    return _set_lum(Cb, _lum(Cs))
+
+
+# Non-separable blend modes follow SetLum, SetSat, and ClipColor of W3C
+# compositing. Colors are (height, width, 3) arrays, and the helpers work on
+# the three color planes so that no index arrays or reductions are needed.
+
+
+def _lum(C):
+    return .3 * C[:, :, 0] + .59 * C[:, :, 1] + .11 * C[:, :, 2]
+
+
+def _min_max(C):
+    import numpy as np
+    r, g, b = C[:, :, 0], C[:, :, 1], C[:, :, 2]
+    return np.minimum(np.minimum(r, g), b), np.maximum(np.maximum(r, g), b)
+
+
+def _sat(C):
+    n, x = _min_max(C)
+    return x - n
+
+
+def _set_lum(C, lum):
+    """SetLum followed by ClipColor."""
+    import numpy as np
+    C = C + (lum - _lum(C))[:, :, None]
+    n, x = _min_max(C)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scale = np.where(n < 0., lum / (lum - n), 1.)
+        scale *= np.where(x > 1., (1. - lum) / (x - lum), 1.)
+    lum = lum[:, :, None]
+    C -= lum
+    C *= scale[:, :, None]
+    C += lum
+    return C
+
+
+def _set_sat(C, s):
+    """
+    SetSat, which maps the minimum component to 0, the maximum to `s`, and
+    the middle one proportionally.
+    """
     import numpy as np
-    hs, ls, ss = rgb_to_hls(Cs)
-    hb, lb, sb = rgb_to_hls(Cb)
-    return hls_to_rgb(hb, ls, sb)
+    n, x = _min_max(C)
+    d = x - n
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scale = np.where(d > 0., s / d, 0.)
+    C = C - n[:, :, None]
+    C *= scale[:, :, None]
+    return C
 
 
 # BlendMode.DISSOLVE: _dissolve,
@@ -292,13 +330,13 @@ def rgb_to_hls(rgb):
     nonzero_index = (minc < maxc)
     c_diff = maxc - minc
 
-    l = (minc + maxc) / 2.0
-    s = np.zeros_like(l)
-    h = np.zeros_like(l)
+    lum = (minc + maxc) / 2.0
+    s = np.zeros_like(lum)
+    h = np.zeros_like(lum)
 
     index = nonzero_index
     s[index] = c_diff[index] / (2.0 - maxc[index] - minc[index])
-    index = (l <= 0.5) & nonzero_index
+    index = (lum <= 0.5) & nonzero_index
     s[index] = c_diff[index] / (maxc[index] + minc[index])
 
     rc, gc, bc = (
@@ -311,10 +349,10 @@ def rgb_to_hls(rgb):
     index = (rgb[:, :, 0][nonzero_index] == maxc[nonzero_index])
     hc[index] = bc[index] - gc[index]  # bc - gc
     h[nonzero_index] = (hc / 6.0) % 1.0
-    return h, l, s
+    return h, lum, s
 
 
-def hls_to_rgb(h, l, s):
+def hls_to_rgb(h, lum, s):
     """HSL to RGB conversion.
 
     See colorsys module.
@@ -323,13 +361,13 @@ def hls_to_rgb(h, l, s):
     ONE_THIRD = 1. / 3.
     TWO_THIRD = 2. / 3.
     ONE_SIXTH = 1. / 6.
-    r, g, b = np.copy(l), np.copy(l), np.copy(l)
+    r, g, b = np.copy(lum), np.copy(lum), np.copy(lum)
     nonzero_index = (s != 0.)
 
-    m2 = l + s - (l * s)
-    index = l <= 0.5
-    m2[index] = l[index] * (1.0 + s[index])
-    m1 = 2.0 * l - m2
+    m2 = lum + s - (lum * s)
+    index = lum <= 0.5
+    m2[index] = lum[index] * (1.0 + s[index])
+    m1 = 2.0 * lum - m2
 
     def _v(m1, m2, hue):
         hue = hue % 1.0
@@ -0,0 +1,295 @@
+"""
+Composition cache.
+
+The cache keeps rendered rasters of layers and groups between
+:py:func:`~psd_tools.composer.compose` calls. It is disabled by default.
+
+Example::
+
+    from psd_tools.composer import enable_cache
+
+    enable_cache(max_size=512 * 1024 * 1024)
+    for layer in psd:
+        layer.visible = not layer.visible
+        psd.compose(force=True)
+
+Entries are keyed by a fingerprint of the layer records, version stamps of
+the layers and their channel data, the patterns and linked data of the
+document, and the render parameters, so that modified layers are never
+served from the cache. The least recently used entries are evicted when the
+total size of the cached images exceeds `max_size` bytes.
+"""
+from __future__ import absolute_import, unicode_literals
+import functools
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from psd_tools.api.layers import _get_extent
+from psd_tools.constants import Resource, Tag
+
+logger = logging.getLogger(__name__)
+
+_BAND_SIZES = {'I': 4, 'F': 4, 'I;16': 2, 'I;16B': 2, '1': 1}
+
+# Document blocks that layers refer to, e.g., by pattern fills.
+_DOCUMENT_TAGS = (
+    Tag.PATTERNS1, Tag.PATTERNS2, Tag.PATTERNS3, Tag.LINKED_LAYER1,
+    Tag.LINKED_LAYER2, Tag.LINKED_LAYER3, Tag.LINKED_LAYER_EXTERNAL
+)
+
+_cache = None
+_local = threading.local()
+
+
+class CompositionCache(object):
+    """
+    LRU cache of composed images.
+
+    :param max_size: maximum total byte size of the cached images.
+    """
+
+    def __init__(self, max_size=256 * 1024 * 1024):
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        """
+        Get the cached image.
+
+        :return: (found, image) tuple. The image can be `None` if the cached
+            layer has no pixel.
+        """
+        with self._lock:
+            if key not in self._items:
+                self.misses += 1
+                return False, None
+            self.hits += 1
+            image, size = self._items.pop(key)
+            self._items[key] = (image, size)
+            return True, image
+
+    def put(self, key, image):
+        """Store the image, and evict least recently used images."""
+        size = _get_size(image)
+        if size > self.max_size:
+            return
+        with self._lock:
+            if key in self._items:
+                self.size -= self._items.pop(key)[1]
+            self._items[key] = (image, size)
+            self.size += size
+            while self.size > self.max_size:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self.size -= evicted
+
+    def clear(self):
+        """Remove all the cached images."""
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+
+
+def enable_cache(max_size=256 * 1024 * 1024):
+    """
+    Enable the composition cache in this process.
+
+    :param max_size: maximum total byte size of the cached images.
+    :return: :py:class:`CompositionCache`.
+    """
+    global _cache
+    _cache = CompositionCache(max_size)
+    return _cache
+
+
+def disable_cache():
+    """Disable the composition cache and release the cached images."""
+    global _cache
+    _cache = None
+
+
+def get_cache():
+    """
+    Get the composition cache.
+
+    :return: :py:class:`CompositionCache`, or `None` if disabled.
+    """
+    return _cache
+
+
+def memoize_fingerprints(func):
+    """
+    Decorator that memoizes the fingerprints computed during a call of
+    `func` in the calling thread. Nested calls share the outermost memo, and
+    the memo is released when the outermost call returns.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if getattr(_local, 'digests', None) is not None:
+            return func(*args, **kwargs)
+        _local.digests = {}
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _local.digests = None
+
+    return wrapper
+
+
+class SharedRenders(object):
+    """
+    Renders of entire layers shared by the tiles or bands of a composition.
+
+    Layers that cannot be cropped to a viewport, e.g., layers with effects,
+    are rendered whole regardless of the viewport. Within a `with` block,
+    :py:func:`compose_cached` keeps such renders here, so that each layer
+    is rendered once. Threads share the renders when each of them enters
+    the block. Pickled copies, e.g., for process workers, start empty.
+    """
+
+    def __init__(self):
+        self._items = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def __reduce__(self):
+        return (self.__class__, ())
+
+    def __enter__(self):
+        if getattr(_local, 'shared', None) is None:
+            _local.shared = []
+        _local.shared.append(self)
+        return self
+
+    def __exit__(self, *args):
+        _local.shared.pop()
+
+    def get(self, key, render, bottom):
+        """
+        Get the render of `key`, and call `render()` on the first use.
+
+        :param bottom: bottom of the area where the render is used.
+        """
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            if key not in self._items:
+                self._items[key] = (render(), bottom)
+            return self._items[key][0]
+
+    def release(self, top):
+        """Release the renders that are used only above `top`."""
+        with self._lock:
+            for key, (_, bottom) in list(self._items.items()):
+                if bottom <= top:
+                    del self._items[key]
+                    self._locks.pop(key, None)
+
+
+def compose_cached(func, layer, bbox, layer_filter, **kwargs):
+    """
+    Call `func(layer, bbox, layer_filter, **kwargs)` through the cache.
+
+    `bbox` is the viewport that `func` renders, or `None` for the entire
+    layer. Entire renders are also shared through the active
+    :py:class:`SharedRenders`.
+
+    The returned image is shared with the cache and must not be modified.
+    """
+    cache = _cache
+    shared = None
+    if bbox is None and getattr(_local, 'shared', None):
+        shared = _local.shared[-1]
+    if cache is None and shared is None:
+        return func(layer, bbox, layer_filter, **kwargs)
+
+    try:
+        params = (
+            bbox and tuple(bbox), layer_filter, tuple(sorted(kwargs.items()))
+        )
+        hash(params)
+    except TypeError:
+        return func(layer, bbox, layer_filter, **kwargs)
+    key = (func.__name__, fingerprint(layer), params)
+
+    def render():
+        if cache is None:
+            return func(layer, bbox, layer_filter, **kwargs)
+        found, image = cache.get(key)
+        if not found:
+            image = func(layer, bbox, layer_filter, **kwargs)
+            cache.put(key, image)
+        else:
+            logger.debug('Cache hit: %s' % layer)
+        return image
+
+    if shared is not None:
+        return shared.get(key, render, _get_extent(layer)[3])
+    return render()
+
+
+def fingerprint(layer):
+    """
+    Compute a digest of everything that affects the rendering of the layer:
+    the document header, color profile, patterns and linked data, and the
+    records and version stamps of the layer, its descendants and clip
+    layers. Layer setters and channel data updates renew the stamps, so that
+    channel data is never read for the digest.
+
+    :return: `bytes`
+    """
+    digests = getattr(_local, 'digests', None)
+    if digests is None:
+        digests = {}
+    digest = hashlib.sha1()
+    digest.update(_get_document_digest(layer._psd, digests))
+    digest.update(_get_layer_digest(layer, layer._psd.version, digests))
+    return digest.digest()
+
+
+def _get_document_digest(psd, digests):
+    key = ('document', id(psd))
+    if key not in digests:
+        digest = hashlib.sha1()
+        digest.update(psd._record.header.tobytes())
+        icc = psd.image_resources.get_data(Resource.ICC_PROFILE)
+        if icc:
+            digest.update(icc)
+        tagged_blocks = psd.tagged_blocks or {}
+        for key_ in _DOCUMENT_TAGS:
+            if key_ in tagged_blocks:
+                digest.update(tagged_blocks[key_].tobytes(version=psd.version))
+        digests[key] = digest.digest()
+    return digests[key]
+
+
+def _get_layer_digest(layer, version, digests):
+    key = ('layer', id(layer))
+    if key not in digests:
+        digest = hashlib.sha1()
+        if layer._record is not None:
+            digest.update(layer._record.tobytes(version=version))
+            stamps = [layer._stamp] + [x._stamp for x in layer._channels]
+            digest.update(repr(stamps).encode('ascii'))
+        if layer.is_group():
+            for child in layer:
+                digest.update(_get_layer_digest(child, version, digests))
+        for clip_layer in layer.clip_layers:
+            digest.update(_get_layer_digest(clip_layer, version, digests))
+        digests[key] = digest.digest()
+    return digests[key]
+
+
+def _get_size(image):
+    if image is None:
+        return 0
+    band_size = _BAND_SIZES.get(image.mode, 1)
+    return image.width * image.height * len(image.getbands()) * band_size
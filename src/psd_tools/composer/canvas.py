@@ -0,0 +1,235 @@
+"""
+Canvas module.
+
+Canvas keeps a premultiplied RGBA buffer in float32 during a single
+:py:func:`~psd_tools.composer.compose` call, and blends each layer in place
+only over the region the layer covers.
+"""
+from __future__ import absolute_import, unicode_literals
+import logging
+
+from psd_tools.constants import BlendMode
+from psd_tools.composer.blend import BLEND_FUNCTIONS, _normal
+from psd_tools.terminology import Enum
+
+logger = logging.getLogger(__name__)
+
+
+class Canvas(object):
+    """
+    Accumulation buffer for composition.
+
+    The buffer is planar, `(4, height, width)`, so that per-pixel alpha
+    operations run over contiguous memory.
+
+    :param context: `PIL.Image` object for the backdrop. The mode of the
+        result follows this image.
+    :param offset: offset of the canvas wrt the psd viewport.
+    :param depth: bit depth of the document. When it is 16 or 32, the
+        composer blends layers that support it by :py:meth:`blend_array`
+        without quantizing them to 8 bits.
+    """
+
+    def __init__(self, context, offset=(0, 0), depth=8):
+        import numpy as np
+        self.mode = context.mode
+        self.offset = tuple(offset)
+        self.depth = depth
+        # Straight colors are restored where nothing has been painted.
+        self._backdrop = np.array(context.convert('RGBA'))
+        if self._backdrop[:, :, 3].any():
+            self._buffer = _premultiply(self._backdrop)
+        else:
+            self._buffer = np.zeros(
+                (4, ) + self._backdrop.shape[:2], dtype=np.float32
+            )
+
+    @property
+    def width(self):
+        return self._buffer.shape[2]
+
+    @property
+    def height(self):
+        return self._buffer.shape[1]
+
+    @property
+    def bbox(self):
+        """Canvas bounding box wrt the psd viewport."""
+        left, top = self.offset
+        return (left, top, left + self.width, top + self.height)
+
+    def blend(self, image, offset, mode=None, alpha_table=None):
+        """
+        Blend the image over the canvas.
+
+        :param image: `PIL.Image` to blend.
+        :param offset: offset of the image wrt the psd viewport.
+        :param mode: blend mode, see
+            :py:class:`~psd_tools.constants.BlendMode`.
+        :param alpha_table: optional 256-entry lookup table applied to the
+            image alpha, such as the layer opacity.
+        """
+        import numpy as np
+
+        region = self._get_region(image.size, offset)
+        if region is None:
+            return
+        box, crop = region
+        source = image.crop(crop) if crop != (0, 0) + image.size else image
+        source = np.asarray(source.convert('RGBA'))
+        alpha = source[:, :, 3]
+        if alpha_table is not None:
+            alpha = np.asarray(alpha_table, dtype=np.uint8)[alpha]
+        if not alpha.any():
+            return
+
+        normal = mode in (BlendMode.NORMAL, Enum.Normal, None)
+        if normal and alpha.min() == 255:
+            np.multiply(
+                source.transpose((2, 0, 1)), np.float32(1. / 255.),
+                out=self._buffer[:, box[1]:box[3], box[0]:box[2]]
+            )
+            return
+
+        source = _to_planar(source)
+        if alpha_table is not None:
+            np.multiply(alpha, np.float32(1. / 255.), out=source[3])
+        self._blend_planes(source, box, mode)
+
+    def blend_array(self, array, offset, mode=None, opacity=1.):
+        """
+        Blend the float array over the canvas.
+
+        :param array: `(4, height, width)` float32 array of straight colors
+            and alpha in [0, 1]. The array is modified in place.
+        :param offset: offset of the array wrt the psd viewport.
+        :param mode: blend mode, see
+            :py:class:`~psd_tools.constants.BlendMode`.
+        :param opacity: opacity in [0, 1] applied to the array alpha.
+        """
+        region = self._get_region(array.shape[:0:-1], offset)
+        if region is None:
+            return
+        box, crop = region
+        source = array[:, crop[1]:crop[3], crop[0]:crop[2]]
+        if opacity < 1.:
+            source[3] *= opacity
+        if not source[3].any():
+            return
+        self._blend_planes(source, box, mode)
+
+    def _blend_planes(self, source, box, mode):
+        """Blend planar straight colors and alpha into the box in place."""
+        import numpy as np
+
+        target = self._buffer[:, box[1]:box[3], box[0]:box[2]]
+        Cs, As = source[:3], source[3]
+        if mode not in (BlendMode.NORMAL, Enum.Normal, None):
+            blend_fn = BLEND_FUNCTIONS.get(mode, _normal)
+            Ab = target[3]
+            Cb = np.divide(
+                target[:3], Ab, out=np.zeros_like(Cs), where=Ab > 0
+            )
+            # Blend functions take (height, width, 3) arrays.
+            Cs[:] = (1. - Ab) * Cs + Ab * blend_fn(
+                Cs.transpose((1, 2, 0)), Cb.transpose((1, 2, 0))
+            ).transpose((2, 0, 1))
+
+        Cs *= As
+        target *= 1. - As
+        target += source
+
+    def paste(self, image, offset):
+        """
+        Replace the pixels of the canvas with the image.
+
+        :param image: `PIL.Image` to paste.
+        :param offset: offset of the image wrt the psd viewport.
+        """
+        import numpy as np
+
+        region = self._get_region(image.size, offset)
+        if region is None:
+            return
+        box, crop = region
+        source = np.asarray(image.crop(crop).convert('RGBA'))
+        self._backdrop[box[1]:box[3], box[0]:box[2]] = source
+        self._buffer[:, box[1]:box[3], box[0]:box[2]] = _premultiply(source)
+
+    def topil(self):
+        """
+        Get the composed image.
+
+        :return: `PIL.Image` in the mode of the context, with the offset in
+            `info['offset']`.
+        """
+        from PIL import Image
+        import numpy as np
+
+        alpha = self._buffer[3]
+        scale = np.zeros(alpha.shape, dtype=np.float32)
+        np.divide(255., alpha, out=scale, where=alpha > 0)
+        planes = self._buffer * scale
+        planes[3] = alpha * 255.
+        np.minimum(planes, 255., out=planes)
+        np.maximum(planes, 0., out=planes)
+        planes += .5
+        result = np.empty(self._backdrop.shape, dtype=np.uint8)
+        result.transpose((2, 0, 1))[:] = planes
+        np.copyto(result, self._backdrop, where=result[:, :, 3:] == 0)
+
+        image = Image.fromarray(result, 'RGBA')
+        if self.mode != 'RGBA':
+            image = image.convert(self.mode)
+        image.info['offset'] = self.offset
+        return image
+
+    def planes(self):
+        """
+        Get the composed pixels without quantization.
+
+        :return: `(4, height, width)` float32 array of straight colors and
+            alpha in [0, 1].
+        """
+        import numpy as np
+
+        alpha = self._buffer[3]
+        scale = np.zeros(alpha.shape, dtype=np.float32)
+        np.divide(1., alpha, out=scale, where=alpha > 0)
+        planes = self._buffer * scale
+        planes[3] = alpha
+        np.clip(planes, 0., 1., out=planes)
+        empty = alpha == 0
+        if empty.any():
+            backdrop = self._backdrop[empty].T
+            planes[:, empty] = backdrop * np.float32(1. / 255.)
+        return planes
+
+    def _get_region(self, size, offset):
+        """Get the canvas box and the source box of the overlapping area."""
+        left = max(offset[0] - self.offset[0], 0)
+        top = max(offset[1] - self.offset[1], 0)
+        right = min(offset[0] - self.offset[0] + size[0], self.width)
+        bottom = min(offset[1] - self.offset[1] + size[1], self.height)
+        if right <= left or bottom <= top:
+            return None
+        x = left - (offset[0] - self.offset[0])
+        y = top - (offset[1] - self.offset[1])
+        return (
+            (left, top, right, bottom),
+            (x, y, x + right - left, y + bottom - top),
+        )
+
+
+def _to_planar(rgba):
+    """Convert uint8 RGBA array to planar float32 array in [0, 1]."""
+    import numpy as np
+    planar = np.ascontiguousarray(rgba.transpose((2, 0, 1)))
+    return np.multiply(planar, np.float32(1. / 255.), dtype=np.float32)
+
+
+def _premultiply(rgba):
+    """Convert uint8 RGBA array to premultiplied planar float32 array."""
+    result = _to_planar(rgba)
+    result[:3] *= result[3]
+    return result
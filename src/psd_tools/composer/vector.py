@@ -9,6 +9,15 @@ from psd_tools.terminology import Enum, Key, Type, Klass
 
 logger = logging.getLogger(__name__)
 
+# Margin in pixels around the viewport, so that the rasterizer clips the paths
+# away from the viewport and any viewport renders the same as a full canvas.
+_CLIP_MARGIN = 16
+
+# Resolution of the gradient lookup tables, and the number of cached tables.
+_GRADIENT_LUT_SIZE = 4096
+_GRADIENT_LUT_CACHE_SIZE = 256
+_GRADIENT_LUTS = {}
+
 _COLORSPACE = {
     Klass.CMYKColor: 'CMYK',
     Klass.RGBColor: 'RGB',
@@ -18,15 +27,28 @@ _COLORSPACE = {
 
 
 def draw_vector_mask(layer, bbox=None):
+    """
+    Draw the vector mask of the layer.
+
+    Paths are rasterized only inside the viewport, so the canvas size follows
+    the viewport rather than the document.
+
+    :param layer: `~psd_tools.api.layers.Layer`
+    :param bbox: viewport (left, top, right, bottom) wrt the psd viewport.
+        Default is the layer bbox.
+    :return: `PIL.Image` of `L` mode with `info['offset']` field.
+    """
     from PIL import Image, ImageChops
     width = layer._psd.width
     height = layer._psd.height
     color = 255 * layer.vector_mask.initial_fill_rule
+    bbox = bbox or layer.bbox
+    size = (bbox[2] - bbox[0], bbox[3] - bbox[1])
 
-    mask = Image.new('L', (width, height), color)
+    mask = Image.new('L', size, color)
     first = True
     for subpath in layer.vector_mask.paths:
-        plane = _draw_subpath(subpath, width, height)
+        plane = _draw_subpath(subpath, width, height, bbox)
         if subpath.operation == 0:
             mask = ImageChops.difference(mask, plane)
         elif subpath.operation == 1:
@@ -41,8 +63,8 @@ def draw_vector_mask(layer, bbox=None):
             mask = ImageChops.darker(mask, plane)
         first = False
 
-    mask = mask.crop(bbox or layer.bbox)
-    mask.info['offset'] = layer.offset
+    mask = _clear_outside(mask, bbox, width, height)
+    mask.info['offset'] = (bbox[0], bbox[1])
     return mask
 
 
@@ -53,29 +75,25 @@ def draw_stroke(backdrop, layer, vector_mask=None):
     width = layer._psd.width
     height = layer._psd.height
     setting = layer.stroke._data
+    offset = backdrop.info.get('offset', layer.offset)
+    bbox = offset + (offset[0] + backdrop.width, offset[1] + backdrop.height)
 
-    # Draw mask.
+    # Draw mask inside the backdrop.
     stroke_width = float(setting.get('strokeStyleLineWidth', 1.))
-    mask = Image.new('L', (width, height))
-    draw = aggdraw.Draw(mask)
-    for subpath in layer.vector_mask.paths:
-        path = ' '.join(map(str, _generate_symbol(subpath, width, height)))
-        symbol = aggdraw.Symbol(path)
-        pen = aggdraw.Pen(255, int(2 * stroke_width))
-        draw.symbol((0, 0), symbol, pen, None)
-    draw.flush()
-    del draw
+    pen = aggdraw.Pen(255, int(2 * stroke_width))
+    mask = _rasterize(
+        layer.vector_mask.paths, width, height, bbox, pen=pen,
+        margin=int(2 * stroke_width)
+    )
+    mask = _clear_outside(mask, bbox, width, height)
 
     # For now, path operations are not implemented.
     if vector_mask:
-        vector_mask_ = Image.new('L', (width, height))
-        vector_mask_.paste(vector_mask, vector_mask.info['offset'])
+        vector_mask_ = Image.new('L', backdrop.size)
+        left, top = vector_mask.info['offset']
+        vector_mask_.paste(vector_mask, (left - offset[0], top - offset[1]))
         mask = ImageChops.darker(mask, vector_mask_)
 
-    offset = backdrop.info.get('offset', layer.offset)
-    bbox = offset + (offset[0] + backdrop.width, offset[1] + backdrop.height)
-    mask = mask.crop(bbox)
-
     # Paint the mask.
     painter = setting.get('strokeStyleContent')
     mode = setting.get('strokeStyleBlendMode').enum
@@ -97,32 +115,71 @@ def draw_stroke(backdrop, layer, vector_mask=None):
     return blend(backdrop, image, (0, 0), mode)
 
 
-def _draw_subpath(subpath, width, height):
-    from PIL import Image
+def _draw_subpath(subpath, width, height, bbox):
+    """Rasterize the subpath in the viewport of the document."""
     import aggdraw
-    mask = Image.new('L', (width, height), 0)
     if len(subpath) <= 1:
         logger.warning('not enough knots: %d' % len(subpath))
-        return mask
-    path = ' '.join(map(str, _generate_symbol(subpath, width, height)))
+        subpath = []
+    return _rasterize([subpath], width, height, bbox, brush=aggdraw.Brush(255))
+
+
+def _rasterize(subpaths, width, height, bbox, pen=None, brush=None, margin=0):
+    """
+    Rasterize subpaths in the viewport of the document.
+
+    :param margin: additional margin, such as the pen width.
+    """
+    from PIL import Image
+    import aggdraw
+    margin += _CLIP_MARGIN
+    size = (bbox[2] - bbox[0], bbox[3] - bbox[1])
+    mask = Image.new('L', (size[0] + 2 * margin, size[1] + 2 * margin), 0)
+    origin = (bbox[0] - margin, bbox[1] - margin)
     draw = aggdraw.Draw(mask)
-    brush = aggdraw.Brush(255)
-    symbol = aggdraw.Symbol(path)
-    draw.symbol((0, 0), symbol, None, brush)
+    for subpath in subpaths:
+        if len(subpath) == 0:
+            continue
+        path = ' '.join(
+            map(str, _generate_symbol(subpath, width, height, origin=origin))
+        )
+        draw.symbol((0, 0), aggdraw.Symbol(path), pen, brush)
     draw.flush()
     del draw
-    return mask
+    return mask.crop((margin, margin, margin + size[0], margin + size[1]))
+
+
+def _clear_outside(mask, bbox, width, height):
+    """Clear the area of the mask outside the document."""
+    from PIL import Image
+    size = mask.size
+    inner = (
+        max(0, -bbox[0]), max(0, -bbox[1]), min(size[0], width - bbox[0]),
+        min(size[1], height - bbox[1])
+    )
+    if inner == (0, 0) + size:
+        return mask
+    mask_ = Image.new('L', size)
+    if inner[0] < inner[2] and inner[1] < inner[3]:
+        mask_.paste(mask.crop(inner), inner[:2])
+    return mask_
 
 
-def _generate_symbol(path, width, height, command='C'):
-    """Sequence generator for SVG path."""
+def _generate_symbol(path, width, height, command='C', origin=(0, 0)):
+    """
+    Sequence generator for SVG path.
+
+    :param origin: (left, top) of the viewport, subtracted from the points.
+    """
     if len(path) == 0:
         return
 
+    left, top = origin
+
     # Initial point.
     yield 'M'
-    yield path[0].anchor[1] * width
-    yield path[0].anchor[0] * height
+    yield path[0].anchor[1] * width - left
+    yield path[0].anchor[0] * height - top
     yield command
 
     # Closed path or open path
@@ -133,12 +190,12 @@ def _generate_symbol(path, width, height, command='C'):
 
     # Rest of the points.
     for p1, p2 in points:
-        yield p1.leaving[1] * width
-        yield p1.leaving[0] * height
-        yield p2.preceding[1] * width
-        yield p2.preceding[0] * height
-        yield p2.anchor[1] * width
-        yield p2.anchor[0] * height
+        yield p1.leaving[1] * width - left
+        yield p1.leaving[0] * height - top
+        yield p2.preceding[1] * width - left
+        yield p2.preceding[0] * height - top
+        yield p2.anchor[1] * width - left
+        yield p2.anchor[0] * height - top
 
     if path.is_closed():
         yield 'Z'
@@ -149,7 +206,7 @@ def _apply_opacity(image, setting):
     if opacity != 100:
         if image.mode.endswith('A'):
             alpha = image.getchannel('A')
-            alpha = alpha.point(lambda x: int(x * opacity / 100.))
+            alpha = alpha.point([int(x * opacity / 100.) for x in range(256)])
             image.putalpha(alpha)
         else:
             image.putalpha(int(opacity * 2.55))
@@ -168,59 +225,100 @@ def draw_solid_color_fill(size, setting):
     return canvas
 
 
-def draw_pattern_fill(size, psd, setting):
+def draw_pattern_fill(size, psd, setting, box=None):
     """
     Create a pattern fill image.
 
     :param size: (width, height) tuple.
     :param psd: :py:class:`PSDImage`.
     :param setting: Descriptor containing pattern fill.
+    :param box: optional (left, top, right, bottom) region inside `size` to
+        draw. The pattern keeps the phase of the whole fill.
     """
-    from PIL import Image
     pattern_id = setting[Enum.Pattern][Key.ID].value.rstrip('\x00')
-    pattern = psd._get_pattern(pattern_id)
-    if not pattern:
+    scale = float(setting.get(Key.Scale, 100.)) / 100.
+    panel = _get_pattern_panel(psd, pattern_id, scale)
+    if panel is None:
         logger.error('Pattern not found: %s' % (pattern_id))
         return None
-    panel = convert_pattern_to_pil(pattern, psd._record.header.version)
-
-    scale = float(setting.get(Key.Scale, 100.)) / 100.
-    if scale != 1.:
-        panel = panel.resize((
-            max(1, int(panel.width * scale)),
-            max(1, int(panel.height * scale)),
-        ))
+    panel = panel.copy()
     _apply_opacity(panel, setting)
-
-    pattern_image = Image.new(panel.mode, size)
-    for top in range(0, pattern_image.height, panel.height):
-        for left in range(0, pattern_image.width, panel.width):
-            pattern_image.paste(panel, (left, top))
-
+    if box is None:
+        return _tile(panel, size)
+    return _tile(panel, (box[2] - box[0], box[3] - box[1]), box[:2])
+
+
+def _get_pattern_panel(psd, pattern_id, scale):
+    """Get the decoded and scaled pattern, cached in the psd."""
+    key = (pattern_id, scale)
+    if key not in psd._pattern_panels:
+        pattern = psd._get_pattern(pattern_id)
+        if not pattern:
+            return None
+        panel = convert_pattern_to_pil(pattern, psd._record.header.version)
+        if scale != 1.:
+            panel = panel.resize((
+                max(1, int(panel.width * scale)),
+                max(1, int(panel.height * scale)),
+            ))
+        psd._pattern_panels[key] = panel
+    return psd._pattern_panels[key]
+
+
+def _tile(panel, size, origin=(0, 0)):
+    """
+    Repeat the panel over the given size, starting from `origin` of the
+    repeated pattern.
+    """
+    from PIL import Image
+    x, y = origin[0] % panel.width, origin[1] % panel.height
+    try:
+        import numpy as np
+    except ImportError:
+        pattern_image = Image.new(panel.mode, size)
+        for top in range(-y, pattern_image.height, panel.height):
+            for left in range(-x, pattern_image.width, panel.width):
+                pattern_image.paste(panel, (left, top))
+        return pattern_image
+
+    if size[0] == 0 or size[1] == 0:
+        return Image.new(panel.mode, size)
+    data = np.asarray(panel)
+    reps = (
+        -(-(size[1] + y) // panel.height), -(-(size[0] + x) // panel.width)
+    )
+    data = np.tile(data, reps + (1, ) * (data.ndim - 2))
+    pattern_image = Image.fromarray(
+        np.ascontiguousarray(data[y:y + size[1], x:x + size[0]]), panel.mode
+    )
+    if panel.mode == 'P':
+        pattern_image.putpalette(panel.getpalette())
     return pattern_image
 
 
-def draw_gradient_fill(size, setting):
+def draw_gradient_fill(size, setting, box=None):
     """
     Create a gradient fill image.
 
     :param size: (width, height) tuple.
     :param setting: Descriptor containing pattern fill.
+    :param box: optional (left, top, right, bottom) region inside `size` to
+        draw. Pixels are evaluated only inside the region.
     """
     try:
         import numpy as np
     except ImportError:
-        logger.error('Gradient fill requires numpy and scipy.')
+        logger.error('Gradient fill requires numpy.')
         return None
 
     angle = float(setting.get(Key.Angle, 0))
     scale = float(setting.get(Key.Scale, 100.)) / 100.
     ratio = (angle % 90)
     scale *= (90. - ratio) / 90. * size[0] + (ratio / 90.) * size[1]
-    X, Y = np.meshgrid(
-        np.linspace(-size[0] / scale, size[0] / scale, size[0]),
-        np.linspace(-size[1] / scale, size[1] / scale, size[1]),
-    )
+    box = box or (0, 0) + tuple(size)
+    x = np.linspace(-size[0] / scale, size[0] / scale, size[0])
+    y = np.linspace(-size[1] / scale, size[1] / scale, size[1])
+    X, Y = np.meshgrid(x[box[0]:box[2]], y[box[1]:box[3]])
 
     gradient_kind = setting.get(Key.Type).enum
     if gradient_kind == Enum.Linear:
@@ -236,10 +334,10 @@ def draw_gradient_fill(size, setting):
     elif gradient_kind == b'shapeburst':
         # Only available in stroke effect.
         logger.warning('Gradient style not supported: %s' % gradient_kind)
-        Z = np.ones((size[1], size[0])) * 0.5
+        Z = np.ones(X.shape) * 0.5
     else:
         logger.warning('Unknown gradient style: %s.' % (gradient_kind))
-        Z = np.ones((size[1], size[0])) * 0.5
+        Z = np.ones(X.shape) * 0.5
 
     Z = np.maximum(0, np.minimum(1, Z))
     if bool(setting.get(Key.Reverse, False)):
@@ -290,9 +388,8 @@ def _make_diamond_gradient(X, Y, angle):
 
 
 def _apply_color_map(grad, Z):
-    """"""
+    """Apply the gradient to the index map `Z` in [0, 1] range."""
     import numpy as np
-    from scipy import interpolate
     from PIL import Image
 
     gradient_form = grad.get(Type.GradientForm).enum
@@ -315,7 +412,7 @@ def _apply_color_map(grad, Z):
             }
         """
         logger.debug('Noise gradient is not accurate.')
-        from scipy.ndimage.filters import maximum_filter1d, uniform_filter1d
+        from scipy.ndimage import maximum_filter1d, uniform_filter1d
         roughness = grad.get(
             Key.Smoothness
         ).value / 4096.  # Larger is sharper.
@@ -325,7 +422,7 @@ def _apply_color_map(grad, Z):
         mode = _COLORSPACE.get(grad.get(Key.ColorSpace).enum)
 
         rng = np.random.RandomState(seed)
-        G = rng.binomial(1, .5, (256, len(maximum))).astype(np.float)
+        G = rng.binomial(1, .5, (256, len(maximum))).astype(np.float64)
         size = max(1, int(roughness * 4))
         G = maximum_filter1d(G, size, axis=0)
         G = uniform_filter1d(G, size * 64, axis=0)
@@ -336,58 +433,78 @@ def _apply_color_map(grad, Z):
             pixels = pixels[:, :, 0]
         image = Image.fromarray(pixels, mode)
     elif gradient_form == Enum.CustomStops:
-        scalar = {
-            'RGB': 1.0,
-            'L': 2.55,
-            'CMYK': 2.55,
-            'LAB': 1.0,
-        }
-        X, Y = [], []
-        mode = None
-        for stop in grad.get(Key.Colors, []):
-            mode = _COLORSPACE.get(stop.get(Key.Color).classID)
-            s = scalar.get(mode, 1.0)
-            location = int(stop.get(Key.Location)) / 4096.
-            color = list(stop.get(Key.Color).values())[:len(mode)]
-            color = tuple(s * int(x) for x in color)
-            if len(X) and X[-1] == location:
-                logger.debug('Duplicate stop at %d' % location)
-                X.pop(), Y.pop()
-            X.append(location), Y.append(color)
-        assert len(X) > 0
-        if len(X) == 1:
-            X = [0., 1.]
-            Y = [Y[0], Y[0]]
-        G = interpolate.interp1d(
-            X, Y, axis=0, bounds_error=False, fill_value=(Y[0], Y[-1])
-        )
-        pixels = G(Z).astype(np.uint8)
-        if pixels.shape[-1] == 1:
-            pixels = pixels[:, :, 0]
-
-        image = Image.fromarray(pixels, mode)
-        if Key.Transparency in grad:
-            if mode in ('RGB', 'L'):
-                X, Y = [], []
-                for stop in grad.get(Key.Transparency):
-                    location = int(stop.get(Key.Location)) / 4096.
-                    opacity = float(stop.get(Key.Opacity)) * 2.55
-                    if len(X) and X[-1] == location:
-                        logger.debug('Duplicate stop at %d' % location)
-                        X.pop(), Y.pop()
-                    X.append(location), Y.append(opacity)
-                assert len(X) > 0
-                if len(X) == 1:
-                    X = [0., 1.]
-                    Y = [Y[0], Y[0]]
-                G = interpolate.interp1d(
-                    X, Y, axis=0, bounds_error=False, fill_value=(Y[0], Y[-1])
-                )
-                alpha = G(Z).astype(np.uint8)
-                image.putalpha(Image.fromarray(alpha, 'L'))
-            else:
-                logger.warning('Alpha not supported in %s' % (mode))
+        mode, lut = _get_gradient_lut(grad)
+        pixels = lut[np.rint(Z * (len(lut) - 1)).astype(np.intp)]
+        color = pixels[:, :, :len(mode)]
+        if color.shape[-1] == 1:
+            color = color[:, :, 0]
+        image = Image.fromarray(color, mode)
+        if pixels.shape[-1] > len(mode):
+            image.putalpha(Image.fromarray(pixels[:, :, -1], 'L'))
     else:
         logger.error('Unknown gradient form: %s' % gradient_form)
         return None
     return image
+
+
+def _get_gradient_lut(grad):
+    """
+    Get the lookup table of the custom stops gradient.
+
+    Tables are cached by the serialized gradient descriptor.
+
+    :return: (mode, table) tuple, where the table is `uint8` array of
+        `(_GRADIENT_LUT_SIZE, channels)` shape. The last channel is alpha if
+        the table has more channels than the mode.
+    """
+    key = grad.tobytes()
+    if key not in _GRADIENT_LUTS:
+        if len(_GRADIENT_LUTS) >= _GRADIENT_LUT_CACHE_SIZE:
+            _GRADIENT_LUTS.clear()
+        _GRADIENT_LUTS[key] = _make_gradient_lut(grad)
+    return _GRADIENT_LUTS[key]
+
+
+def _make_gradient_lut(grad):
+    """Interpolate the color and transparency stops of the gradient."""
+    import numpy as np
+    scalar = {
+        'RGB': 1.0,
+        'L': 2.55,
+        'CMYK': 2.55,
+        'LAB': 1.0,
+    }
+    X, Y = [], []
+    mode = None
+    for stop in grad.get(Key.Colors, []):
+        mode = _COLORSPACE.get(stop.get(Key.Color).classID)
+        s = scalar.get(mode, 1.0)
+        location = int(stop.get(Key.Location)) / 4096.
+        color = list(stop.get(Key.Color).values())[:len(mode)]
+        color = tuple(s * int(x) for x in color)
+        if len(X) and X[-1] == location:
+            logger.debug('Duplicate stop at %d' % location)
+            X.pop(), Y.pop()
+        X.append(location), Y.append(color)
+    assert len(X) > 0
+
+    index = np.linspace(0., 1., _GRADIENT_LUT_SIZE)
+    Y = np.array(Y, dtype=np.float64)
+    channels = [np.interp(index, X, Y[:, i]) for i in range(Y.shape[1])]
+
+    if Key.Transparency in grad:
+        if mode in ('RGB', 'L'):
+            X, Y = [], []
+            for stop in grad.get(Key.Transparency):
+                location = int(stop.get(Key.Location)) / 4096.
+                opacity = float(stop.get(Key.Opacity)) * 2.55
+                if len(X) and X[-1] == location:
+                    logger.debug('Duplicate stop at %d' % location)
+                    X.pop(), Y.pop()
+                X.append(location), Y.append(opacity)
+            assert len(X) > 0
+            channels.append(np.interp(index, X, Y))
+        else:
+            logger.warning('Alpha not supported in %s' % (mode))
+
+    return mode, np.stack(channels, axis=-1).astype(np.uint8)
@@ -4,16 +4,30 @@ Image compression utils.
 from __future__ import absolute_import, unicode_literals
 import array
 import io
-import packbits
+import itertools
+import struct
 import zlib
 
 from psd_tools.constants import Compression
 from psd_tools.utils import (
-    be_array_from_bytes, be_array_to_bytes, read_be_array, write_be_array
+    be_array_from_bytes, be_array_to_bytes, write_be_array, map_workers,
+    read_source
 )
 
 
-def compress(data, compression, width, height, depth, version=1):
+# Approximate byte size of the chunks compressed by each worker.
+_CHUNK_SIZE = 1 << 20
+
+# Minimum number of rows, by compressed size, to decode PackBits in lockstep.
+_LOCKSTEP_ROWS = 64
+
+# Size of the deflate window, which is kept as a preset dictionary.
+_WINDOW_SIZE = 1 << 15
+
+
+def compress(
+    data, compression, width, height, depth, version=1, workers=None
+):
     """Compress raw data.
 
     :param data: raw data bytes to write.
@@ -22,22 +36,31 @@ def compress(data, compression, width, height, depth, version=1):
     :param height: height.
     :param depth: bit depth of the pixel.
     :param version: psd file version.
+    :param workers: number of threads, or an executor such as
+        :py:class:`concurrent.futures.ProcessPoolExecutor`, to compress
+        chunks of the data in parallel. Zlib streams are deflated chunk by
+        chunk, which threads run concurrently; the stream decompresses to the
+        same data, though its bytes can differ from serial compression.
+        PackBits encoding holds the GIL, so its rows are only split among the
+        workers of an executor, typically a process pool.
     :return: compressed data bytes.
     """
     if compression == Compression.RAW:
         result = data
     elif compression == Compression.PACK_BITS:
-        result = encode_packbits(data, width, height, depth, version)
+        result = encode_packbits(data, width, height, depth, version, workers)
     elif compression == Compression.ZIP:
-        result = zlib.compress(data)
+        result = _deflate(data, workers)
     else:
-        encoded = encode_prediction(data, width, height, depth)
-        result = zlib.compress(encoded)
+        encoded = encode_prediction(data, width, height, depth, workers)
+        result = _deflate(encoded, workers)
 
     return result
 
 
-def decompress(data, compression, width, height, depth, version=1):
+def decompress(
+    data, compression, width, height, depth, version=1, rows=None
+):
     """Decompress raw data.
 
     :param data: compressed data bytes.
@@ -47,20 +70,35 @@ def decompress(data, compression, width, height, depth, version=1):
     :param height: height.
     :param depth: bit depth of the pixel.
     :param version: psd file version.
+    :param rows: (start, stop) tuple to decompress only the rows in
+        `[start, stop)`. Zlib streams are inflated up to `stop` and the
+        preceding output is discarded.
     :return: decompressed data bytes.
     """
-    length = width * height * max(1, depth // 8)
+    start, stop = rows or (0, height)
+    stop = max(0, min(height, stop))
+    start = max(0, min(start, stop))
+    row_size = (width * depth + 7) // 8
+    length = width * (stop - start) * max(1, depth // 8)
 
     result = None
     if compression == Compression.RAW:
-        result = data[:length]
+        result = data[start * row_size:stop * row_size]
     elif compression == Compression.PACK_BITS:
-        result = decode_packbits(data, height, version)
+        result = decode_packbits(
+            data, height, version, row_size, (start, stop)
+        )
     elif compression == Compression.ZIP:
-        result = zlib.decompress(data)
+        if rows is None:
+            result = zlib.decompress(data)
+        else:
+            result = _inflate(data, start * row_size, stop * row_size)
     else:
-        decompressed = zlib.decompress(data)
-        result = decode_prediction(decompressed, width, height, depth)
+        if rows is None:
+            decompressed = zlib.decompress(data)
+        else:
+            decompressed = _inflate(data, start * row_size, stop * row_size)
+        result = decode_prediction(decompressed, width, stop - start, depth)
 
     if depth >= 8:
         assert len(result) == length, (
@@ -70,12 +108,131 @@ def decompress(data, compression, width, height, depth, version=1):
     return result
 
 
-def encode_packbits(data, width, height, depth, version):
+def decompress_source(
+    source, compression, width, height, depth, version=1, rows=None
+):
+    """Decompress rows of data recorded by a lazy read.
+
+    `RAW` and `PACK_BITS` data are read only for the requested rows and the
+    row byte-count table, other compressions are read entirely.
+
+    :param source: (fp, offset, length) tuple, see
+        :py:func:`~psd_tools.utils.read_source`.
+    :param rows: (start, stop) tuple, see :py:func:`decompress`.
+    :return: decompressed data bytes.
+    """
+    if rows is None or compression not in (
+        Compression.RAW, Compression.PACK_BITS
+    ):
+        return decompress(
+            read_source(source), compression, width, height, depth, version,
+            rows
+        )
+
+    stop = max(0, min(height, rows[1]))
+    start = max(0, min(rows[0], stop))
+    fp, offset, length = source
+    if compression == Compression.RAW:
+        row_size = (width * depth + 7) // 8
+        return read_source(
+            (fp, offset + start * row_size, (stop - start) * row_size)
+        )
+
+    fmt = ('H', 'I')[version - 1]
+    table_size = height * array.array(str(fmt)).itemsize
+    bytes_counts = be_array_from_bytes(
+        fmt, bytes(read_source((fp, offset, table_size)))
+    )
+    position = offset + table_size + sum(bytes_counts[:start])
+    bytes_counts = bytes_counts[start:stop]
+    data = bytes(read_source((fp, position, sum(bytes_counts))))
+    return decompress(
+        be_array_to_bytes(bytes_counts) + data, compression, width,
+        stop - start, depth, version
+    )
+
+
+def _inflate(data, start, stop):
+    """
+    Inflate the bytes in `[start, stop)` of a zlib stream.
+
+    Output is produced in chunks of bounded size, and nothing beyond `stop`
+    is inflated.
+    """
+    decompressor = zlib.decompressobj()
+    pending = data
+    position = 0
+    while position < start:
+        chunk = decompressor.decompress(
+            pending, min(start - position, _CHUNK_SIZE)
+        )
+        pending = decompressor.unconsumed_tail
+        if not chunk:
+            break
+        position += len(chunk)
+
+    chunks = []
+    while position < stop:
+        chunk = decompressor.decompress(pending, stop - position)
+        pending = decompressor.unconsumed_tail
+        if not chunk:
+            break
+        chunks.append(chunk)
+        position += len(chunk)
+    return b''.join(chunks)
+
+
+def _deflate(data, workers=None):
+    """
+    Compress a zlib stream, deflating chunks of the data with `workers`.
+
+    Each chunk but the last ends with a sync flush, and takes the preceding
+    window as a preset dictionary, so the chunks concatenate into one
+    stream.
+    """
+    if not workers or workers == 1 or len(data) <= _CHUNK_SIZE:
+        return zlib.compress(data)
+
+    starts = range(0, len(data), _CHUNK_SIZE)
+    chunks = map_workers(
+        _deflate_chunk, [data[i:i + _CHUNK_SIZE] for i in starts],
+        [data[max(0, i - _WINDOW_SIZE):i] for i in starts],
+        [i + _CHUNK_SIZE >= len(data) for i in starts],
+        workers=workers
+    )
+    checksum = zlib.adler32(data) & 0xffffffff
+    return b''.join([b'\x78\x9c'] + chunks + [struct.pack('>I', checksum)])
+
+
+def _deflate_chunk(data, window, last):
+    """Deflate a chunk of a zlib stream without the header and checksum."""
+    args = (zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -zlib.MAX_WBITS)
+    if window:
+        try:
+            compressor = zlib.compressobj(*args, zdict=window)
+        except TypeError:
+            # Python 2 has no preset dictionary, which only costs some ratio.
+            compressor = zlib.compressobj(*args)
+    else:
+        compressor = zlib.compressobj(*args)
+    flush = zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH
+    return compressor.compress(data) + compressor.flush(flush)
+
+
+def encode_packbits(data, width, height, depth, version, workers=None):
     row_size = width * depth // 8
-    with io.BytesIO(data) as fp:
-        rows = [packbits.encode(fp.read(row_size)) for _ in range(height)]
-    bytes_counts = array.array(('H', 'I')[version - 1], map(len, rows))
-    encoded = b''.join(rows)
+    if hasattr(workers, 'map'):
+        chunks = _split_rows(data, row_size, height)
+        results = map_workers(
+            _encode_packbits_rows, [chunk for chunk, _ in chunks],
+            [row_size] * len(chunks), [rows for _, rows in chunks],
+            workers=workers
+        )
+        counts = [count for row_counts, _ in results for count in row_counts]
+        encoded = b''.join(chunk for _, chunk in results)
+    else:
+        counts, encoded = _encode_packbits_rows(data, row_size, height)
+    bytes_counts = array.array(('H', 'I')[version - 1], counts)
 
     with io.BytesIO() as fp:
         write_be_array(fp, bytes_counts)
@@ -85,15 +242,261 @@ def encode_packbits(data, width, height, depth, version):
     return result
 
 
-def decode_packbits(data, height, version):
-    with io.BytesIO(data) as fp:
-        bytes_counts = read_be_array(('H', 'I')[version - 1], height, fp)
-        return b''.join(
-            packbits.decode(fp.read(count)) for count in bytes_counts
+def decode_packbits(data, height, version, row_size=None, rows=None):
+    """
+    Decode PackBits data with a row byte-count table.
+
+    :param data: compressed data bytes.
+    :param height: number of rows in the data.
+    :param version: psd file version.
+    :param row_size: decoded byte size of a row. When given, rows are decoded
+        into a preallocated buffer.
+    :param rows: (start, stop) tuple to decode only the rows in
+        `[start, stop)`. The compressed offset of `start` is found by summing
+        the byte-count table, so preceding rows are never decoded.
+    :return: decoded bytes.
+    """
+    start, stop = rows or (0, height)
+    start, stop = max(0, start), min(height, stop)
+    fmt = ('H', 'I')[version - 1]
+    view = memoryview(data)
+    offset = height * array.array(str(fmt)).itemsize
+    bytes_counts = be_array_from_bytes(fmt, view[:offset].tobytes())
+    if stop <= start:
+        return b''
+    offset += sum(bytes_counts[:start])
+    length = sum(bytes_counts[start:stop])
+    source = bytearray(view[offset:offset + length])
+    decoded = _decode_packbits_numpy(source, bytes_counts[start:stop])
+    if decoded is not None:
+        return decoded
+    if row_size is None:
+        result = bytearray()
+    else:
+        result = bytearray(row_size * (stop - start))
+    end = _decode_packbits_into(source, result)
+    if end < len(result):
+        del result[end:]
+    return bytes(result)
+
+
+def _decode_packbits_numpy(data, counts):
+    """
+    Decode PackBits rows with numpy.
+
+    Packet headers are found by walking all rows in lockstep, one packet of
+    every row per step, and the output is gathered from `data` by an index
+    array built with :py:func:`numpy.repeat`.
+
+    :param data: compressed bytes of the rows.
+    :param counts: compressed byte count of each row.
+    :return: decoded bytes, or `None` when numpy is not available, there are
+        too few rows to walk in lockstep, or the packets do not end at the
+        row boundaries.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        return None
+
+    source = np.frombuffer(data, dtype=np.uint8)
+    stops = np.cumsum(np.asarray(counts, dtype=np.intp))
+    if not len(stops) or stops[-1] != len(source) or \
+            max(counts) * _LOCKSTEP_ROWS > len(source):
+        return None
+    positions = stops - np.asarray(counts, dtype=np.intp)
+    rows = np.flatnonzero(positions < stops)
+    heads = []
+    while len(rows):
+        position = positions[rows]
+        heads.append(position)
+        header = source[position]
+        position = position + np.where(
+            header < 128, header.astype(np.intp) + 2, 1 + (header > 128)
+        )
+        positions[rows] = position
+        rows = rows[position < stops[rows]]
+    if not np.array_equal(positions, stops):
+        return None
+    if not heads:
+        return b''
+
+    heads = np.sort(np.concatenate(heads))
+    headers = source[heads].astype(np.intp)
+    keep = headers != 128
+    heads, headers = heads[keep], headers[keep]
+    literal = headers < 128
+    lengths = np.where(literal, headers + 1, 257 - headers)
+    starts = np.cumsum(lengths) - lengths
+    index = np.repeat(heads + 1 - starts * literal, lengths)
+    index += np.arange(len(index)) * np.repeat(literal, lengths)
+    return source[index].tobytes()
+
+
+def _decode_packbits_into(data, result):
+    """
+    Decode a PackBits stream into the bytearray `result`.
+
+    Each packet is copied with a single slice assignment.
+
+    :return: end position of the written data in `result`.
+    """
+    pos, end, size = 0, 0, len(data)
+    while pos < size:
+        header = data[pos]
+        pos += 1
+        if header < 128:
+            length = header + 1
+            result[end:end + length] = data[pos:pos + length]
+            pos += length
+        elif header > 128:
+            length = 257 - header
+            result[end:end + length] = data[pos:pos + 1] * length
+            pos += 1
+        else:
+            continue
+        end += length
+    return end
+
+
+def _encode_packbits_rows(data, row_size, height):
+    """
+    Encode rows with PackBits.
+
+    The output is byte-identical to the `packbits` package applied row by
+    row: runs of two or more bytes are always repeated packets, and literal
+    packets hold up to 127 bytes except at the end of a row, where 128 bytes
+    can be packed.
+
+    :return: tuple of (list of row byte counts, encoded bytes).
+    """
+    result = bytearray()
+    counts = [0] * height
+    for row, start, length, is_run in _iter_packbits_spans(
+        data, row_size, height
+    ):
+        written = len(result)
+        if is_run:
+            value = data[start:start + 1]
+            while length > 128:
+                result.append(130)
+                result += value
+                length -= 127
+            result.append(257 - length)
+            result += value
+        else:
+            at_end = (start + length == (row + 1) * row_size)
+            while length > 0:
+                if at_end and length == 128:
+                    size = 128
+                else:
+                    size = min(length, 127)
+                result.append(size - 1)
+                result += data[start:start + size]
+                start += size
+                length -= size
+        counts[row] += len(result) - written
+    return counts, bytes(result)
+
+
+def _iter_packbits_spans(data, row_size, height):
+    """
+    Split rows into runs and literal spans.
+
+    :return: iterable of (row, start, length, is_run) tuples.
+    """
+    if row_size <= 0 or height <= 0:
+        return []
+    try:
+        import numpy as np
+    except ImportError:
+        return _iter_packbits_spans_groupby(data, row_size, height)
+
+    size = row_size * height
+    arr = np.frombuffer(data, dtype=np.uint8, count=size)
+    boundary = np.ones(size, dtype=bool)
+    np.not_equal(arr[1:], arr[:-1], out=boundary[1:])
+    boundary[::row_size] = True
+    starts = np.flatnonzero(boundary)
+    runs = np.diff(np.append(starts, size)) > 1
+
+    # Consecutive single bytes in a row form a literal span.
+    head = runs.copy()
+    head[1:] |= runs[:-1]
+    head |= (starts % row_size == 0)
+    index = np.flatnonzero(head)
+    starts = starts[index]
+    lengths = np.diff(np.append(starts, size))
+    return zip(
+        (starts // row_size).tolist(), starts.tolist(), lengths.tolist(),
+        runs[index].tolist()
+    )
+
+
+def _iter_packbits_spans_groupby(data, row_size, height):
+    data = bytearray(data)
+    for row in range(height):
+        pos = row * row_size
+        literal = 0
+        for _, group in itertools.groupby(data[pos:pos + row_size]):
+            length = sum(1 for _ in group)
+            if length > 1:
+                if literal:
+                    yield row, pos - literal, literal, False
+                    literal = 0
+                yield row, pos, length, True
+            else:
+                literal += 1
+            pos += length
+        if literal:
+            yield row, pos - literal, literal, False
+
+
+def encode_prediction(data, w, h, depth, workers=None):
+    try:
+        import numpy  # noqa: F401
+        encode = _encode_prediction_numpy
+    except ImportError:
+        encode = _encode_prediction_array
+    if not workers:
+        return encode(data, w, h, depth)
+
+    if depth not in (8, 16, 32):
+        raise ValueError('Invalid pixel size %d' % (depth))
+    chunks = _split_rows(data, w * depth // 8, h)
+    return b''.join(
+        map_workers(
+            encode, [chunk for chunk, _ in chunks], [w] * len(chunks),
+            [rows for _, rows in chunks], [depth] * len(chunks),
+            workers=workers
         )
+    )
+
+
+def _encode_prediction_numpy(data, w, h, depth):
+    """Delta encoding by row-wise differences."""
+    import numpy as np
+    if depth == 8:
+        arr = np.frombuffer(data, dtype=np.uint8, count=w * h)
+        arr = arr.reshape((h, w))
+    elif depth == 16:
+        arr = np.frombuffer(data, dtype='>u2', count=w * h)
+        arr = arr.reshape((h, w)).astype(np.uint16)
+    elif depth == 32:
+        arr = np.frombuffer(data, dtype=np.uint8, count=w * h * 4)
+        arr = _shuffle_byte_planes(arr, w, h)
+    else:
+        raise ValueError('Invalid pixel size %d' % (depth))
 
+    delta = np.empty_like(arr)
+    delta[:, :1] = arr[:, :1]
+    np.subtract(arr[:, 1:], arr[:, :-1], out=delta[:, 1:])
+    if depth == 16:
+        delta = delta.astype('>u2')
+    return delta.tobytes()
 
-def encode_prediction(data, w, h, depth):
+
+def _encode_prediction_array(data, w, h, depth):
     if depth == 8:
         arr = array.array('B', data)
         arr = _delta_encode(arr, 0x100, w, h)
@@ -106,12 +509,43 @@ def encode_prediction(data, w, h, depth):
         arr = array.array('B', data)
         arr = _shuffle_byte_order(arr, w, h)
         arr = _delta_encode(arr, 0x100, w * 4, h)
-        return getattr(arr, 'tobytes', getattr(arr, 'tostring'))()
+        return _tobytes(arr)
     else:
         raise ValueError('Invalid pixel size %d' % (depth))
 
 
 def decode_prediction(data, w, h, depth):
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return _decode_prediction_array(data, w, h, depth)
+    return _decode_prediction_numpy(data, w, h, depth)
+
+
+def _decode_prediction_numpy(data, w, h, depth):
+    """Delta decoding by cumulative sum along rows.
+
+    Unsigned integer overflow in `cumsum` gives the modular wraparound of the
+    8 and 16 bit predictors.
+    """
+    import numpy as np
+    if depth == 8:
+        arr = np.frombuffer(data, dtype=np.uint8, count=w * h)
+        arr = np.cumsum(arr.reshape((h, w)), axis=1, dtype=np.uint8)
+        return arr.tobytes()
+    elif depth == 16:
+        arr = np.frombuffer(data, dtype='>u2', count=w * h)
+        arr = np.cumsum(arr.reshape((h, w)), axis=1, dtype=np.uint16)
+        return arr.astype('>u2').tobytes()
+    elif depth == 32:
+        arr = np.frombuffer(data, dtype=np.uint8, count=w * h * 4)
+        arr = np.cumsum(arr.reshape((h, w * 4)), axis=1, dtype=np.uint8)
+        return _restore_byte_planes(arr, w, h).tobytes()
+    else:
+        raise ValueError('Invalid pixel size %d' % (depth))
+
+
+def _decode_prediction_array(data, w, h, depth):
     if depth == 8:
         arr = be_array_from_bytes('B', data)
         arr = _delta_decode(arr, 0x100, w, h)
@@ -125,7 +559,13 @@ def decode_prediction(data, w, h, depth):
     else:
         raise ValueError('Invalid pixel size %d' % (depth))
 
-    return getattr(arr, 'tobytes', getattr(arr, 'tostring'))()
+    return _tobytes(arr)
+
+
+def _tobytes(arr):
+    if hasattr(arr, 'tobytes'):
+        return arr.tobytes()
+    return arr.tostring()
 
 
 def _delta_encode(arr, mod, w, h):
@@ -184,3 +624,43 @@ def _restore_byte_order(bytes_array, w, h):
     for dst, src in enumerate(_shuffled_order(w, h)):
         arr[dst] = bytes_array[src]
     return arr
+
+
+def _shuffle_byte_planes(arr, w, h):
+    """
+    Array version of :py:func:`_shuffle_byte_order`.
+
+    Each row of 4-byte values is viewed as a (w, 4) matrix and transposed,
+    so that "123412341234" becomes "111222333444".
+
+    :param arr: uint8 numpy array of h * w * 4 bytes.
+    :return: uint8 numpy array of shape (h, w * 4).
+    """
+    return arr.reshape((h, w, 4)).transpose((0, 2, 1)).reshape((h, w * 4))
+
+
+def _restore_byte_planes(arr, w, h):
+    """
+    Array version of :py:func:`_restore_byte_order`.
+
+    :param arr: uint8 numpy array of h * w * 4 bytes.
+    :return: uint8 numpy array of shape (h, w * 4).
+    """
+    return arr.reshape((h, 4, w)).transpose((0, 2, 1)).reshape((h, w * 4))
+
+
+def _split_rows(data, row_size, height):
+    """
+    Split data into chunks of whole rows.
+
+    :return: list of (chunk bytes, number of rows) tuples.
+    """
+    step = max(1, _CHUNK_SIZE // max(1, row_size))
+    view = memoryview(data)
+    chunks = []
+    for row in range(0, height, step):
+        rows = min(step, height - row)
+        chunks.append((
+            view[row * row_size:(row + rows) * row_size].tobytes(), rows
+        ))
+    return chunks
@@ -62,15 +62,27 @@ class PSD(BaseElement):
     image_data = attr.ib(factory=ImageData)
 
     @classmethod
-    def read(cls, fp, encoding='macroman', **kwargs):
+    def read(cls, fp, encoding='macroman', lazy=False, **kwargs):
+        """
+        Read the PSD file structure.
+
+        :param fp: file-like object.
+        :param encoding: charset encoding of the pascal string.
+        :param lazy: when `True`, layer channel data keeps only the offset
+            and the length, and the compressed bytes are read from `fp` on
+            first access. `fp` must stay open while the data is in use.
+            Merged image data is read in the same way. Tagged blocks are
+            also decoded on first access, and written back verbatim unless
+            decoded.
+        """
         header = FileHeader.read(fp)
         logger.debug('read %s' % header)
         return cls(
             header,
             ColorModeData.read(fp),
             ImageResources.read(fp, encoding),
-            LayerAndMaskInformation.read(fp, encoding, header.version),
-            ImageData.read(fp),
+            LayerAndMaskInformation.read(fp, encoding, header.version, lazy),
+            ImageData.read(fp, lazy),
         )
 
     def write(self, fp, encoding='macroman', **kwargs):
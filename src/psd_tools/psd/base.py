@@ -18,7 +18,7 @@ import logging
 from collections import OrderedDict
 from enum import Enum
 from psd_tools.utils import (
-    read_fmt, write_fmt, trimmed_repr, read_unicode_string,
+    read_fmt, write_fmt, trimmed_repr, read_unicode_string, open_bytes,
     write_unicode_string
 )
 from psd_tools.validators import in_
@@ -61,7 +61,7 @@ class BaseElement(object):
 
     @classmethod
     def frombytes(self, data, *args, **kwargs):
-        with io.BytesIO(data) as f:
+        with open_bytes(data) as f:
             return self.read(f, *args, **kwargs)
 
     def tobytes(self, *args, **kwargs):
@@ -67,10 +67,22 @@ class EngineToken(Enum):
     UNKNOWN_TAG = compile_re(r'^\([a-zA-Z0-9]*\)$')
 
 
+def _compile_token_types():
+    # One alternation of EngineToken patterns, tried in definition order.
+    patterns = [
+        b'(?P<' + token_type.name.encode('ascii') + b'>' +
+        token_type.value.pattern[1:-1] + b')' for token_type in EngineToken
+    ]
+    return re.compile(b'(?:' + b'|'.join(patterns) + b')\\Z', re.S)
+
+
 class Tokenizer(object):
     """
     Tokenize engine data.
 
+    The tokenizer scans `data` by offsets, and classifies each token with a
+    single regular expression.
+
     Example::
 
         tokenizer = Tokenizer(data)
@@ -80,6 +92,7 @@ class Tokenizer(object):
     DIVIDER = compile_re(r'[ \n\t]+')
     UTF16_START = b'(\xfe\xff'
     UTF16_END = compile_re(r'[^\\]\)')
+    TOKEN_TYPES = _compile_token_types()
 
     def __init__(self, data):
         self.data = data
@@ -95,32 +108,32 @@ class Tokenizer(object):
         return self.__next__()
 
     def __next__(self):
-        if len(self) == 0:
-            raise StopIteration
-
-        index = self.index
-        if self.data[index:].startswith(self.UTF16_START):
-            match = self.UTF16_END.search(self.data[index:])
-            if match is None:
-                raise ValueError('Invalid token: %r' % (self.data[index:]))
-            token = self.data[index:index + match.end()]
-            self.index += match.end()
-        else:
-            match = self.DIVIDER.search(self.data[index:])
-            if match is None:
-                token = self.data[index:]
-                self.index = len(self.data)
+        data = self.data
+        token = b''
+        while not token:
+            index = self.index
+            if index >= len(data):
+                raise StopIteration
+
+            if data.startswith(self.UTF16_START, index):
+                match = self.UTF16_END.search(data, index)
+                if match is None:
+                    raise ValueError('Invalid token: %r' % (data[index:]))
+                token = data[index:match.end()]
+                self.index = match.end()
             else:
-                token = self.data[index:index + match.start()]
-                self.index += match.end()
-                if token == b'':
-                    return self.__next__()
-
-        for token_type in EngineToken:
-            if token_type.value.search(token):
-                return token, token_type
+                match = self.DIVIDER.search(data, index)
+                if match is None:
+                    token = data[index:]
+                    self.index = len(data)
+                else:
+                    token = data[index:match.start()]
+                    self.index = match.end()
 
-        raise ValueError("Unknown token: %r" % (token))
+        match = self.TOKEN_TYPES.match(token)
+        if match is None:
+            raise ValueError("Unknown token: %r" % (token))
+        return token, EngineToken[match.lastgroup]
 
 
 @register(EngineToken.DICT_START)
@@ -8,22 +8,30 @@ this is the only place pixels are saved.
 from __future__ import absolute_import, unicode_literals
 import attr
 import logging
-import io
 
-from psd_tools.compression import compress, decompress
+from psd_tools.compression import compress, decompress, decompress_source
 from psd_tools.constants import Compression
 from psd_tools.psd.base import BaseElement
 from psd_tools.validators import in_
-from psd_tools.utils import read_fmt, write_fmt, write_bytes, pack
+from psd_tools.utils import (
+    read_fmt, write_fmt, write_bytes, pack, read_view, read_source
+)
 
 logger = logging.getLogger(__name__)
 
+# Compression types that can be decoded from an arbitrary row.
+_SEEKABLE = (Compression.RAW, Compression.PACK_BITS)
 
-@attr.s(slots=True)
+
+@attr.s(slots=True, eq=False)
 class ImageData(BaseElement):
     """
     Merged channel image data.
 
+    When the image data is read in lazy mode, only the file offset and the
+    length are recorded, and the compressed bytes are read from the file
+    object on the first access to :py:attr:`data`.
+
     .. py:attribute:: compression
 
         See :py:class:`~psd_tools.constants.Compression`.
@@ -37,13 +45,20 @@ class ImageData(BaseElement):
         converter=Compression,
         validator=in_(Compression)
     )
-    data = attr.ib(default=b'', type=bytes, repr=False)
+    _data = attr.ib(default=b'', type=bytes, repr=False)
+    _source = attr.ib(default=None, repr=False)
 
     @classmethod
-    def read(cls, fp):
+    def read(cls, fp, lazy=False):
         start_pos = fp.tell()
         compression = Compression(read_fmt('H', fp)[0])
-        data = fp.read()  # TODO: Parse data here. Need header.
+        if lazy:
+            offset = fp.tell()
+            fp.seek(0, 2)
+            length = fp.tell() - offset
+            logger.debug('  skipped image data, len=%d' % (length + 2))
+            return cls(compression, None, (fp, offset, length))
+        data = read_view(fp)  # TODO: Parse data here. Need header.
         logger.debug('  read image data, len=%d' % (fp.tell() - start_pos))
         return cls(compression, data)
 
@@ -54,22 +69,80 @@ class ImageData(BaseElement):
         logger.debug('  wrote image data, len=%d' % (fp.tell() - start_pos))
         return written
 
-    def get_data(self, header):
+    @property
+    def data(self):
+        """Compressed data bytes."""
+        if self._source is not None:
+            self._data = read_source(self._source)
+            self._source = None
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+        self._source = None
+
+    def get_data(self, header, channel=None, rows=None):
         """
         Get decompressed data.
 
+        Channels are stacked vertically in the compressed data, so a single
+        channel or a range of rows is decompressed without the rest. For
+        `RAW` and `PACK_BITS` data read in lazy mode, only the corresponding
+        bytes and the row byte-count table are read from the file.
+
         :param header: See :py:class:`~psd_tools.psd.header.FileHeader`.
-        :return: `list` of bytes corresponding each channel.
+        :param channel: index of the channel to decompress. When `None`, all
+            the channels are decompressed.
+        :param rows: (start, stop) tuple to decompress only the rows in
+            `[start, stop)` of each channel.
+        :return: `list` of bytes corresponding each channel, or bytes of the
+            given channel.
         """
-        data = decompress(
-            self.data, self.compression, header.width,
-            header.height * header.channels, header.depth, header.version
+        if channel is None and (
+            rows is None or self.compression not in _SEEKABLE
+        ):
+            # Zlib streams are inflated from the beginning anyway.
+            data = decompress(
+                self.data, self.compression, header.width,
+                header.height * header.channels, header.depth, header.version
+            )
+            plane_size = len(data) // header.channels
+            row_size = plane_size // max(1, header.height)
+            start, stop = rows or (0, header.height)
+            return [
+                data[i * plane_size + start * row_size:
+                     i * plane_size + stop * row_size]
+                for i in range(header.channels)
+            ]
+
+        start, stop = rows or (0, header.height)
+        stop = max(0, min(header.height, stop))
+        start = max(0, min(start, stop))
+        indices = range(header.channels) if channel is None else [channel]
+        planes = [
+            self._get_rows(
+                header, index * header.height + start,
+                index * header.height + stop
+            ) for index in indices
+        ]
+        return planes if channel is None else planes[0]
+
+    def _get_rows(self, header, start, stop):
+        """Decompress rows of the vertically stacked channels."""
+        height = header.height * header.channels
+        if self._source is None or self.compression not in _SEEKABLE:
+            return decompress(
+                self.data, self.compression, header.width, height,
+                header.depth, header.version, (start, stop)
+            )
+
+        return decompress_source(
+            self._source, self.compression, header.width, height,
+            header.depth, header.version, (start, stop)
         )
-        plane_size = len(data) // header.channels
-        with io.BytesIO(data) as f:
-            return [f.read(plane_size) for _ in range(header.channels)]
 
-    def set_data(self, data, header):
+    def set_data(self, data, header, workers=None):
         """
         Set raw data and compress.
 
@@ -77,22 +150,27 @@ class ImageData(BaseElement):
         :param compression: compression type,
             see :py:class:`~psd_tools.constants.Compression`.
         :param header: See :py:class:`~psd_tools.psd.header.FileHeader`.
+        :param workers: parallel compression option, see
+            :py:func:`~psd_tools.compression.compress`.
         :return: length of compressed data.
         """
         self.data = compress(
             b''.join(data), self.compression, header.width,
-            header.height * header.channels, header.depth, header.version
+            header.height * header.channels, header.depth, header.version,
+            workers
         )
         return len(self.data)
 
     @classmethod
-    def new(cls, header, color=0, compression=Compression.RAW):
+    def new(cls, header, color=0, compression=Compression.RAW, workers=None):
         """
         Create a new image data object.
 
         :param header: FileHeader.
         :param compression: compression type.
         :param color: default color. int or iterable for channel length.
+        :param workers: parallel compression option, see
+            :py:func:`~psd_tools.compression.compress`.
         """
         plane_size = header.width * header.height
         if isinstance(color, (bool, int, float)):
@@ -108,5 +186,14 @@ class ImageData(BaseElement):
         for i in range(header.channels):
             data.append(pack(fmt, color[i]) * plane_size)
         self = cls(compression=compression)
-        self.set_data(data, header)
+        self.set_data(data, header, workers)
         return self
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return (self.compression, self.data) == (other.compression, other.data)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
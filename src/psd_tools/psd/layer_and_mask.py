@@ -8,7 +8,7 @@ import logging
 
 from psd_tools.psd.base import BaseElement, ListElement
 from psd_tools.psd.tagged_blocks import TaggedBlocks, register
-from psd_tools.compression import compress, decompress
+from psd_tools.compression import compress, decompress, decompress_source
 from psd_tools.validators import in_, range_
 from psd_tools.constants import (
     BlendMode, Clipping, Compression, ChannelID, GlobalLayerMaskKind, Tag
@@ -16,7 +16,7 @@ from psd_tools.constants import (
 from psd_tools.utils import (
     read_fmt, write_fmt, read_pascal_string, write_pascal_string,
     read_length_block, write_length_block, is_readable, write_padding,
-    write_bytes
+    read_view, read_source, write_bytes, new_stamp
 )
 
 logger = logging.getLogger(__name__)
@@ -44,7 +44,7 @@ class LayerAndMaskInformation(BaseElement):
     tagged_blocks = attr.ib(default=None)
 
     @classmethod
-    def read(cls, fp, encoding='macroman', version=1):
+    def read(cls, fp, encoding='macroman', version=1, lazy=False):
         start_pos = fp.tell()
         length = read_fmt(('I', 'Q')[version - 1], fp)[0]
         end_pos = fp.tell() + length
@@ -55,14 +55,14 @@ class LayerAndMaskInformation(BaseElement):
         if length == 0:
             self = cls()
         else:
-            self = cls._read_body(fp, end_pos, encoding, version)
+            self = cls._read_body(fp, end_pos, encoding, version, lazy)
         assert fp.tell() <= end_pos
         fp.seek(end_pos, 0)
         return self
 
     @classmethod
-    def _read_body(cls, fp, end_pos, encoding, version):
-        layer_info = LayerInfo.read(fp, encoding, version)
+    def _read_body(cls, fp, end_pos, encoding, version, lazy=False):
+        layer_info = LayerInfo.read(fp, encoding, version, lazy)
         global_layer_mask_info = None
         if is_readable(fp) and fp.tell() < end_pos:
             global_layer_mask_info = GlobalLayerMaskInfo.read(fp)
@@ -71,7 +71,7 @@ class LayerAndMaskInformation(BaseElement):
         if is_readable(fp):
             # For some reason, global tagged blocks aligns 4 byte
             tagged_blocks = TaggedBlocks.read(
-                fp, version=version, padding=4, end_pos=end_pos
+                fp, version=version, padding=4, end_pos=end_pos, lazy=lazy
             )
 
         return cls(layer_info, global_layer_mask_info, tagged_blocks)
@@ -120,25 +120,27 @@ class LayerInfo(BaseElement):
     channel_image_data = attr.ib(default=None)
 
     @classmethod
-    def read(cls, fp, encoding='macroman', version=1):
+    def read(cls, fp, encoding='macroman', version=1, lazy=False):
         length = read_fmt(('I', 'Q')[version - 1], fp)[0]
         logger.debug('reading layer info, len=%d' % length)
         end_pos = fp.tell() + length
         if length == 0:
             self = LayerInfo()
         else:
-            self = cls._read_body(fp, encoding, version)
+            self = cls._read_body(fp, encoding, version, lazy)
         assert fp.tell() <= end_pos
         fp.seek(end_pos, 0)
         return self
 
     @classmethod
-    def _read_body(cls, fp, encoding, version):
+    def _read_body(cls, fp, encoding, version, lazy=False):
         start_pos = fp.tell()
         layer_count = read_fmt('h', fp)[0]
-        layer_records = LayerRecords.read(fp, layer_count, encoding, version)
+        layer_records = LayerRecords.read(
+            fp, layer_count, encoding, version, lazy
+        )
         logger.debug('  read layer records, len=%d' % (fp.tell() - start_pos))
-        channel_image_data = ChannelImageData.read(fp, layer_records)
+        channel_image_data = ChannelImageData.read(fp, layer_records, lazy)
         return cls(layer_count, layer_records, channel_image_data)
 
     def write(self, fp, encoding='macroman', version=1, padding=4):
@@ -183,8 +185,8 @@ class LayerInfoBlock(LayerInfo):
     """
 
     @classmethod
-    def read(cls, fp, encoding='macroman', version=1, **kwargs):
-        return cls._read_body(fp, encoding, version)
+    def read(cls, fp, encoding='macroman', version=1, lazy=False, **kwargs):
+        return cls._read_body(fp, encoding, version, lazy)
 
     def write(self, fp, encoding='macroman', version=1, padding=4, **kwargs):
         return self._write_body(fp, encoding, version, padding)
@@ -331,10 +333,12 @@ class LayerRecords(ListElement):
     """
 
     @classmethod
-    def read(cls, fp, layer_count, encoding='macroman', version=1):
+    def read(
+        cls, fp, layer_count, encoding='macroman', version=1, lazy=False
+    ):
         items = []
         for idx in range(abs(layer_count)):
-            items.append(LayerRecord.read(fp, encoding, version))
+            items.append(LayerRecord.read(fp, encoding, version, lazy))
         return cls(items)
 
 
@@ -424,7 +428,7 @@ class LayerRecord(BaseElement):
     tagged_blocks = attr.ib(factory=TaggedBlocks)
 
     @classmethod
-    def read(cls, fp, encoding='macroman', version=1):
+    def read(cls, fp, encoding='macroman', version=1, lazy=False):
         start_pos = fp.tell()
         top, left, bottom, right, num_channels = read_fmt('4iH', fp)
         channel_info = [
@@ -439,7 +443,7 @@ class LayerRecord(BaseElement):
             self = cls(
                 top, left, bottom, right, channel_info, signature,
                 blend_mode, opacity, clipping, flags,
-                *cls._read_extra(f, encoding, version)
+                *cls._read_extra(f, encoding, version, lazy)
             )
 
         # with io.BytesIO() as f:
@@ -449,11 +453,13 @@ class LayerRecord(BaseElement):
         return self
 
     @classmethod
-    def _read_extra(cls, fp, encoding, version):
+    def _read_extra(cls, fp, encoding, version, lazy=False):
         mask_data = MaskData.read(fp)
         blending_ranges = LayerBlendingRanges.read(fp)
         name = read_pascal_string(fp, encoding, padding=4)
-        tagged_blocks = TaggedBlocks.read(fp, version=version, padding=1)
+        tagged_blocks = TaggedBlocks.read(
+            fp, version=version, padding=1, lazy=lazy
+        )
         return mask_data, blending_ranges, name, tagged_blocks
 
     def write(self, fp, encoding='macroman', version=1):
@@ -785,11 +791,13 @@ class ChannelImageData(ListElement):
     """
 
     @classmethod
-    def read(cls, fp, layer_records=None):
+    def read(cls, fp, layer_records=None, lazy=False):
         start_pos = fp.tell()
         items = []
         for idx, layer in enumerate(layer_records):
-            items.append(ChannelDataList.read(fp, layer.channel_info))
+            items.append(
+                ChannelDataList.read(fp, layer.channel_info, lazy=lazy)
+            )
         logger.debug(
             '  read channel image data, len=%d' % (fp.tell() - start_pos)
         )
@@ -830,11 +838,15 @@ class ChannelDataList(ListElement):
         return [item._length for item in self]
 
 
-@attr.s(slots=True)
+@attr.s(slots=True, eq=False)
 class ChannelData(BaseElement):
     """
     Channel data.
 
+    When the channel data is read in lazy mode, only the file offset and the
+    length are recorded, and the compressed bytes are read from the file
+    object on the first access to :py:attr:`data`.
+
     .. py:attribute:: compression
 
         Compression type. See :py:class:`~psd_tools.constants.Compression`.
@@ -848,12 +860,18 @@ class ChannelData(BaseElement):
         converter=Compression,
         validator=in_(Compression)
     )
-    data = attr.ib(default=b'', type=bytes)
+    _data = attr.ib(default=b'', type=bytes, repr=False)
+    _source = attr.ib(default=None, repr=False)
+    _stamp = attr.ib(factory=new_stamp, repr=False)
 
     @classmethod
-    def read(cls, fp, length=0, **kwargs):
+    def read(cls, fp, length=0, lazy=False, **kwargs):
         compression = Compression(read_fmt('H', fp)[0])
-        data = fp.read(length)
+        if lazy:
+            source = (fp, fp.tell(), length)
+            fp.seek(length, 1)
+            return cls(compression, None, source)
+        data = read_view(fp, length)
         return cls(compression, data)
 
     def write(self, fp, **kwargs):
@@ -862,20 +880,45 @@ class ChannelData(BaseElement):
         # written += write_padding(fp, written, 2)  # Seems no padding here.
         return written
 
-    def get_data(self, width, height, depth, version=1):
+    @property
+    def data(self):
+        """Compressed data bytes."""
+        if self._source is not None:
+            self._data = read_source(self._source)
+            self._source = None
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+        self._source = None
+        self._stamp = new_stamp()
+
+    def get_data(self, width, height, depth, version=1, rows=None):
         """Get decompressed channel data.
 
         :param width: width.
         :param height: height.
         :param depth: bit depth of the pixel.
         :param version: psd file version.
+        :param rows: (start, stop) tuple to decompress only the rows in
+            `[start, stop)`, see :py:func:`~psd_tools.compression.decompress`.
+            In lazy mode, only the bytes of the rows are read from the file
+            for `RAW` and `PACK_BITS` compression.
         :rtype: bytes
         """
+        if self._source is not None and rows is not None and (
+            self.compression in (Compression.RAW, Compression.PACK_BITS)
+        ):
+            return decompress_source(
+                self._source, self.compression, width, height, depth,
+                version, rows
+            )
         return decompress(
-            self.data, self.compression, width, height, depth, version
+            self.data, self.compression, width, height, depth, version, rows
         )
 
-    def set_data(self, data, width, height, depth, version=1):
+    def set_data(self, data, width, height, depth, version=1, workers=None):
         """Set raw channel data and compress to store.
 
         :param data: raw data bytes to write.
@@ -885,9 +928,11 @@ class ChannelData(BaseElement):
         :param height: height.
         :param depth: bit depth of the pixel.
         :param version: psd file version.
+        :param workers: parallel compression option, see
+            :py:func:`~psd_tools.compression.compress`.
         """
         self.data = compress(
-            data, self.compression, width, height, depth, version
+            data, self.compression, width, height, depth, version, workers
         )
         return len(self.data)
 
@@ -895,8 +940,24 @@ class ChannelData(BaseElement):
     def _length(self):
         """Length of channel data block.
         """
+        if self._source is not None:
+            return 2 + self._source[2]
         return 2 + len(self.data)
 
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return (self.compression, self.data) == (other.compression, other.data)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __repr__(self):
+        return '%s(compression=%r, data=%r)' % (
+            self.__class__.__name__, self.compression, self.data
+        )
+
 
 @attr.s(slots=True)
 class GlobalLayerMaskInfo(BaseElement):
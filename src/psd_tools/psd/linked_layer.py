@@ -3,7 +3,6 @@ Linked layer structure.
 """
 from __future__ import absolute_import, unicode_literals
 import attr
-import io
 import logging
 
 from psd_tools.constants import LinkedLayerType
@@ -13,7 +12,7 @@ from psd_tools.validators import in_, range_
 from psd_tools.utils import (
     read_fmt, write_fmt, read_length_block, write_length_block, is_readable,
     write_bytes, read_unicode_string, write_unicode_string, read_pascal_string,
-    write_pascal_string, write_padding
+    write_pascal_string, write_padding, read_view
 )
 
 logger = logging.getLogger(__name__)
@@ -28,9 +27,8 @@ class LinkedLayers(ListElement):
     def read(cls, fp, **kwargs):
         items = []
         while is_readable(fp, 8):
-            data = read_length_block(fp, fmt='Q', padding=4)
-            with io.BytesIO(data) as f:
-                items.append(LinkedLayer.read(f))
+            data = read_length_block(fp, fmt='Q', padding=4, view=True)
+            items.append(LinkedLayer.frombytes(data))
         return cls(items)
 
     def write(self, fp, **kwargs):
@@ -106,11 +104,11 @@ class LinkedLayer(BaseElement):
                 timestamp = read_fmt('I4Bd', fp)
             filesize = read_fmt('Q', fp)[0]  # External file size.
             if version > 2:
-                data = fp.read(datasize)
+                data = read_view(fp, datasize)
         elif kind == LinkedLayerType.ALIAS:
             read_fmt('8x', fp)
         if kind == LinkedLayerType.DATA:
-            data = fp.read(datasize)
+            data = read_view(fp, datasize)
             assert len(data) == datasize, '(%d vs %d)' % (len(data), datasize)
 
         # The followings are not well documented...
@@ -121,7 +119,7 @@ class LinkedLayer(BaseElement):
         if version >= 7:
             lock_state = read_fmt('B', fp)[0]
         if kind == LinkedLayerType.EXTERNAL and version == 2:
-            data = fp.read(datasize)
+            data = read_view(fp, datasize)
 
         return cls(
             kind, version, uuid, filename, filetype, creator, filesize,
@@ -3,7 +3,6 @@ Patterns structure.
 """
 from __future__ import absolute_import, unicode_literals
 import attr
-import io
 import logging
 
 from psd_tools.compression import compress, decompress
@@ -21,6 +20,8 @@ from psd_tools.utils import (
     write_unicode_string,
     read_pascal_string,
     write_pascal_string,
+    read_view,
+    open_bytes,
 )
 
 logger = logging.getLogger(__name__)
@@ -36,9 +37,8 @@ class Patterns(ListElement):
     def read(cls, fp, **kwargs):
         items = []
         while is_readable(fp, 4):
-            data = read_length_block(fp, padding=4)
-            with io.BytesIO(data) as f:
-                items.append(Pattern.read(f))
+            data = read_length_block(fp, padding=4, view=True)
+            items.append(Pattern.frombytes(data))
         return cls(items)
 
     def write(self, fp, **kwargs):
@@ -146,8 +146,8 @@ class VirtualMemoryArrayList(BaseElement):
         version = read_fmt('I', fp)[0]
         assert version == 3, 'Invalid version %d' % (version)
 
-        data = read_length_block(fp)
-        with io.BytesIO(data) as f:
+        data = read_length_block(fp, view=True)
+        with open_bytes(data) as f:
             rectangle = read_fmt('4I', f)
             num_channels = read_fmt('I', f)[0]
             channels = []
@@ -202,7 +202,7 @@ class VirtualMemoryArray(BaseElement):
         depth = read_fmt('I', fp)[0]
         rectangle = read_fmt('4I', fp)
         pixel_depth, compression = read_fmt('HB', fp)
-        data = fp.read(length - 23)
+        data = read_view(fp, length - 23)
         return cls(
             is_written, depth, rectangle, pixel_depth, compression, data
         )
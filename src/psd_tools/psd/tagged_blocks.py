@@ -40,8 +40,9 @@ from psd_tools.psd.vector import (
 from psd_tools.validators import in_
 from psd_tools.utils import (
     read_fmt, write_fmt, read_length_block, write_length_block, is_readable,
-    write_bytes, read_unicode_string, write_unicode_string, write_padding,
-    read_pascal_string, write_pascal_string, trimmed_repr, new_registry
+    write_bytes, read_unicode_string, write_unicode_string, read_padding,
+    write_padding, read_pascal_string, write_pascal_string, trimmed_repr,
+    new_registry
 )
 
 logger = logging.getLogger(__name__)
@@ -149,12 +150,12 @@ class TaggedBlocks(DictElement):
         self[key] = TaggedBlock(key=key, data=kls(*args, **kwargs))
 
     @classmethod
-    def read(cls, fp, version=1, padding=1, end_pos=None):
+    def read(cls, fp, version=1, padding=1, end_pos=None, lazy=False):
         items = []
         while is_readable(fp, 8):  # len(signature) + len(key) = 8
             if end_pos is not None and fp.tell() >= end_pos:
                 break
-            block = TaggedBlock.read(fp, version, padding)
+            block = TaggedBlock.read(fp, version, padding, lazy)
             if block is None:
                 break
             items.append((block.key, block))
@@ -187,11 +188,15 @@ class TaggedBlocks(DictElement):
             p.breakable('')
 
 
-@attr.s(slots=True)
+@attr.s(slots=True, eq=False)
 class TaggedBlock(BaseElement):
     """
     Layer tagged block with extra info.
 
+    When the block is read in lazy mode, the raw bytes are kept and decoded
+    on the first access to :py:attr:`data`. A block that has never been
+    decoded is written back verbatim.
+
     .. py:attribute:: key
 
         4-character code. See :py:class:`~psd_tools.constants.Tag`
@@ -224,14 +229,29 @@ class TaggedBlock(BaseElement):
         Tag.ARTBOARD_DATA2,
     }
 
+    # Blocks holding pixel or file data, parsed from a view of the buffer.
+    _VIEW_KEYS = {
+        Tag.LAYER_16,
+        Tag.LAYER_32,
+        Tag.LINKED_LAYER1,
+        Tag.LINKED_LAYER2,
+        Tag.LINKED_LAYER3,
+        Tag.LINKED_LAYER_EXTERNAL,
+        Tag.PATTERNS1,
+        Tag.PATTERNS2,
+        Tag.PATTERNS3,
+    }
+
     signature = attr.ib(
         default=b'8BIM', repr=False, validator=in_(_SIGNATURES)
     )
     key = attr.ib(default=b'')
-    data = attr.ib(default=b'', repr=True)
+    _data = attr.ib(default=b'', repr=False)
+    _raw = attr.ib(default=None, repr=False)
+    _version = attr.ib(default=1, repr=False)
 
     @classmethod
-    def read(cls, fp, version=1, padding=1):
+    def read(cls, fp, version=1, padding=1, lazy=False):
         signature = read_fmt('4s', fp)[0]
         if signature not in cls._SIGNATURES:
             logger.warning('Invalid signature (%r)' % (signature))
@@ -247,8 +267,21 @@ class TaggedBlock(BaseElement):
             logger.warning(message)
 
         fmt = cls._length_format(key, version)
-        raw_data = read_length_block(fp, fmt=fmt, padding=padding)
         kls = TYPES.get(key)
+        if lazy and key in (Tag.LAYER_16, Tag.LAYER_32):
+            # Read in place so that channel data refers to offsets in fp.
+            length = read_fmt(fmt, fp)[0]
+            end_pos = fp.tell() + length
+            data = kls.read(fp, version=version, lazy=True)
+            fp.seek(end_pos, 0)
+            read_padding(fp, length, padding)
+            return cls(signature, key, data)
+
+        raw_data = read_length_block(
+            fp, fmt=fmt, padding=padding, view=key in cls._VIEW_KEYS
+        )
+        if kls and lazy:
+            return cls(signature, key, None, raw_data, version)
         if kls:
             data = kls.frombytes(raw_data, version=version)
             # _raw_data = data.tobytes(version=version,
@@ -270,6 +303,8 @@ class TaggedBlock(BaseElement):
         written = write_fmt(fp, '4s4s', self.signature, key)
 
         def writer(f):
+            if self._raw is not None and self._version == version:
+                return write_bytes(f, self._raw)
             if hasattr(self.data, 'write'):
                 # It seems padding size applies at the block level here.
                 inner_padding = 1 if padding == 4 else 4
@@ -282,10 +317,40 @@ class TaggedBlock(BaseElement):
         written += write_length_block(fp, writer, fmt=fmt, padding=padding)
         return written
 
+    @property
+    def data(self):
+        """Data."""
+        if self._raw is not None:
+            kls = TYPES.get(self.key)
+            self._data = kls.frombytes(self._raw, version=self._version)
+            self._raw = None
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+        self._raw = None
+
     @classmethod
     def _length_format(cls, key, version):
         return ('I', 'Q')[int(version == 2 and key in cls._BIG_KEYS)]
 
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return (self.signature, self.key, self.data) == (
+            other.signature, other.key, other.data
+        )
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __repr__(self):
+        return '%s(key=%r, data=%r)' % (
+            self.__class__.__name__, self.key, self.data
+        )
+
 
 @register(Tag.ANNOTATIONS)
 @attr.s(repr=False, slots=True)
@@ -2,10 +2,14 @@
 Various utility functions for low-level binary processing.
 """
 from __future__ import unicode_literals, print_function, division
+import io
+import itertools
 import logging
+import os
 import sys
 import struct
 import array
+import threading
 
 try:
     unichr = unichr
@@ -14,6 +18,11 @@ except NameError:
 
 logger = logging.getLogger(__name__)
 
+# Lazy elements of a document share the file object.
+_source_lock = threading.Lock()
+
+_stamps = itertools.count()
+
 
 def pack(fmt, *args):
     fmt = str(">" + fmt)
@@ -66,16 +75,18 @@ def write_bytes(fp, data):
     return written
 
 
-def read_length_block(fp, fmt='I', padding=1):
+def read_length_block(fp, fmt='I', padding=1, view=False):
     """
     Read a block of data with a length marker at the beginning.
 
     :param fp: file-like
     :param fmt: format of the length marker
+    :param view: return a memoryview when `fp` is a
+        :py:class:`BufferReader`, see :py:func:`read_view`.
     :return: bytes object
     """
     length = read_fmt(fmt, fp)[0]
-    data = fp.read(length)
+    data = read_view(fp, length) if view else fp.read(length)
     assert len(data) == length, (len(data), length)
     read_padding(fp, length, padding)
     return data
@@ -103,6 +114,120 @@ def write_length_block(fp, writer, fmt='I', padding=1, **kwargs):
     return written
 
 
+def read_view(fp, size=-1):
+    """
+    Read `size` bytes without copying when `fp` is a
+    :py:class:`BufferReader`.
+
+    :param fp: file-like
+    :param size: byte size, negative to read until the end
+    :return: memoryview for :py:class:`BufferReader`, bytes otherwise
+    """
+    read = getattr(fp, 'read_view', fp.read)
+    return read(size)
+
+
+def read_source(source):
+    """
+    Read the bytes recorded by a lazy read.
+
+    :param source: (fp, offset, length) tuple. The position of `fp` is
+        restored so that the file object can be shared by lazy elements.
+    :return: bytes object
+    """
+    fp, offset, length = source
+    if getattr(fp, 'closed', False):
+        raise ValueError(
+            'Pixel data was not loaded and its file is closed; reopen the '
+            'document with load_pixels=True'
+        )
+    with _source_lock:
+        position = fp.tell()
+        fp.seek(offset)
+        data = read_view(fp, length)
+        fp.seek(position)
+    return data
+
+
+def open_bytes(data):
+    """
+    Open a file-like object over `data`.
+
+    :param data: bytes or memoryview
+    :return: :py:class:`BufferReader` for memoryview so that nested reads
+        keep referring to the original buffer, :py:class:`io.BytesIO`
+        otherwise.
+    """
+    if isinstance(data, memoryview):
+        return BufferReader(data)
+    return io.BytesIO(data)
+
+
+class BufferReader(object):
+    """
+    Read-only file-like object over a buffer such as `mmap`.
+
+    :py:meth:`read` returns bytes like :py:class:`io.BytesIO`, while
+    :py:meth:`read_view` returns memoryview slices of the buffer without
+    copying.
+
+    :param data: object supporting the buffer protocol.
+    """
+
+    def __init__(self, data):
+        self._view = memoryview(data)
+        self._position = 0
+        self._closed = False
+
+    def read(self, size=-1):
+        return self.read_view(size).tobytes()
+
+    def read_view(self, size=-1):
+        start = self._position
+        if size is None or size < 0:
+            end = len(self._view)
+        else:
+            end = min(start + size, len(self._view))
+        self._position = max(start, end)
+        return self._view[start:end]
+
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self._position
+        elif whence == 2:
+            offset += len(self._view)
+        if offset < 0:
+            raise ValueError('negative seek position %d' % offset)
+        self._position = offset
+        return offset
+
+    def tell(self):
+        return self._position
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def close(self):
+        # Slices returned by read_view() stay valid after the release.
+        release = getattr(self._view, 'release', None)  # Python 3 only.
+        if release:
+            release()
+        self._closed = True
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
 def reserve_position(fp, fmt='I'):
     """
     Reserves the current position for write.
@@ -306,3 +431,29 @@ def new_registry(attribute=None):
         return decorator
 
     return registry, register
+
+
+def new_stamp():
+    """
+    Returns a value that is unique in the process and among its workers,
+    which identifies a version of mutable data, e.g., for caching.
+    """
+    return (os.getpid(), next(_stamps))
+
+
+def map_workers(func, *iterables, **kwargs):
+    """
+    Map `func` over `iterables` with the given `workers`.
+
+    `workers` is either the number of threads or an executor object that
+    provides `map`. Results keep the order of the input.
+    """
+    workers = kwargs.get('workers')
+    if workers is None or workers == 1:
+        return list(map(func, *iterables))
+    if hasattr(workers, 'map'):
+        return list(workers.map(func, *iterables))
+
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(func, *iterables))
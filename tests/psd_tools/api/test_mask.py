@@ -28,3 +28,15 @@ def test_layer_mask(layer_mask_data, real):
     mask.real_flags
     repr(mask)
     assert mask.topil()
+
+
+def test_layer_mask_bbox(layer_mask_data):
+    mask = layer_mask_data[4].mask
+    bbox = (20, 150, 100, 300)
+    image = mask.topil(bbox=bbox)
+    assert image.info['offset'] == (20, 150)
+    expected = mask.topil().crop((
+        bbox[0] - mask.left, bbox[1] - mask.top, bbox[2] - mask.left,
+        mask.height
+    ))
+    assert image.tobytes() == expected.tobytes()
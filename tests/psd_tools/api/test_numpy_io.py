@@ -0,0 +1,101 @@
+from __future__ import absolute_import, unicode_literals
+import pytest
+import logging
+
+from psd_tools.api import numpy_io
+from psd_tools.api.psd_image import PSDImage
+from psd_tools.constants import ChannelID
+from ..utils import full_name
+
+logger = logging.getLogger(__name__)
+
+np = pytest.importorskip('numpy')
+
+
+@pytest.mark.parametrize(
+    'filename, shape, dtype', [
+        ('colormodes/4x4_1bit_bitmap.psd', (4, 4, 1), np.bool_),
+        ('colormodes/4x4_8bit_grayscale.psd', (4, 4, 1), np.uint8),
+        ('colormodes/4x4_8bit_rgb.psd', (4, 4, 3), np.uint8),
+        ('colormodes/4x4_8bit_rgba.psd', (4, 4, 3), np.uint8),
+        ('colormodes/4x4_8bit_cmyk.psd', (4, 4, 4), np.uint8),
+        ('colormodes/4x4_16bit_rgb.psd', (4, 4, 3), np.uint16),
+        ('colormodes/4x4_32bit_rgb.psd', (4, 4, 3), np.float32),
+    ]
+)
+def test_psd_image_numpy(filename, shape, dtype):
+    psd = PSDImage.open(full_name(filename))
+    array = psd.numpy()
+    assert array.shape == shape
+    assert array.dtype == dtype
+    assert psd.numpy(0).shape == shape[:2]
+
+
+@pytest.mark.parametrize(
+    'filename', [
+        'colormodes/4x4_8bit_grayscale.psd',
+        'colormodes/4x4_8bit_rgb.psd',
+        'colormodes/4x4_8bit_cmyk.psd',
+        'layers/pixel-layer.psd',
+    ]
+)
+def test_layer_numpy(filename):
+    psd = PSDImage.open(full_name(filename))
+    for layer in psd.descendants():
+        image = layer.topil(apply_icc=False)
+        if image is None:
+            assert layer.numpy() is None
+            continue
+        expected = np.asarray(image).reshape(image.height, image.width, -1)
+        array = layer.numpy()
+        assert array.dtype == np.uint8
+        # PIL drops alpha in CMYK mode.
+        assert np.array_equal(array[:, :, :expected.shape[2]], expected)
+        alpha = layer.topil(ChannelID.TRANSPARENCY_MASK)
+        if alpha is not None:
+            assert np.array_equal(
+                layer.numpy(ChannelID.TRANSPARENCY_MASK), np.asarray(alpha)
+            )
+
+
+def test_layer_numpy_bbox():
+    psd = PSDImage.open(full_name('layers/pixel-layer.psd'))
+    layer = psd[0]
+    array = layer.numpy()
+    bbox = (5, 8, 20, 40)
+    region = (
+        bbox[0] - layer.left, bbox[1] - layer.top, bbox[2] - layer.left,
+        layer.height
+    )
+    expected = array[region[1]:region[3], region[0]:region[2]]
+    assert np.array_equal(layer.numpy(bbox=bbox), expected)
+    assert np.array_equal(layer.numpy(0, bbox=bbox), expected[:, :, 0])
+    assert layer.numpy(bbox=(40, 40, 50, 50)) is None
+
+
+def test_numpy_dtype():
+    psd = PSDImage.open(full_name('colormodes/4x4_16bit_rgb.psd'))
+    array = psd.numpy()
+    assert array.dtype == np.uint16
+    normalized = psd.numpy(dtype=np.float32)
+    assert normalized.dtype == np.float32
+    assert np.allclose(normalized, array / 65535.)
+    assert np.array_equal(
+        psd.numpy(dtype=np.uint8), np.round(array / 257.).astype(np.uint8)
+    )
+
+
+@pytest.mark.parametrize(
+    'depth, array, dtype, expected', [
+        (8, [0, 255], np.float32, [0., 1.]),
+        (8, [0, 255], np.uint16, [0, 65535]),
+        (16, [0, 65535], np.uint8, [0, 255]),
+        (32, [-0.5, 1.5], np.uint8, [0, 255]),
+        (1, [False, True], np.uint8, [0, 255]),
+    ]
+)
+def test_convert_dtype(depth, array, dtype, expected):
+    array = np.array(array, dtype=numpy_io.get_dtype(depth))
+    result = numpy_io.convert_dtype(array, depth, dtype)
+    assert result.dtype == dtype
+    assert np.array_equal(result, np.array(expected, dtype=dtype))
@@ -1,4 +1,5 @@
 from __future__ import absolute_import, unicode_literals
+import io
 import pytest
 import logging
 import os
@@ -39,6 +40,90 @@ def test_open_save(filename, tmpdir):
         PSDImage.open(f)
 
 
+def test_open_lazy(tmpdir):
+    input_path = full_name('layers/pixel-layer.psd')
+    expected = PSDImage.open(input_path)
+    with PSDImage.open(input_path, lazy=True) as psd:
+        assert psd._fp is not None
+        assert psd[0].has_pixels()
+        assert psd[0].topil() == expected[0].topil()
+        assert psd._record == expected._record
+    assert psd._fp is None
+
+    output_path = os.path.join(str(tmpdir), 'output.psd')
+    expected.save(output_path)
+    psd = PSDImage.open(output_path, lazy=True)
+    psd.save(output_path)
+    psd.close()
+    assert PSDImage.open(output_path)._record == expected._record
+
+    with open(output_path, 'rb') as f:
+        psd = PSDImage.open(f, mmap=True)
+        psd.save(output_path)
+        assert psd[0].topil() == expected[0].topil()
+        psd.close()
+    assert PSDImage.open(output_path)._record == expected._record
+
+
+def test_open_metadata():
+    input_path = full_name('layers/group.psd')
+    expected = PSDImage.open(input_path)
+    psd = PSDImage.open(input_path, load_pixels=False)
+    assert psd._fp is None
+    assert psd.size == expected.size
+    assert [(layer.name, layer.kind, layer.bbox)
+            for layer in psd.descendants()] == [
+                (layer.name, layer.kind, layer.bbox)
+                for layer in expected.descendants()
+            ]
+    with pytest.raises(ValueError):
+        psd._record.image_data.data
+    for func in (psd.topil, psd.numpy):
+        with pytest.raises(ValueError, match='load_pixels=True'):
+            func()
+    with pytest.raises(ValueError, match='load_pixels=True'):
+        psd.save(io.BytesIO())
+
+    psd = PSDImage.open(
+        full_name('layers/pixel-layer.psd'), load_pixels=False
+    )
+    with pytest.raises(ValueError, match='load_pixels=True'):
+        psd[0].topil()
+    with pytest.raises(ValueError, match='load_pixels=True'):
+        psd.compose(force=True)
+
+    with open(input_path, 'rb') as f:
+        psd = PSDImage.open(f, load_pixels=False)
+        assert psd.topil() == expected.topil()
+
+
+def test_open_mmap(tmpdir):
+    input_path = full_name('layers/pixel-layer.psd')
+    expected = PSDImage.open(input_path)
+    with PSDImage.open(input_path, mmap=True) as psd:
+        assert psd._mmap is not None
+        assert isinstance(psd._record.image_data.data, memoryview)
+        assert psd[0].topil() == expected[0].topil()
+        assert psd.topil() == expected.topil()
+        assert psd._record == expected._record
+    assert psd._mmap is None
+
+    output_path = os.path.join(str(tmpdir), 'output.psd')
+    expected.save(output_path)
+    psd = PSDImage.open(output_path, mmap=True)
+    psd.save(output_path)
+    assert psd[0].topil() == expected[0].topil()
+    psd.close()
+    assert PSDImage.open(output_path)._record == expected._record
+
+    with open(output_path, 'rb') as f:
+        psd = PSDImage.open(f, mmap=True)
+        psd.save(output_path)
+        assert psd[0].topil() == expected[0].topil()
+        psd.close()
+    assert PSDImage.open(output_path)._record == expected._record
+
+
 def test_save(fixture, tmpdir):
     output_path = os.path.join(str(tmpdir), 'output.psd')
     fixture.save(output_path)
@@ -55,6 +140,63 @@ def test_pilio(fixture):
     assert psd._record.image_data == fixture._record.image_data
 
 
+def test_topil_bbox():
+    input_path = full_name('layers/pixel-layer.psd')
+    expected = PSDImage.open(input_path).topil()
+    bbox = (3, 5, 20, 17)
+    with PSDImage.open(input_path, lazy=True) as psd:
+        image = psd.topil(bbox=bbox)
+        assert image.info['offset'] == bbox[:2]
+        assert image.tobytes() == expected.crop(bbox).tobytes()
+        image = psd.compose(bbox=bbox)
+        assert image.tobytes() == expected.crop(bbox).tobytes()
+        image = psd.topil(channel=0, bbox=bbox)
+        assert image.tobytes() == psd.topil(channel=0).crop(bbox).tobytes()
+        assert psd._record.image_data._source is not None
+
+
+@pytest.mark.parametrize('scale', [0.5, 1 / 3., 0.1])
+def test_topil_scale(scale, monkeypatch):
+    import psd_tools.api.pil_io
+    from psd_tools.api.pil_io import align_image, reduce_image
+    monkeypatch.setattr(psd_tools.api.pil_io, '_BAND_SIZE', 7)
+    factor = int(round(1 / scale))
+    with PSDImage.open(full_name('layers/pixel-layer.psd'), lazy=True) as psd:
+        image = psd.topil(scale=scale)
+        assert image.info['offset'] == (0, 0)
+        expected = reduce_image(psd.topil(), factor)
+        assert image.tobytes() == expected.tobytes()
+        image = psd.compose(scale=scale)
+        assert image.tobytes() == expected.tobytes()
+        layer = psd[0]
+        image = layer.topil(scale=scale)
+        expected, offset = align_image(
+            layer.topil(), layer.offset, factor, psd.size
+        )
+        assert offset[0] % factor == 0 and offset[1] % factor == 0
+        assert image.info['offset'] == (offset[0] // factor,
+                                        offset[1] // factor)
+        expected = reduce_image(expected, factor)
+        assert image.tobytes() == expected.tobytes()
+    for scale in (2, 0.6, 0.3):
+        with pytest.raises(ValueError):
+            psd.topil(scale=scale)
+
+
+@pytest.mark.parametrize(
+    'compression', [
+        Compression.PACK_BITS,
+        Compression.ZIP_WITH_PREDICTION,
+    ]
+)
+def test_frompil_workers(fixture, compression, monkeypatch):
+    import psd_tools.compression
+    monkeypatch.setattr(psd_tools.compression, '_CHUNK_SIZE', 4)
+    image = fixture.topil()
+    psd = PSDImage.frompil(image, compression=compression, workers=2)
+    assert psd.topil().tobytes() == image.tobytes()
+
+
 def test_properties(fixture):
     assert fixture.name == 'Root'
     assert fixture.kind == 'psdimage'
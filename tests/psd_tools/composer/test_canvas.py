@@ -0,0 +1,84 @@
+from __future__ import absolute_import, unicode_literals
+import pytest
+import logging
+
+from PIL import Image
+import numpy as np
+
+from psd_tools.composer.canvas import Canvas
+from psd_tools.constants import BlendMode
+
+logger = logging.getLogger(__name__)
+
+
+@pytest.mark.parametrize('color', [
+    (255, 0, 0, 255),
+    (0, 128, 255, 128),
+    (0, 0, 0, 0),
+])
+def test_canvas_blend_normal(color):
+    backdrop = Image.new('RGBA', (8, 8), (64, 192, 32, 200))
+    image = Image.new('RGBA', (4, 4), color)
+    canvas = Canvas(backdrop, offset=(10, 10))
+    canvas.blend(image, (12, 12), BlendMode.NORMAL)
+    result = canvas.topil()
+    assert result.info['offset'] == (10, 10)
+
+    expected = backdrop.copy()
+    expected.alpha_composite(image, (2, 2))
+    difference = np.abs(
+        np.asarray(result, dtype=np.int16) -
+        np.asarray(expected, dtype=np.int16)
+    )
+    assert difference.max() <= 1
+
+
+def test_canvas_blend_alpha_table():
+    backdrop = Image.new('RGBA', (8, 8), (64, 192, 32, 200))
+    image = Image.new('RGBA', (4, 4), (255, 0, 0, 255))
+    canvas = Canvas(backdrop)
+    canvas.blend(
+        image, (2, 2), BlendMode.NORMAL, [x // 2 for x in range(256)]
+    )
+
+    expected = backdrop.copy()
+    image = Image.new('RGBA', (4, 4), (255, 0, 0, 127))
+    expected.alpha_composite(image, (2, 2))
+    difference = np.abs(
+        np.asarray(canvas.topil(), dtype=np.int16) -
+        np.asarray(expected, dtype=np.int16)
+    )
+    assert difference.max() <= 1
+
+
+@pytest.mark.parametrize('mode', [BlendMode.NORMAL, BlendMode.MULTIPLY])
+def test_canvas_blend_array(mode):
+    backdrop = Image.new('RGBA', (8, 8), (64, 192, 32, 200))
+    image = Image.new('RGBA', (6, 4), (255, 128, 0, 180))
+    expected = Canvas(backdrop)
+    expected.blend(image, (4, 2), mode, [x // 2 for x in range(256)])
+
+    canvas = Canvas(backdrop)
+    array = np.asarray(image, dtype=np.float32).transpose((2, 0, 1)) / 255.
+    canvas.blend_array(array, (4, 2), mode, opacity=.5)
+    planes = canvas.planes()
+    assert planes.dtype == np.float32 and planes.shape == (4, 8, 8)
+    difference = np.abs(planes - expected.planes())
+    assert difference.max() <= 1. / 255.
+
+
+def test_canvas_blend_outside():
+    backdrop = Image.new('RGB', (8, 8), (255, 255, 255))
+    canvas = Canvas(backdrop)
+    canvas.blend(Image.new('RGBA', (4, 4), (255, 0, 0, 255)), (8, 0))
+    result = canvas.topil()
+    assert result.mode == 'RGB'
+    assert np.all(np.asarray(result) == 255)
+
+
+def test_canvas_paste():
+    canvas = Canvas(Image.new('RGBA', (4, 4)))
+    canvas.paste(Image.new('RGBA', (4, 4), (255, 255, 255, 0)), (2, 2))
+    result = np.asarray(canvas.topil())
+    assert np.all(result[2:, 2:] == (255, 255, 255, 0))
+    assert np.all(result[:2, :2] == 0)
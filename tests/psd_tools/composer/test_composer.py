@@ -8,6 +8,8 @@ import numpy as np
 
 from psd_tools.api.psd_image import PSDImage
 from psd_tools.api.layers import Group
+from psd_tools.constants import Tag
+from psd_tools.composer import compose, compose_array
 
 from ..utils import full_name
 
@@ -117,6 +119,251 @@ def test_compose_bbox():
     assert psd[0].compose(bbox=bbox).size == size
 
 
+@pytest.mark.parametrize('workers', [None, 3])
+def test_compose_render_once(workers, monkeypatch):
+    import psd_tools.composer
+    render_layer = psd_tools.composer._render_layer
+    counts = {}
+
+    def _render_layer(layer, bbox, layer_filter, **kwargs):
+        if bbox is None:
+            counts[layer.name] = counts.get(layer.name, 0) + 1
+        return render_layer(layer, bbox, layer_filter, **kwargs)
+
+    monkeypatch.setattr(psd_tools.composer, '_render_layer', _render_layer)
+    psd = PSDImage.open(full_name('layer_effects.psd'))
+    if workers:
+        psd.compose(force=True, workers=workers)
+    else:
+        for _ in psd.compose_tiles(tile_size=(200, 37), force=True):
+            pass
+    assert counts and max(counts.values()) == 1
+
+
+def test_compose_clip_alpha():
+    psd = PSDImage.open(full_name('clipping-mask.psd'))
+    layer = [x for x in psd.descendants() if x.has_clip_layers()][0]
+    alpha = np.asarray(layer.topil().getchannel('A'))
+    assert np.any((alpha > 0) & (alpha < 255))
+    image = layer.compose()
+    assert image.info['offset'] == layer.offset
+    assert np.array_equal(np.asarray(image.getchannel('A')), alpha)
+
+
+@pytest.mark.parametrize(
+    'filename, tile_size', [
+        ('clipping-mask.psd', (17, 13)),
+        ('masks/2.psd', (17, 13)),
+        ('layers/solid-color-fill.psd', (17, 13)),
+        ('layers/gradient-fill.psd', (17, 13)),
+        ('layer_effects.psd', (200, 37)),
+        ('layer_params.psd', (37, 200)),
+        ('adjustment-mask.psd', (37, 200)),
+        ('fill_adjustments.psd', (37, 200)),
+    ]
+)
+def test_compose_tiles(filename, tile_size):
+    psd = PSDImage.open(full_name(filename))
+    reference = psd.compose(force=True)
+    rendered = Image.new(reference.mode, psd.size)
+    for tile in psd.compose_tiles(tile_size=tile_size, force=True):
+        assert tile.width <= tile_size[0] and tile.height <= tile_size[1]
+        rendered.paste(tile, tile.info['offset'])
+    assert np.array_equal(np.asarray(rendered), np.asarray(reference))
+
+
+@pytest.mark.parametrize(
+    'filename, dtype', [
+        ('16bit5x5.psd', np.uint16),
+        ('32bit.psd', np.float32),
+        ('colormodes/4x4_16bit_grayscale.psd', np.uint16),
+        ('clipping-mask.psd', np.uint8),
+        ('fill_adjustments.psd', np.uint8),
+    ]
+)
+def test_compose_array(filename, dtype):
+    psd = PSDImage.open(full_name(filename))
+    reference = np.asarray(compose(psd, apply_icc=False), dtype=np.int16)
+    array = compose_array(psd)
+    assert array.dtype == dtype
+    assert array.shape == reference.shape
+    quantized = compose_array(psd, dtype=np.uint8)
+    assert np.abs(quantized.astype(np.int16) - reference).max() <= 1
+
+
+def test_compose_array_exact():
+    psd = PSDImage.open(full_name('16bit5x5.psd'))
+    assert np.array_equal(compose_array(psd)[..., :3], psd.numpy())
+
+
+@pytest.mark.parametrize(
+    'filename', [
+        'clipping-mask.psd',
+        'masks/2.psd',
+        'layers/gradient-fill.psd',
+        'group.psd',
+        'layer_effects.psd',
+        'layer_params.psd',
+        'adjustment-mask.psd',
+        'fill_adjustments.psd',
+    ]
+)
+def test_compose_scale(filename, monkeypatch):
+    import psd_tools.composer
+    from psd_tools.api.pil_io import reduce_image
+    monkeypatch.setattr(psd_tools.composer, '_TILE_SIZE', 38)
+    psd = PSDImage.open(full_name(filename))
+    reference = psd.compose(force=True)
+    for scale in (0.5, 0.25):
+        image = psd.compose(force=True, scale=scale)
+        expected = reduce_image(reference, int(1 / scale))
+        assert image.size == expected.size
+        # Edges differ as pixels are averaged before blending.
+        difference = np.abs(
+            np.asarray(image.convert('RGBa'), dtype=np.int16) -
+            np.asarray(expected.convert('RGBa'), dtype=np.int16)
+        )
+        assert difference.mean() < 0.5 and difference.max() <= 40
+    with pytest.raises(ValueError):
+        compose(psd, context=reference, scale=0.5)
+
+
+@pytest.mark.parametrize(
+    'filename, workers', [
+        ('clipping-mask.psd', 3),
+        ('masks/2.psd', 3),
+        ('layers/gradient-fill.psd', 3),
+        ('layer_effects.psd', 8),
+        ('layer_params.psd', 8),
+        ('adjustment-mask.psd', 3),
+        ('fill_adjustments.psd', 3),
+    ]
+)
+def test_compose_workers(filename, workers):
+    reference = PSDImage.open(full_name(filename)).compose(force=True)
+    psd = PSDImage.open(full_name(filename))
+    image = psd.compose(force=True, workers=workers)
+    assert np.array_equal(np.asarray(image), np.asarray(reference))
+
+
+@pytest.mark.parametrize(
+    'filename', [
+        'clipping-mask.psd',
+        'hidden-groups.psd',
+        'masks/2.psd',
+    ]
+)
+def test_compose_incremental(filename):
+    psd = PSDImage.open(full_name(filename))
+    psd.compose(force=True, incremental=True)
+    layers = list(psd.descendants())
+    layers[0].offset = (layers[0].left + 3, layers[0].top - 2)
+    layers[-1].opacity = 128
+    layers[-1].visible = not layers[-1].visible
+    assert psd._dirty
+    image = psd.compose(force=True, incremental=True)
+    assert psd._composed is not None and psd._dirty == []
+
+    reference = psd.compose(force=True)
+    assert psd._composed is None
+    assert np.array_equal(np.asarray(image), np.asarray(reference))
+
+
+def test_compose_cache():
+    from psd_tools.composer import enable_cache, disable_cache
+    psd = PSDImage.open(full_name('hidden-groups.psd'))
+    reference = psd.compose(force=True)
+    cache = enable_cache()
+    try:
+        psd.invalidate()
+        assert np.array_equal(
+            np.asarray(psd.compose(force=True)), np.asarray(reference)
+        )
+        assert cache.misses > 0 and cache.hits == 0 and len(cache) > 0
+        psd.invalidate()
+        assert np.array_equal(
+            np.asarray(psd.compose(force=True)), np.asarray(reference)
+        )
+        assert cache.hits > 0
+
+        layer = list(psd.descendants())[-1]
+        layer.visible = not layer.visible
+        psd.invalidate()
+        image = psd.compose(force=True)
+        disable_cache()
+        psd.invalidate()
+        assert np.array_equal(
+            np.asarray(image), np.asarray(psd.compose(force=True))
+        )
+    finally:
+        disable_cache()
+
+
+def test_compose_cache_tiles():
+    from psd_tools.composer import enable_cache, disable_cache
+    psd = PSDImage.open(full_name('layer_effects.psd'))
+    cache = enable_cache()
+    try:
+        reference = psd.compose(force=True)
+        assert cache.hits == 0
+        rendered = Image.new(reference.mode, psd.size)
+        for tile in psd.compose_tiles(tile_size=(200, 320), force=True):
+            rendered.paste(tile, tile.info['offset'])
+        assert cache.hits > 0
+        assert np.array_equal(np.asarray(rendered), np.asarray(reference))
+    finally:
+        disable_cache()
+
+
+def test_fingerprint():
+    from psd_tools.composer.cache import fingerprint, memoize_fingerprints
+    psd = PSDImage.open(full_name('layers-minimal/pattern-fill.psd'))
+    layer = psd[0]
+    digest = fingerprint(layer)
+    assert fingerprint(layer) == digest
+
+    @memoize_fingerprints
+    def func():
+        value = fingerprint(layer)
+        layer.opacity = 128
+        assert fingerprint(layer) == value
+        return value
+
+    assert func() == digest
+    assert fingerprint(layer) != digest
+
+    digest = fingerprint(layer)
+    del psd.tagged_blocks[Tag.PATTERNS1]
+    assert fingerprint(layer) != digest
+
+
+def test_fingerprint_stamps():
+    from psd_tools.composer.cache import fingerprint
+    psd = PSDImage.open(full_name('clipping-mask.psd'), lazy=True)
+    layer = [x for x in psd.descendants() if x.has_pixels()][0]
+    digest = fingerprint(layer)
+    assert all(x._source is not None for x in layer._channels)
+    assert fingerprint(PSDImage.open(full_name('clipping-mask.psd'))[0]) != (
+        fingerprint(psd[0])
+    )
+
+    channel = layer._channels[0]
+    channel.data = channel.data
+    assert fingerprint(layer) != digest
+
+
+def test_composition_cache_eviction():
+    from psd_tools.composer.cache import CompositionCache
+    cache = CompositionCache(max_size=200)
+    cache.put('a', Image.new('L', (10, 10)))
+    cache.put('b', Image.new('L', (10, 10)))
+    assert cache.get('a')[0]
+    cache.put('c', Image.new('L', (10, 10)))
+    assert len(cache) == 2 and cache.size == 200
+    assert not cache.get('b')[0]
+    assert cache.get('a')[0] and cache.get('c')[0]
+
+
 def test_apply_mask():
     psd = PSDImage.open(full_name('masks/2.psd'))
     image = Image.open(full_name('masks/2.png'))
@@ -144,6 +391,19 @@ def test_apply_opacity():
     image = psd.compose(force=True)
     assert image.getpixel((0, 0))[-1] == psd.compose().getpixel((0, 0))[-1]
 
+    # Opacity folded into the blend step matches the PIL composition.
+    from psd_tools.composer import _compose_pil
+    context = Image.new('RGBA', psd.size, (255, 255, 255, 0))
+    rendered = compose(list(psd), bbox=psd.viewbox, context=context.copy())
+    reference = _compose_pil(
+        list(psd), psd.viewbox, context, lambda layer: layer.is_visible()
+    )
+    difference = np.abs(
+        np.asarray(rendered, dtype=np.int16) -
+        np.asarray(reference, dtype=np.int16)
+    )
+    assert difference.max() <= 1
+
 
 def test_compose_layer_filter():
     psd = PSDImage.open(full_name('clipping-mask.psd'))
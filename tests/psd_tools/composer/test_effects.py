@@ -19,3 +19,27 @@ def test_stroke_effects(filename):
     preview = psd.topil().convert('RGB')
     rendered = psd.compose(force=True).convert('RGB')
     assert _calculate_hash_error(preview, rendered) <= 0.1
+
+
+@pytest.mark.parametrize('style, inside, outside', [
+    (b'OutF', 0, 255),
+    (b'InsF', 255, 0),
+    (b'CtrF', 255, 255),
+])
+def test_create_stroke_mask(style, inside, outside):
+    from psd_tools.composer.effects import create_stroke_mask
+    from psd_tools.psd.descriptor import Descriptor, Enumerated, UnitFloat
+    from psd_tools.terminology import Key
+
+    setting = Descriptor()
+    setting[Key.SizeKey] = UnitFloat(unit=b'#Pxl', value=4.)
+    setting[Key.Style] = Enumerated(typeID=b'FStl', enum=style)
+    alpha = Image.new('L', (24, 24))
+    alpha.paste(255, (6, 6, 18, 18))
+    mask = create_stroke_mask(alpha, setting)
+    assert mask.size == alpha.size
+    assert mask.getpixel((6, 12)) == inside
+    assert mask.getpixel((5, 12)) == outside
+    assert mask.getpixel((12, 12)) == 0
+    # Joins are round.
+    assert mask.getpixel((2, 2)) == 0
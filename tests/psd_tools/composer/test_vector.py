@@ -6,7 +6,8 @@ from PIL import Image
 from psd_tools import PSDImage
 from psd_tools.constants import Tag
 from psd_tools.composer.vector import (
-    draw_solid_color_fill, draw_pattern_fill, draw_gradient_fill
+    draw_vector_mask, draw_solid_color_fill, draw_pattern_fill,
+    draw_gradient_fill
 )
 from psd_tools.psd.descriptor import Double
 from psd_tools.terminology import Enum, Key, Type
@@ -34,6 +35,28 @@ def test_draw_vector_mask(filename):
     assert _calculate_hash_error(preview, rendered) <= 0.1
 
 
+@pytest.mark.parametrize(("filename", ), [
+    ('path-operations/exclude.psd', ),
+    ('stroke.psd', ),
+    ('vector-mask.psd', ),
+])
+def test_draw_vector_mask_viewport(filename):
+    psd = PSDImage.open(full_name(filename))
+    width, height = psd.size
+    for layer in psd.descendants():
+        if not layer.has_vector_mask():
+            continue
+        full = draw_vector_mask(layer, (0, 0, width, height))
+        for bbox in [
+            (width // 3, height // 4, width * 2 // 3, height * 3 // 4),
+            (1, 7, width // 2 + 3, height - 5),
+            (-5, -3, width + 2, height // 3),
+        ]:
+            mask = draw_vector_mask(layer, bbox)
+            assert mask.info['offset'] == bbox[:2]
+            assert mask.tobytes() == full.crop(bbox).tobytes()
+
+
 @pytest.mark.xfail(reason='Low stroke quality')
 @pytest.mark.parametrize(("filename", ), [
     ('stroke.psd', ),
@@ -59,6 +82,41 @@ def test_draw_pattern_fill():
     setting[b'Scl '] = Double(50.)
     setting[b'Opct'] = Double(67.)
     draw_pattern_fill(psd.size, psd, setting)
+    assert len(psd._pattern_panels) == 2
+
+
+@pytest.mark.parametrize('mode', ['L', 'RGB', 'RGBA', 'P'])
+def test_tile(mode):
+    from psd_tools.composer.vector import _tile
+    panel = Image.new(mode, (3, 2))
+    panel.putpixel((1, 1), 1 if mode == 'P' else (200, ) * len(mode))
+    if mode == 'P':
+        panel.putpalette([0, 0, 0, 255, 0, 0])
+    image = _tile(panel, (8, 5))
+    assert image.mode == mode and image.size == (8, 5)
+    assert _tile(panel, (4, 3), (2, 1)).tobytes() == image.crop(
+        (2, 1, 6, 4)
+    ).tobytes()
+    for left, top in [(1, 1), (4, 1), (7, 3)]:
+        assert image.getpixel((left, top)) == panel.getpixel((1, 1))
+    assert image.getpixel((2, 3)) == panel.getpixel((2, 1))
+    if mode == 'P':
+        assert image.getpalette()[:6] == panel.getpalette()[:6]
+
+
+def test_draw_fill_box():
+    box = (3, 5, 20, 11)
+    psd = PSDImage.open(full_name('layers-minimal/pattern-fill.psd'))
+    setting = psd[0].tagged_blocks.get_data(Tag.PATTERN_FILL_SETTING)
+    expected = draw_pattern_fill(psd.size, psd, setting).crop(box)
+    image = draw_pattern_fill(psd.size, psd, setting, box)
+    assert image.tobytes() == expected.tobytes()
+
+    psd = PSDImage.open(full_name('layers-minimal/gradient-fill.psd'))
+    setting = psd[0].tagged_blocks.get_data(Tag.GRADIENT_FILL_SETTING)
+    expected = draw_gradient_fill(psd.size, setting).crop(box)
+    image = draw_gradient_fill(psd.size, setting, box)
+    assert image.tobytes() == expected.tobytes()
 
 
 def test_draw_gradient_fill():
@@ -74,6 +132,15 @@ def test_draw_gradient_fill():
     draw_gradient_fill(psd.size, setting)
 
 
+def test_gradient_lut():
+    from psd_tools.composer.vector import _get_gradient_lut
+    psd = PSDImage.open(full_name('layers-minimal/gradient-fill.psd'))
+    setting = psd[0].tagged_blocks.get_data(Tag.GRADIENT_FILL_SETTING)
+    mode, lut = _get_gradient_lut(setting.get(Key.Gradient))
+    assert lut.shape == (4096, len(mode) + 1)
+    assert _get_gradient_lut(setting.get(Key.Gradient))[1] is lut
+
+
 @pytest.mark.parametrize(("filename", ), [
     ('gradient-styles.psd', ),
     ('gradient-sizes.psd', ),
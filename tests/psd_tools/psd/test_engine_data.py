@@ -24,6 +24,12 @@ def test_tokenizer(fixture, length):
 @pytest.mark.parametrize(
     'fixture, token_type', [
         (b'(\xfe\xff0\n0\n)', EngineToken.STRING),
+        (b'\n\t >>\x00\x00', EngineToken.DICT_END),
+        (b'-.5 ', EngineToken.NUMBER_WITH_DECIMAL),
+        (b'-12', EngineToken.NUMBER),
+        (b'/Name (', EngineToken.PROPERTY),
+        (b'false ]', EngineToken.BOOLEAN),
+        (b'(hwid)', EngineToken.UNKNOWN_TAG),
     ]
 )
 def test_tokenizer_item(fixture, token_type):
@@ -32,6 +38,13 @@ def test_tokenizer_item(fixture, token_type):
     assert o_token_type == token_type
 
 
+def test_tokenizer_unknown():
+    tokenizer = Tokenizer(b'/Name true]')
+    next(tokenizer)
+    with pytest.raises(ValueError):
+        next(tokenizer)
+
+
 @pytest.mark.parametrize(
     'filename, indent, write', [
         ('TySh_1.dat', 0, True),
@@ -1,4 +1,5 @@
 from __future__ import absolute_import, unicode_literals
+import io
 import pytest
 from psd_tools.constants import Compression
 from psd_tools.psd.header import FileHeader
@@ -60,3 +61,27 @@ def test_image_data_data(compression, data, header):
     image_data.set_data(data, header)
     output = image_data.get_data(header)
     assert output == data, 'output=%r, expected=%r' % (output, data)
+
+
+@pytest.mark.parametrize('compression', [
+    Compression.RAW, Compression.PACK_BITS, Compression.ZIP,
+])
+@pytest.mark.parametrize('version', [1, 2])
+@pytest.mark.parametrize('lazy', [False, True])
+def test_image_data_region(compression, version, lazy):
+    header = FileHeader(
+        width=3, height=3, depth=8, channels=3, version=version
+    )
+    data = [RAW_IMAGE_3x3_8bit, b'\x05' * 9, b'\x00\x07\x07' * 3]
+    image_data = ImageData(compression)
+    image_data.set_data(data, header)
+    with io.BytesIO(image_data.tobytes()) as f:
+        image_data = ImageData.read(f, lazy=lazy)
+        assert image_data.get_data(header, channel=1) == data[1]
+        assert image_data.get_data(header, 2, (1, 3)) == data[2][3:]
+        assert image_data.get_data(header, rows=(0, 1)) == [
+            x[:3] for x in data
+        ]
+        assert image_data.get_data(header, 0, (2, 5)) == data[0][6:]
+        if lazy and compression != Compression.ZIP:
+            assert image_data._source is not None  # Not read entirely.
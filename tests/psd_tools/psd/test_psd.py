@@ -58,6 +58,23 @@ def test_psd_write_read(filename):
     check_write_read(psd, encoding='utf_8')
 
 
+@pytest.mark.parametrize('filename', [
+    full_name('layers/pixel-layer.psd'),
+    full_name('16bit5x5.psd'),
+    full_name('32bit.psb'),
+    full_name('group.psd'),
+])
+def test_psd_read_lazy(filename):
+    with open(filename, 'rb') as f:
+        expected = PSD.read(f)
+    with open(filename, 'rb') as f:
+        psd = PSD.read(f, lazy=True)
+        assert psd == expected
+        with io.BytesIO() as output:
+            psd.write(output)
+            assert output.getvalue() == expected.tobytes()
+
+
 def test_psd_from_error():
     with pytest.raises(AssertionError):
         PSD.frombytes(b'\x00\x00\x00\x00')
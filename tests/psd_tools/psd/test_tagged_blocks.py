@@ -44,6 +44,21 @@ def test_tagged_blocks_v2():
     check_read_write(TaggedBlocks, fixture, version=2, padding=4)
 
 
+def test_tagged_blocks_lazy():
+    filepath = os.path.join(TEST_ROOT, 'tagged_blocks', 'tagged_blocks_v2.dat')
+    with open(filepath, 'rb') as f:
+        fixture = f.read()
+    expected = TaggedBlocks.frombytes(fixture, version=2, padding=4)
+    blocks = TaggedBlocks.frombytes(
+        fixture, version=2, padding=4, lazy=True
+    )
+    assert all(block._raw is not None for block in blocks.values())
+    assert blocks.tobytes(version=2, padding=4) == fixture
+    assert blocks == expected
+    assert all(block._raw is None for block in blocks.values())
+    assert blocks.tobytes(version=2, padding=4) == fixture
+
+
 @pytest.mark.parametrize(
     'key, data, version, padding', [
         (Tag.LAYER_VERSION, IntegerElement(1), 1, 1),
@@ -1,11 +1,16 @@
 from __future__ import unicode_literals, print_function
+import io
 import pytest
 import logging
 from psd_tools.compression import (
-    compress, decompress, encode_prediction, decode_prediction,
-    encode_packbits, decode_packbits
+    compress, decompress, decompress_source, encode_prediction,
+    decode_prediction, encode_packbits, decode_packbits,
+    _decode_prediction_array, _decode_packbits_into, _decode_packbits_numpy,
+    _decode_prediction_numpy, _encode_prediction_array,
+    _encode_prediction_numpy
 )
 from psd_tools.constants import Compression
+import psd_tools.compression
 import psd_tools.utils
 
 logger = logging.getLogger(__name__)
@@ -30,6 +35,30 @@ def test_prediction(fixture, width, height, depth):
     assert fixture == decoded
 
 
+@pytest.mark.parametrize(
+    'fixture, width, height, depth', [
+        (bytes(bytearray(range(256))) * 3, 96, 8, 8),
+        (bytes(bytearray(range(256))) * 3, 48, 8, 16),
+        (bytes(bytearray(range(256))) * 3, 24, 8, 32),
+    ]
+)
+def test_decode_prediction_numpy(fixture, width, height, depth):
+    expected = _decode_prediction_array(fixture, width, height, depth)
+    assert _decode_prediction_numpy(fixture, width, height, depth) == expected
+
+
+@pytest.mark.parametrize(
+    'fixture, width, height, depth', [
+        (bytes(bytearray(range(256))) * 3, 96, 8, 8),
+        (bytes(bytearray(range(256))) * 3, 48, 8, 16),
+        (bytes(bytearray(range(256))) * 3, 24, 8, 32),
+    ]
+)
+def test_encode_prediction_numpy(fixture, width, height, depth):
+    expected = _encode_prediction_array(fixture, width, height, depth)
+    assert _encode_prediction_numpy(fixture, width, height, depth) == expected
+
+
 @pytest.mark.parametrize(
     'fixture, width, height, depth, version', [
         (bytes(bytearray(range(256))), 128, 2, 8, 1),
@@ -42,6 +71,55 @@ def test_packbits(fixture, width, height, depth, version):
     assert fixture == decoded
 
 
+@pytest.mark.parametrize(
+    'fixture, width, height', [
+        (b'\x00' * 300 + bytes(bytearray(range(256))) * 2, 406, 2),
+        (bytes(bytearray(range(128))) * 2 + b'\x01\x01', 129, 2),
+        (bytes(bytearray(range(129))) + b'\x02' * 129, 129, 2),
+        (b'\x00\x01\x01\x02' * 64, 64, 4),
+    ]
+)
+def test_packbits_compatibility(fixture, width, height):
+    packbits = pytest.importorskip('packbits')
+    encoded = encode_packbits(fixture, width, height, 8, 1)
+    expected = b''.join(
+        packbits.encode(fixture[i * width:(i + 1) * width])
+        for i in range(height)
+    )
+    assert encoded[2 * height:] == expected
+
+
+@pytest.mark.parametrize('rows', [(0, 4), (1, 3), (3, 4), (2, 2)])
+def test_packbits_rows(rows):
+    width, height = 64, 4
+    fixture = b'\x00\x01\x01\x02' * 32 + b'\x03' * 128
+    encoded = encode_packbits(fixture, width, height, 8, 1)
+    decoded = decode_packbits(encoded, height, 1, width, rows)
+    assert decoded == fixture[rows[0] * width:rows[1] * width]
+
+
+@pytest.mark.parametrize(
+    'data, counts', [
+        (b'\x02abc\xfdd\x80\x00e', [4, 5]),
+        (b'\x02abc\xfdd\x80\x00e', [9]),
+        (b'\x80\xfex\x80', [1, 3]),
+        (b'\x7f' + b'f' * 128 + b'\x81g', [129, 2]),
+    ]
+)
+def test_decode_packbits_numpy(data, counts, monkeypatch):
+    monkeypatch.setattr(psd_tools.compression, '_LOCKSTEP_ROWS', 1)
+    expected = bytearray()
+    _decode_packbits_into(bytearray(data), expected)
+    assert _decode_packbits_numpy(bytearray(data), counts) == expected
+
+
+@pytest.mark.parametrize('counts', [[3, 6], [9, 1], [4]])
+def test_decode_packbits_numpy_boundaries(counts, monkeypatch):
+    monkeypatch.setattr(psd_tools.compression, '_LOCKSTEP_ROWS', 1)
+    data = bytearray(b'\x02abc\xfdd\x80\x00e')
+    assert _decode_packbits_numpy(data, counts) is None
+
+
 @pytest.mark.parametrize(
     'data, kind, width, height, depth, version', [
         (RAW_IMAGE_3x3_8bit, Compression.RAW, 3, 3, 8, 1),
@@ -67,6 +145,62 @@ def test_compress_decompress(data, kind, width, height, depth, version):
     assert output == data, 'output=%r, expected=%r' % (output, data)
 
 
+@pytest.mark.parametrize('kind', list(Compression))
+@pytest.mark.parametrize('depth', [8, 16, 32])
+@pytest.mark.parametrize('rows', [(0, 8), (2, 5), (7, 8), (3, 3)])
+def test_decompress_rows(kind, depth, rows):
+    width, height = 5, 8
+    size = width * depth // 8
+    data = bytes(bytearray(i * 7 % 256 for i in range(size * height)))
+    compressed = compress(data, kind, width, height, depth)
+    output = decompress(compressed, kind, width, height, depth, rows=rows)
+    assert output == data[rows[0] * size:rows[1] * size]
+
+
+@pytest.mark.parametrize('kind', list(Compression))
+@pytest.mark.parametrize('version', [1, 2])
+@pytest.mark.parametrize('rows', [None, (0, 8), (2, 5), (3, 3)])
+def test_decompress_source(kind, version, rows):
+    width, height, depth = 5, 8, 8
+    data = bytes(bytearray(i * 7 % 256 for i in range(width * height)))
+    compressed = compress(data, kind, width, height, depth, version)
+    with io.BytesIO(b'\x00' * 3 + compressed + b'\x00') as f:
+        f.seek(1)
+        source = (f, 3, len(compressed))
+        output = decompress_source(
+            source, kind, width, height, depth, version, rows
+        )
+        assert f.tell() == 1
+    start, stop = rows or (0, height)
+    assert output == data[start * width:stop * width]
+
+
+@pytest.mark.parametrize(
+    'kind, depth', [
+        (Compression.PACK_BITS, 8),
+        (Compression.PACK_BITS, 16),
+        (Compression.ZIP, 8),
+        (Compression.ZIP_WITH_PREDICTION, 8),
+        (Compression.ZIP_WITH_PREDICTION, 16),
+        (Compression.ZIP_WITH_PREDICTION, 32),
+    ]
+)
+def test_compress_workers(kind, depth, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    monkeypatch.setattr(psd_tools.compression, '_CHUNK_SIZE', 64)
+    data = (b'\x00' * 100 + bytes(bytearray(range(256)))) * 16
+    width, height = 89, len(data) // (89 * depth // 8)
+    data = data[:width * height * depth // 8]
+    expected = compress(data, kind, width, height, depth)
+    encoded = compress(data, kind, width, height, depth, workers=3)
+    assert decompress(encoded, kind, width, height, depth) == data
+    with ThreadPoolExecutor(2) as executor:
+        encoded = compress(data, kind, width, height, depth, workers=executor)
+    assert decompress(encoded, kind, width, height, depth) == data
+    if kind == Compression.PACK_BITS:
+        assert encoded == expected
+
+
 # This will fail due to irreversible zlib compression.
 @pytest.mark.xfail
 @pytest.mark.parametrize(
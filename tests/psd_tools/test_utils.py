@@ -3,7 +3,8 @@ import pytest
 import io
 from psd_tools.utils import (
     pack, unpack, read_length_block, write_length_block, read_pascal_string,
-    write_pascal_string, read_unicode_string, write_unicode_string
+    write_pascal_string, read_unicode_string, write_unicode_string,
+    BufferReader
 )
 
 
@@ -40,6 +41,30 @@ def test_read_length_block():
         assert f.tell() == 12
 
 
+def test_read_length_block_view():
+    data = b'\x00\x00\x00\x07\x01\x01\x01\x01\x01\x01\x01\x00'
+    with BufferReader(data) as f:
+        body = read_length_block(f, padding=2, view=True)
+        assert isinstance(body, memoryview)
+        assert body == data[4:11]
+        assert f.tell() == 12
+    assert f.closed
+    assert body.tobytes() == data[4:11]
+
+
+def test_buffer_reader():
+    data = b'\x00\x01\x02\x03\x04\x05'
+    with BufferReader(data) as f:
+        assert f.read(2) == b'\x00\x01'
+        assert f.seek(-1, 1) == 1
+        assert f.read_view(3) == data[1:4]
+        assert f.tell() == 4
+        assert f.read() == data[4:]
+        assert f.read(1) == b''
+        f.seek(-2, 2)
+        assert f.read(10) == data[4:]
+
+
 def test_write_length_block():
     data = b'\x00\x00\x00\x07\x01\x01\x01\x01\x01\x01\x01\x00'
     body = data[4:11]